@@ -1,27 +1,16 @@
 import os
-import pandas as pd
-import matplotlib.pyplot as plt
 
-from data.split_rows import split_rows
-from data.pointcloud_plotting import (
-    plot_pointcloud,
-    plot_pointcloud_with_lines,
-    plot_pointcloud_with_lines_and_vectors,
-    plot_two_pointclouds
-)
-from data.line_fitting import fit_lines
-from data.planes_from_lines import planes_from_lines
-from data.line_vectors import compute_line_vectors
-from data.line_rotations import estimate_line_rotations
-from data.rotate_rows import rotate_rows
-from data.rmse_rows import compute_rmse_rows
+from data import align_pointclouds
+from data import path_utils
+from data import pointcloud_store
+from data.pointcloud_plotting import set_plot_mode, close_plotting
 
 
 # ============================================================
 # GLOBAL CONFIGURATION
 # ============================================================
-working_dir = os.getcwd()
-experiments_dir = os.path.join(working_dir, "Experiments")
+# Experiments/ of the repository, or --experiments-dir <folder>
+experiments_dir = path_utils.experimentsDir()
 
 
 # ============================================================
@@ -36,158 +25,150 @@ experiment_end   = 3
 # ============================================================
 step = 40  # row split size
 
+# The aligned CAM cloud is always saved as P_CAM_aligned.npy.
+# export_csv = True (default) also writes camera_pointcloud_aligned.csv
+export_csv = True
+
+# An experiment whose inputs, parameters and outputs are unchanged is
+# skipped and its RMSE read back from RMSE_<exp>.csv (never in "show"
+# mode, which is run to look at the figures).
+use_cache = True
+content_hash = False
+
+
+# ============================================================
+# ROBUST REGISTRATION (see data/robust_fitting.py)
+#   robust_mode = None     -> every point pair is used
+#   robust_mode = "irls"   -> Tukey-reweighted line fit per row
+#   robust_mode = "ransac" -> RANSAC line fit per row
+#   Pairs whose CAM or TVS point lies farther than inlier_threshold
+#   (m) from the robust line of its row are left out of the lines,
+#   rotations and RMSE (None = 3 robust standard deviations of the
+#   row). The alignment is still applied to every point;
+#   RMSE_<exp>.csv then also gives the inlier ratio and the RMSE
+#   of all points, and P_CAM_aligned an 'inlier' column.
+# ============================================================
+robust_mode = None
+inlier_threshold = None
+
+
+# ============================================================
+# GLOBAL REGISTRATION (see data/global_registration.py)
+#   global_mode = None         -> row-wise registration only
+#   global_mode = "rigid"      -> also a single rotation + translation
+#                                 of all the pairs (Kabsch)
+#   global_mode = "similarity" -> same plus a uniform scale (Umeyama)
+#   The single transform is solved in closed form from the row
+#   statistics (inlier pairs in robust mode) and saved to
+#   global_transform.npz, to be applied to new scans without
+#   recomputation. RMSE_<exp>.csv then also gives RMSE_global and
+#   RMSE_rows_<exp>.csv the RMSE of every row for both methods.
+# ============================================================
+global_mode = None
+
+
+# ============================================================
+# FIGURES
+#   plot_mode = "show"  -> interactive figures (blocks until closed)
+#   plot_mode = "files" -> PNG files in processed_data/figures,
+#                          rendered by plot_workers background
+#                          processes (headless)
+#   plot_mode = "none"  -> no figures
+# ============================================================
+plot_mode = "show"
+plot_workers = 2
+
 
 # ============================================================
-# RMSE RESULTS ACCUMULATOR
+# INSTRUMENTATION
+#   run_reports = True -> processed_data/run_report_alignment.json/.csv
+#                         with the wall time, CPU time, peak memory
+#                         and item counts of every stage
+#   profiler = "cprofile"     -> also write run_report_alignment.prof
+#              "pyinstrument" -> also write run_report_alignment.html
+#              None           -> no profiling
 # ============================================================
-rmse_results = []
+run_reports = True
+profiler = None
 
 
 # ============================================================
-# PHASE C: LINE-BASED ALIGNMENT + RMSE (CAM vs TVS)
-#   - Reads:
-#       • camera_pointcloud_with_displacement.csv
-#       • tvs_pointcloud_with_displacement.csv
-#   - Splits into rows
-#   - Fits lines and vectors
-#   - Estimates per-row rotations
-#   - Aligns CAM rows to TVS rows
-#   - Writes:
-#       • camera_pointcloud_aligned.csv
-#       • RMSE_<exp>.csv
-#       • RMSE_Summary.csv (global)
+# OPTIONS (see ALIGNMENT_DEFAULTS in data/align_pointclouds.py)
 # ============================================================
-print("Starting PHASE C: CAM vs TVS alignment + RMSE\n")
+options = {
+    'step': step,
+    'export_csv': export_csv,
+    'use_cache': use_cache,
+    'content_hash': content_hash,
+    'robust_mode': robust_mode,
+    'inlier_threshold': inlier_threshold,
+    'global_mode': global_mode,
+    'plot_mode': plot_mode,
+    'run_reports': run_reports,
+    'profiler': profiler,
+}
 
 
 # ============================================================
 # MAIN LOOP OVER EXPERIMENTS
 # ============================================================
-for experiment_id in range(experiment_start, experiment_end + 1):
-
-    experiment_folder = f"{experiment_id:03}"
-    print(f"--- Processing experiment folder: {experiment_folder}")
-
-    experiment_path = os.path.join(experiments_dir, experiment_folder)
-    processed_data_path = os.path.join(experiment_path, "processed_data")
-
-    # File names aligned with previous scripts
-    cam_csv = os.path.join(processed_data_path, "camera_pointcloud_with_displacement.csv")
-    tvs_csv = os.path.join(processed_data_path, "tvs_pointcloud_with_displacement.csv")
-
-    if not os.path.exists(cam_csv):
-        print(f"    Missing file: {cam_csv}\n")
-        continue
-
-    if not os.path.exists(tvs_csv):
-        print(f"    Missing file: {tvs_csv}\n")
-        continue
-
-    try:
-        # --------------------------------------------------------
-        # 1) Load point clouds
-        # --------------------------------------------------------
-        cloud_cam = pd.read_csv(cam_csv)
-        cloud_tvs = pd.read_csv(tvs_csv)
-
-        print(f"    CAM points: {len(cloud_cam)}")
-        print(f"    TVS points: {len(cloud_tvs)}")
-
-        # --------------------------------------------------------
-        # 2) Split into rows
-        # --------------------------------------------------------
-        cam_rows = split_rows(cloud_cam, step)
-        tvs_rows = split_rows(cloud_tvs, step)
-
-        print(f"    CAM rows: {len(cam_rows)} (step={step})")
-        print(f"    TVS rows: {len(tvs_rows)} (step={step})")
-
-        # --------------------------------------------------------
-        # 3) Visualize raw point clouds (optional figures)
-        # --------------------------------------------------------
-        plot_pointcloud(cam_rows, title=f"CAM point cloud {experiment_folder}")
-        plot_pointcloud(tvs_rows, title=f"TVS point cloud {experiment_folder}")
-
-        # --------------------------------------------------------
-        # 4) Fit lines per row
-        # --------------------------------------------------------
-        cam_lines = fit_lines(cam_rows)
-        tvs_lines = fit_lines(tvs_rows)
-
-        print(f"    CAM fitted lines: {len(cam_lines)}")
-        print(f"    TVS fitted lines: {len(tvs_lines)}")
-
-        plot_pointcloud_with_lines(cam_rows, cam_lines, title=f"CAM lines {experiment_folder}")
-        plot_pointcloud_with_lines(tvs_rows, tvs_lines, title=f"TVS lines {experiment_folder}")
-
-        # --------------------------------------------------------
-        # 5) Compute line direction vectors
-        # --------------------------------------------------------
-        cam_vectors = compute_line_vectors(cam_lines)
-        tvs_vectors = compute_line_vectors(tvs_lines)
-
-        plot_pointcloud_with_lines_and_vectors(
-            cam_rows, cam_lines, cam_vectors, title=f"CAM vectors {experiment_folder}"
-        )
-        plot_pointcloud_with_lines_and_vectors(
-            tvs_rows, tvs_lines, tvs_vectors, title=f"TVS vectors {experiment_folder}"
-        )
-
-        # --------------------------------------------------------
-        # 6) Estimate rotations (CAM → TVS)
-        # --------------------------------------------------------
-        rotations = estimate_line_rotations(cam_vectors, tvs_vectors)
-        print(f"    Rotations estimated: {len(rotations)}")
-
-        # --------------------------------------------------------
-        # 7) Rotate / align CAM rows to TVS rows
-        # --------------------------------------------------------
-        cam_rows_aligned = rotate_rows(cam_rows, tvs_rows, rotations)
-
-        aligned_csv = os.path.join(processed_data_path, "camera_pointcloud_aligned.csv")
-        pd.concat(cam_rows_aligned).to_csv(aligned_csv, index=False)
-        print("    Saved camera_pointcloud_aligned.csv")
-
-        # --------------------------------------------------------
-        # 8) Compare aligned CAM vs TVS
-        # --------------------------------------------------------
-        plot_two_pointclouds(
-            cam_rows_aligned, tvs_rows, title=f"CAM vs TVS comparison {experiment_folder}"
-        )
-
-        # --------------------------------------------------------
-        # 9) RMSE computation
-        # --------------------------------------------------------
-        rmse = compute_rmse_rows(cam_rows_aligned, tvs_rows)
-        print(f"    RMSE: {rmse:.6f}")
-
-        # Save per-experiment RMSE inside the experiment folder
-        rmse_csv_individual = os.path.join(processed_data_path, f"RMSE_{experiment_folder}.csv")
-        pd.DataFrame([{"Experiment": experiment_folder, "RMSE": rmse}]).to_csv(
-            rmse_csv_individual,
-            index=False
-        )
-        print(f"    Saved RMSE_{experiment_folder}.csv")
-
-        # Accumulate global summary
-        rmse_results.append({"Experiment": experiment_folder, "RMSE": rmse})
-
-        # Show and close figures to free memory
-        plt.show()
-        plt.close("all")
-
-        print("    Completed\n")
-
-    except Exception as e:
-        print(f"    Error: {e}\n")
-
-
-# ============================================================
-# SAVE GLOBAL RMSE SUMMARY
-# ============================================================
-df_rmse = pd.DataFrame(rmse_results)
-rmse_summary_csv = os.path.join(experiments_dir, "RMSE_Summary.csv")
-df_rmse.to_csv(rmse_summary_csv, index=False)
-
-print("PHASE C completed")
-print(f"Saved RMSE_Summary.csv at: {rmse_summary_csv}")
+if __name__ == "__main__":
+
+    import pandas as pd
+
+    print("Starting PHASE C: CAM vs TVS alignment + RMSE\n")
+
+    set_plot_mode(
+        plot_mode,
+        output_dir=os.path.join(experiments_dir, "figures"),
+        workers=plot_workers
+    )
+
+    # RMSE results accumulator
+    rmse_results = []
+
+    for experiment_id in range(experiment_start, experiment_end + 1):
+
+        experiment_folder = f"{experiment_id:03}"
+        print(f"--- Processing experiment folder: {experiment_folder}")
+
+        experiment_path = os.path.join(experiments_dir, experiment_folder)
+        processed_data_path = os.path.join(experiment_path, "processed_data")
+
+        # File names aligned with previous scripts
+        cam_path = os.path.join(processed_data_path, "P_CAM_disp")
+        tvs_path = os.path.join(processed_data_path, "P_TVS_disp")
+
+        if not pointcloud_store.pointcloud_exists(cam_path):
+            print(f"    Missing file: {cam_path}.npy\n")
+            continue
+
+        if not pointcloud_store.pointcloud_exists(tvs_path):
+            print(f"    Missing file: {tvs_path}.npy\n")
+            continue
+
+        try:
+            rmse = align_pointclouds.process_experiment(
+                experiment_folder, processed_data_path, cam_path, tvs_path, options
+            )
+
+            # Accumulate global summary
+            rmse_results.append({"Experiment": experiment_folder, "RMSE": rmse})
+
+            print("    Completed\n")
+
+        except Exception as e:
+            print(f"    Error: {e}\n")
+
+    # Wait for the figures rendered in the background
+    close_plotting()
+
+    # ========================================================
+    # SAVE GLOBAL RMSE SUMMARY
+    # ========================================================
+    df_rmse = pd.DataFrame(rmse_results)
+    rmse_summary_csv = os.path.join(experiments_dir, "RMSE_Summary.csv")
+    df_rmse.to_csv(rmse_summary_csv, index=False)
+
+    print("PHASE C completed")
+    print(f"Saved RMSE_Summary.csv at: {rmse_summary_csv}")
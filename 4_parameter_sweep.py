@@ -0,0 +1,74 @@
+import os
+
+from data import path_utils
+from data.parameter_sweep import sweep_grid, run_sweep
+
+
+# ============================================================
+# GLOBAL CONFIGURATION
+# ============================================================
+# Experiments/ of the repository, or --experiments-dir <folder>
+experiments_dir = path_utils.experimentsDir()
+
+
+# ============================================================
+# EXPERIMENT RANGE
+# ============================================================
+experiment_start = 1
+experiment_end   = 3
+
+
+# ============================================================
+# SWEEP PARAMETERS
+#   steps       -> row split sizes
+#   row_strides -> keep every n-th row (angular step = n x base step)
+#   stops       -> None (all stops), n (first n stops) or a tuple
+#                  of stop indices k
+# ============================================================
+steps = [40]
+row_strides = list(range(1, 11))
+stops = [None, 2, 3, 4, 5, 6]
+
+workers = os.cpu_count() or 1
+
+
+# ============================================================
+# PARAMETER SWEEP (PHASE C on shared, preloaded arrays)
+#   - Reads (memory-mapped, once per experiment and worker):
+#       • P_CAM_disp.npy
+#       • P_TVS_disp.npy
+#   - Writes:
+#       • Sweep_Results.csv (global, one row per configuration)
+# ============================================================
+if __name__ == "__main__":
+
+    print("Starting parameter sweep\n")
+
+    experiments = {}
+    for experiment_id in range(experiment_start, experiment_end + 1):
+
+        experiment_folder = f"{experiment_id:03}"
+        processed_data_path = os.path.join(experiments_dir, experiment_folder, "processed_data")
+
+        if not os.path.exists(os.path.join(processed_data_path, "P_CAM_disp.npy")):
+            print(f"    Missing processed data for experiment {experiment_folder}, skipped")
+            continue
+
+        experiments[experiment_folder] = processed_data_path
+
+    if not experiments:
+        print("No experiment with processed data (run steps 1 and 2 first)")
+        raise SystemExit(1)
+
+    grid = sweep_grid(steps, row_strides, stops)
+    print(f"    Experiments: {len(experiments)}, configurations: {len(grid)}, workers: {workers}")
+
+    sweep_csv = os.path.join(experiments_dir, "Sweep_Results.csv")
+    df_sweep = run_sweep(experiments, grid, workers=workers, output_csv=sweep_csv)
+
+    failed = df_sweep[df_sweep["error"] != ""]
+    for _, row in failed.iterrows():
+        print(f"    Error in {row['Experiment']} ({row['step']}, {row['row_stride']}, {row['stops']}): {row['error']}")
+
+    print("\nParameter sweep completed")
+    print(f"Saved Sweep_Results.csv at: {sweep_csv}")
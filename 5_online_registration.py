@@ -0,0 +1,259 @@
+import csv
+import os
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from data import image_io
+from data import laser_detection
+from data import path_utils
+from data import stereo_calibration
+from data import stereo_laser_pointcloud
+from data import stereo_pipeline
+from data import stereo_triangulation
+from data import tvs_loader
+from data.online_registration import OnlineRowRegistration, scan_raw_data, pending_frames, stop_offsets
+
+
+# ============================================================
+# GLOBAL CONFIGURATION
+# ============================================================
+# Experiments/ of the repository, or --experiments-dir <folder>
+experiments_dir = path_utils.experimentsDir()
+
+# Experiment folder receiving the data of the platform
+experiment_folder = "001"
+
+
+# ============================================================
+# PARAMETERS
+#   step         -> number of rows (point j of stop k goes to row
+#                   (offset_k + j) % step, offset_k being the number of
+#                   TVS points of stops 0..k-1, as in the offline split;
+#                   a stop waits for the TVS files of all the stops
+#                   before it)
+#   max_latency  -> seconds to wait for a stop to be complete
+#                   (one frame per TVS row) before registering the
+#                   frames already received
+#   poll_interval-> seconds between two scans of raw_data
+#   idle_timeout -> stop after this many seconds without new data
+#                   (None = run until interrupted)
+# ============================================================
+step = 40
+max_latency = 30.0
+poll_interval = 1.0
+idle_timeout = 120.0
+
+# Spot detection options of step 1 (tracking_mode, subpixel_centroids,
+# rectify_points, coarse_scale; see CAMERA_DEFAULTS in
+# data/stereo_laser_pointcloud.py). Keep them equal to the options of
+# 1_stereo_laser_pointcloud.py so online and offline centroids are the same
+camera_options = stereo_laser_pointcloud.camera_options()
+
+
+# ============================================================
+# INPUT HELPERS
+# ============================================================
+def load_accumulated_displacements(raw_data_path):
+    """
+    Accumulated displacement (m) of every stop known so far, from the
+    incremental displacements (cm) of displacement.csv.
+    """
+    try:
+        return tvs_loader.accumulated_displacements(os.path.join(raw_data_path, "displacement.csv"))
+    except (OSError, ValueError, IndexError):
+        return np.zeros(1)
+
+
+def load_tvs_stop(tvs_path):
+    """TVS points of one stop (row j = point j), None while unreadable."""
+    try:
+        points = tvs_loader.read_tvs_file(tvs_path)[:, :3]
+    except (OSError, ValueError):
+        return None
+
+    return points if len(points) else None
+
+
+def triangulate_frames(stop, frames, calibration, tracker):
+    """
+    Detects the laser spot in the given frames of a stop and triangulates
+    the detected pairs. Frames that cannot be read, or JPEGs still being
+    written, are returned as unreadable and retried on the next scan.
+
+    Returns:
+        (j indices, (n, 3) CAM points, frames that could not be read yet)
+    """
+    unreadable = []
+    found = []
+    centroids_left = []
+    centroids_right = []
+    image_shape = None
+
+    for j in frames:
+        image, windows = image_io.load_frame(stop['frames'][j], camera_options['coarse_scale'])
+
+        if image is None:
+            unreadable.append(j)
+            continue
+
+        base_name = os.path.splitext(os.path.basename(stop['frames'][j]))[0]
+        centroid_left, centroid_right, image_shape, _ = stereo_pipeline.process_stereo_image(
+            image, base_name, calibration, tracker,
+            subpixel=camera_options['subpixel_centroids'],
+            rectify_points=camera_options['rectify_points'],
+            search_windows=windows
+        )
+
+        if centroid_left and centroid_right:
+            found.append(j)
+            centroids_left.append(centroid_left)
+            centroids_right.append(centroid_right)
+        else:
+            print(f"    Laser spot not detected in {base_name}")
+
+    if not found:
+        return np.empty(0, dtype=np.int64), np.empty((0, 3)), unreadable
+
+    points = stereo_triangulation.triangulate_batch(
+        centroids_left, centroids_right, image_shape, calibration
+    )
+    valid = ~np.isnan(points).any(axis=1)
+
+    return np.array(found, dtype=np.int64)[valid], points[valid], unreadable
+
+
+# ============================================================
+# OUTPUT HELPERS
+#   - online_registration.csv: one line per update (stop, points,
+#     rows, RMSE, processing time)
+#   - online_alignment.npz: latest per-row transforms
+# ============================================================
+def write_update(processed_data_path, stops, result, processing_time, header):
+    log_path = os.path.join(processed_data_path, "online_registration.csv")
+
+    with open(log_path, mode='w' if header else 'a', newline='') as log_file:
+        writer = csv.writer(log_file)
+        if header:
+            writer.writerow(["stops", "n_points", "n_rows", "RMSE", "processing_s"])
+        writer.writerow([
+            "-".join(str(k) for k in stops), int(result['counts'].sum()),
+            int(np.count_nonzero(result['counts'])), result['rmse'], round(processing_time, 3)
+        ])
+
+    np.savez(
+        os.path.join(processed_data_path, "online_alignment.npz"),
+        rotations=result['rotations'],
+        cam_centroids=result['cam_centroids'],
+        tvs_centroids=result['tvs_centroids'],
+        counts=result['counts']
+    )
+
+
+# ============================================================
+# ONLINE LOOP
+# ============================================================
+def run_online(experiment_path, calibration):
+    raw_data_path = os.path.join(experiment_path, "raw_data")
+    processed_data_path = os.path.join(experiment_path, "processed_data")
+    os.makedirs(processed_data_path, exist_ok=True)
+
+    registration = OnlineRowRegistration(step)
+    processed = defaultdict(set)
+    tvs_points = {}
+    trackers = {}
+
+    last_data = time.time()
+    first_update = True
+
+    while True:
+        start = time.perf_counter()
+
+        stops = scan_raw_data(raw_data_path)
+        accumulated = load_accumulated_displacements(raw_data_path)
+        updated = []
+
+        for k in sorted(stops):
+            stop = stops[k]
+
+            # The TVS row and the displacement of the stop are needed first
+            if stop['tvs'] is None or k >= len(accumulated):
+                continue
+
+            if k not in tvs_points:
+                points = load_tvs_stop(stop['tvs'])
+                if points is None:
+                    continue
+                tvs_points[k] = points
+
+            # Row key of the offline split: global index of the TVS point
+            offsets = stop_offsets({s: len(points) for s, points in tvs_points.items()})
+            if k not in offsets:
+                continue
+
+            frames = pending_frames(stop, processed[k], len(tvs_points[k]), max_latency)
+            if not frames:
+                continue
+
+            if k not in trackers:
+                trackers[k] = (
+                    laser_detection.LaserSpotTracker(subpixel=camera_options['subpixel_centroids'])
+                    if camera_options['tracking_mode'] else None
+                )
+
+            # Frames still being written are retried on the next scan
+            j, cam, unreadable = triangulate_frames(stop, frames, calibration, trackers[k])
+            processed[k].update(set(frames) - set(unreadable))
+
+            # Correspondence by (k, j); points without a TVS sample are dropped.
+            # With dropped spots the other points keep their offline row
+            # (the offline split itself pairs the clouds by position)
+            keep = j < len(tvs_points[k])
+            j, cam = j[keep], cam[keep]
+            if len(j) == 0:
+                continue
+
+            tvs = tvs_points[k][j].copy()
+
+            cam[:, 1] += accumulated[k]
+            tvs[:, 1] += accumulated[k]
+
+            registration.add_stop(offsets[k], j, cam, tvs)
+            updated.append(k)
+
+        if updated:
+            result = registration.solve()
+            processing_time = time.perf_counter() - start
+
+            print(f"Stops {updated}: {registration.n_points} points, "
+                  f"RMSE: {result['rmse']:.6f} ({processing_time:.2f} s)")
+
+            write_update(processed_data_path, updated, result, processing_time, first_update)
+            first_update = False
+            last_data = time.time()
+
+        elif idle_timeout is not None and time.time() - last_data > idle_timeout:
+            print(f"No new data for {idle_timeout:.0f} s, stopping.")
+            break
+
+        else:
+            time.sleep(poll_interval)
+
+    return registration
+
+
+# ============================================================
+# MAIN
+# ============================================================
+if __name__ == "__main__":
+
+    experiment_path = os.path.join(experiments_dir, experiment_folder)
+    print(f"Online registration of {experiment_path} (Ctrl+C to stop)\n")
+
+    calibration = stereo_calibration.load_calibration()
+
+    try:
+        run_online(experiment_path, calibration)
+    except KeyboardInterrupt:
+        print("\nInterrupted.")
@@ -0,0 +1,88 @@
+import os
+
+from data import path_utils
+from data.displacement_simulation import run_simulation, summarize_simulation
+
+
+# ============================================================
+# GLOBAL CONFIGURATION
+# ============================================================
+# Experiments/ of the repository, or --experiments-dir <folder>
+experiments_dir = path_utils.experimentsDir()
+
+
+# ============================================================
+# EXPERIMENT RANGE
+# ============================================================
+experiment_start = 1
+experiment_end   = 3
+
+
+# ============================================================
+# SCENARIOS (see SCENARIO_DEFAULTS in data/displacement_simulation.py)
+#   Lengths in metres, angles in degrees. Parameters not given
+#   keep their default (no perturbation).
+# ============================================================
+scenarios = {
+    "nominal": {},
+    "stop_jitter_1mm": {"stop_translation_sigma": 0.001},
+    "stop_tilt_0.5deg": {"stop_rotation_sigma": 0.5},
+    "cam_noise_0.5mm": {"cam_noise_sigma": 0.0005},
+    "cam_pose_5deg_1cm": {"cam_rotation": 5.0, "cam_translation": 0.01},
+    "outliers_5pct": {"outlier_fraction": 0.05, "outlier_sigma": 0.005},
+}
+
+n_trials = 1000
+seed = 0
+workers = os.cpu_count() or 1
+
+
+# ============================================================
+# MONTE CARLO SIMULATION (on the undisplaced clouds)
+#   - Reads:
+#       • P_CAM.npy, P_TVS.npy, P_TVS_disp.npy
+#   - Writes:
+#       • Simulation_Results.csv (global, one row per trial)
+#       • Simulation_Summary.csv (RMSE statistics per scenario)
+# ============================================================
+if __name__ == "__main__":
+
+    print("Starting displacement simulation\n")
+
+    experiments = {}
+    for experiment_id in range(experiment_start, experiment_end + 1):
+
+        experiment_folder = f"{experiment_id:03}"
+        processed_data_path = os.path.join(experiments_dir, experiment_folder, "processed_data")
+
+        if not all(
+            os.path.exists(os.path.join(processed_data_path, f"{name}.npy"))
+            for name in ("P_CAM", "P_TVS", "P_TVS_disp")
+        ):
+            print(f"    Missing processed data for experiment {experiment_folder}, skipped")
+            continue
+
+        experiments[experiment_folder] = processed_data_path
+
+    if not experiments:
+        print("No experiment with processed data (run steps 1 and 2 first)")
+        raise SystemExit(1)
+
+    print(f"    Experiments: {len(experiments)}, scenarios: {len(scenarios)}, "
+          f"trials: {n_trials}, workers: {workers}")
+
+    results_csv = os.path.join(experiments_dir, "Simulation_Results.csv")
+    df_results = run_simulation(
+        experiments, scenarios, n_trials=n_trials, seed=seed,
+        workers=workers, output_csv=results_csv
+    )
+
+    df_summary = summarize_simulation(df_results)
+    summary_csv = os.path.join(experiments_dir, "Simulation_Summary.csv")
+    df_summary.to_csv(summary_csv, index=False)
+
+    print()
+    print(df_summary.to_string(index=False))
+
+    print("\nDisplacement simulation completed")
+    print(f"Saved Simulation_Results.csv and Simulation_Summary.csv at: {experiments_dir}")
@@ -0,0 +1,275 @@
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+import pandas as pd
+
+from data import laser_detection
+from data import stereo_calibration
+from data import stereo_triangulation
+from data import tvs_loader
+from data.line_fitting import fit_lines
+from data.line_rotations import estimate_line_rotations
+from data.line_vectors import compute_line_vectors
+from data.global_registration import register_global, stream_statistics
+from data.rmse_rows import compute_rmse_rows
+from data.robust_fitting import robust_inliers
+from data.rotate_rows import rotate_rows
+from data.row_statistics import RowStatistics
+from data.split_rows import RowPartition, split_rows
+
+from . import synthetic_tunnel
+
+
+# ============================================================
+# TIMING
+# ============================================================
+def time_call(function, repeat=3):
+    """Wall times (s) of repeat calls of function()."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    return times
+
+
+def _result(group, benchmark, size, unit, times, **extra):
+    best = min(times)
+    return {
+        'group': group,
+        'benchmark': benchmark,
+        'size': int(size),
+        'unit': unit,
+        'repeat': len(times),
+        'best_s': best,
+        'median_s': float(np.median(times)),
+        'throughput': size / best if best > 0 else None,
+        **extra,
+    }
+
+
+# ============================================================
+# BENCHMARKS
+#   Every group generates its synthetic input once per size
+#   (not timed) and times the stage functions on it.
+# ============================================================
+def bench_spot_detection(n_frames, repeat=3, seed=0):
+    """detect_laser_spot (integer and sub-pixel centroids) on rendered frames."""
+    frames, centres_left, _ = synthetic_tunnel.stereo_frames(n_frames, seed=seed)
+    width = frames[0].shape[1] // 2
+    lefts = [frame[:, :width] for frame in frames]
+
+    results = []
+    for name, subpixel in (('detect_laser_spot', True), ('detect_laser_spot_integer', False)):
+        detections = [laser_detection.detect_laser_spot(image, subpixel=subpixel) for image in lefts]
+        error = np.hypot(*(np.array([d[0] for d in detections]) - centres_left).T)
+
+        times = time_call(
+            lambda: [laser_detection.detect_laser_spot(image, subpixel=subpixel) for image in lefts], repeat
+        )
+        results.append(_result('detection', name, n_frames, 'images', times, mean_error_px=float(error.mean())))
+
+    return results
+
+
+def bench_triangulation(n_points, calibration, repeat=3, seed=0):
+    """triangulate_batch on random stereo correspondences."""
+    rng = np.random.default_rng(seed)
+    height, width = 720, 1280
+
+    points_left = np.column_stack([rng.uniform(200, width, n_points), rng.uniform(0, height, n_points)])
+    points_right = points_left - np.column_stack([rng.uniform(20, 200, n_points), np.zeros(n_points)])
+
+    times = time_call(
+        lambda: stereo_triangulation.triangulate_batch(points_left, points_right, (height, width), calibration),
+        repeat
+    )
+    return [_result('triangulation', 'triangulate_batch', n_points, 'points', times)]
+
+
+def _registration_inputs(n_stops, step, noise, seed):
+    scan = synthetic_tunnel.tunnel_scan(n_stops, step, noise=noise, seed=seed)
+
+    cam_rows = RowPartition(scan['cam'], step)
+    tvs_rows = RowPartition(scan['tvs'], step)
+    statistics = RowStatistics.from_rows(cam_rows, tvs_rows)
+
+    return scan, cam_rows, tvs_rows, statistics
+
+
+def bench_registration(n_points, step=40, noise=0.001, repeat=3, seed=0):
+    """Point-level stages of the registration (split, line fit, alignment, RMSE) on a tunnel scan."""
+    scan, cam_rows, tvs_rows, statistics = _registration_inputs(max(n_points // step, 1), step, noise, seed)
+    n = len(scan['cam'])
+
+    cam_df = pd.DataFrame(scan['cam'], columns=['X', 'Y', 'Z'])
+    rotations = estimate_line_rotations(
+        compute_line_vectors(fit_lines(statistics.cam)), compute_line_vectors(fit_lines(statistics.tvs))
+    )
+    aligned = rotate_rows(cam_rows, tvs_rows, rotations, statistics)
+
+    cases = [
+        ('split_rows', lambda: split_rows(cam_df, step)),
+        ('RowPartition.tensor', lambda: RowPartition(scan['cam'], step).tensor()),
+        ('RowStatistics.from_rows', lambda: RowStatistics.from_rows(cam_rows, tvs_rows)),
+        ('fit_lines', lambda: fit_lines(cam_rows)),
+        ('rotate_rows', lambda: rotate_rows(cam_rows, tvs_rows, rotations, statistics)),
+        ('compute_rmse_rows', lambda: compute_rmse_rows(aligned, tvs_rows)),
+        ('robust_inliers (irls)', lambda: robust_inliers(cam_rows, tvs_rows, method="irls")),
+        ('robust_inliers (ransac)', lambda: robust_inliers(cam_rows, tvs_rows, method="ransac")),
+        ('stream_statistics', lambda: stream_statistics(scan['cam'], scan['tvs'])),
+        ('register_global', lambda: register_global(statistics, rotations=rotations)),
+    ]
+
+    return [
+        _result('registration', name, n, 'points', time_call(function, repeat), rows=step)
+        for name, function in cases
+    ]
+
+
+def bench_lines(n_lines, points_per_line=40, noise=0.001, repeat=3, seed=0):
+    """Line-level stages (fit from moments, triads, rotations) on n_lines rows."""
+    _, _, _, statistics = _registration_inputs(points_per_line, n_lines, noise, seed)
+
+    cam_lines = fit_lines(statistics.cam)
+    cam_vectors = compute_line_vectors(cam_lines)
+    tvs_vectors = compute_line_vectors(fit_lines(statistics.tvs))
+
+    cases = [
+        ('fit_lines (moments)', lambda: fit_lines(statistics.cam)),
+        ('compute_line_vectors', lambda: compute_line_vectors(cam_lines)),
+        ('estimate_line_rotations', lambda: estimate_line_rotations(cam_vectors, tvs_vectors)),
+    ]
+
+    return [
+        _result('lines', name, n_lines, 'lines', time_call(function, repeat))
+        for name, function in cases
+    ]
+
+
+def bench_tvs_loader(n_points, work_dir, rows_per_file=40, repeat=3, seed=0):
+    """load_tvs_experiment on synthetic tvs_<k>.csv files."""
+    scan = synthetic_tunnel.tunnel_scan(max(n_points // rows_per_file, 1), rows_per_file, seed=seed)
+    raw_data_path = os.path.join(work_dir, f"tvs_{n_points}")
+    synthetic_tunnel.write_tvs_experiment(raw_data_path, scan)
+
+    displacements = tvs_loader.accumulated_displacements(os.path.join(raw_data_path, "displacement.csv"))
+    times = time_call(
+        lambda: tvs_loader.load_tvs_experiment(raw_data_path, displacements=displacements), repeat
+    )
+
+    shutil.rmtree(raw_data_path, ignore_errors=True)
+
+    return [_result(
+        'tvs_loader', 'load_tvs_experiment', len(scan['tvs']), 'points', times,
+        files=int(scan['k'][-1]) + 1, engine='pyarrow' if tvs_loader.pa_csv is not None else 'numpy'
+    )]
+
+
+# ============================================================
+# SUITE
+# ============================================================
+def environment():
+    """Versions and machine description stored with the results."""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'opencv': cv2.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def run_benchmarks(frame_counts=(10, 100), point_sizes=(10**3, 10**4, 10**5, 10**6, 10**7),
+                   line_counts=(40, 10**3, 10**4, 10**5), tvs_sizes=(10**3, 10**4, 10**5),
+                   repeat=3, output_json=None, seed=0):
+    """
+    Runs every benchmark group at every size.
+
+    Parameters:
+        frame_counts: numbers of frames of the spot detection benchmarks
+        point_sizes: numbers of points of the triangulation and
+                     registration benchmarks
+        line_counts: numbers of rows of the line-level benchmarks
+        tvs_sizes: numbers of points of the TVS loader benchmark (40 per file)
+        repeat: timed calls per benchmark (the best one is the reference)
+        output_json: optional path of the results file
+        seed: random seed of the synthetic data
+
+    Returns:
+        dict with 'environment' and 'results' (one dict per benchmark and size)
+    """
+    results = []
+    work_dir = tempfile.mkdtemp(prefix="benchmarks_")
+
+    try:
+        calibration_path = os.path.join(work_dir, "calibration.xml")
+        synthetic_tunnel.write_calibration(calibration_path)
+        calibration = stereo_calibration.load_calibration(calibration_path)
+
+        tasks = (
+            [(f"spot detection, {n} frames", bench_spot_detection, (n, repeat, seed)) for n in frame_counts]
+            + [(f"triangulation, {n} points", bench_triangulation, (n, calibration, repeat, seed))
+               for n in point_sizes]
+            + [(f"registration, {n} points", bench_registration, (n, 40, 0.001, repeat, seed))
+               for n in point_sizes]
+            + [(f"lines, {n} rows", bench_lines, (n, 40, 0.001, repeat, seed)) for n in line_counts]
+            + [(f"TVS loader, {n} points", bench_tvs_loader, (n, work_dir, 40, repeat, seed))
+               for n in tvs_sizes]
+        )
+
+        for label, benchmark, args in tasks:
+            start = time.perf_counter()
+            results.extend(benchmark(*args))
+            print(f"    {label}: {time.perf_counter() - start:.2f} s")
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {'environment': environment(), 'results': results}
+
+    if output_json is not None:
+        os.makedirs(os.path.dirname(os.path.abspath(output_json)), exist_ok=True)
+        with open(output_json, 'w') as json_file:
+            json.dump(report, json_file, indent=2)
+
+    return report
+
+
+def results_table(report):
+    """Results of a report as a DataFrame."""
+    return pd.DataFrame(report['results'])
+
+
+def compare_reports(baseline, current):
+    """
+    Best times of two reports side by side, with the ratio current /
+    baseline of every benchmark and size present in both (> 1 is slower).
+    """
+    keys = ['group', 'benchmark', 'size']
+    merged = results_table(baseline)[keys + ['best_s']].merge(
+        results_table(current)[keys + ['best_s']], on=keys, suffixes=('_baseline', '_current')
+    )
+    merged['ratio'] = merged['best_s_current'] / merged['best_s_baseline']
+
+    return merged
@@ -0,0 +1,181 @@
+import os
+
+import cv2
+import numpy as np
+
+from data.displacement_simulation import axis_angle_rotations, random_unit_vectors
+from data.tvs_loader import TVS_COLUMNS
+
+
+# ============================================================
+# SYNTHETIC TUNNEL SCANS
+#   Every stop k scans n_rows points j along a vertical arc of a
+#   tunnel wall: a circle of radius `radius` around the tunnel axis
+#   (Y), with a smooth wall relief. Stops advance along Y by
+#   stop_length. The CAM cloud is the TVS cloud seen from another
+#   rigid pose, with independent noise on both clouds. Points are
+#   ordered by (k, j), as P_CAM / P_TVS.
+# ============================================================
+def tunnel_scan(n_stops, n_rows=40, noise=0.0, radius=2.5, arc=120.0, stop_length=0.05,
+                relief=0.02, cam_rotation=5.0, cam_translation=0.1, seed=0):
+    """
+    Synthetic scan-line clouds of a curved tunnel wall.
+
+    Parameters:
+        n_stops: number of platform stops k
+        n_rows: points j per stop (scan-lines)
+        noise: standard deviation (m) of the Gaussian noise of both clouds
+        radius: tunnel radius (m)
+        arc: vertical aperture of the scan (degrees)
+        stop_length: displacement between stops along Y (m)
+        relief: amplitude (m) of the wall relief
+        cam_rotation, cam_translation: rigid pose of the CAM frame
+                                       (degrees, m)
+        seed: random seed
+
+    Returns:
+        dict with 'cam' and 'tvs' (N, 3) arrays, 'k' and 'j' (N,) indices,
+        'vertical_angle' (N,) in degrees and the CAM 'rotation' (3, 3) and
+        'translation' (3,) (tvs = R cam + t without noise)
+    """
+    rng = np.random.default_rng(seed)
+
+    k = np.repeat(np.arange(n_stops), n_rows)
+    j = np.tile(np.arange(n_rows), n_stops)
+
+    angle = np.radians(np.linspace(-arc / 2, arc / 2, n_rows))[j]
+    y = k * stop_length
+    wall = radius + relief * np.sin(3 * angle) * np.cos(2 * np.pi * y / 1.5)
+
+    tvs = np.column_stack([wall * np.cos(angle), y, wall * np.sin(angle)])
+
+    rotation = axis_angle_rotations(random_unit_vectors(rng, ()), np.radians(cam_rotation))
+    translation = cam_translation * random_unit_vectors(rng, ())
+
+    # CAM frame: tvs = R cam + t
+    cam = (tvs - translation) @ rotation
+
+    if noise:
+        cam += rng.normal(scale=noise, size=cam.shape)
+        tvs += rng.normal(scale=noise, size=tvs.shape)
+
+    return {
+        'cam': cam,
+        'tvs': tvs,
+        'k': k,
+        'j': j,
+        'vertical_angle': np.degrees(angle),
+        'rotation': rotation,
+        'translation': translation,
+    }
+
+
+def write_tvs_experiment(raw_data_path, scan, stop_length=0.05):
+    """
+    Writes the TVS cloud of a synthetic scan as tvs_<k>.csv files with
+    the TVS_COLUMNS, and displacement.csv (cm), as a raw_data folder.
+    """
+    os.makedirs(raw_data_path, exist_ok=True)
+
+    n_stops = int(scan['k'].max(initial=-1)) + 1
+    data = np.zeros((len(scan['tvs']), len(TVS_COLUMNS)))
+    data[:, :3] = scan['tvs']
+    data[:, TVS_COLUMNS.index('vertical_angle')] = scan['vertical_angle']
+    data[:, TVS_COLUMNS.index('timestamp')] = np.arange(len(data)) * 0.01
+
+    offsets = np.searchsorted(scan['k'], np.arange(n_stops + 1))
+    for stop in range(n_stops):
+        np.savetxt(
+            os.path.join(raw_data_path, f"tvs_{stop}.csv"),
+            data[offsets[stop]:offsets[stop + 1]], delimiter=',', fmt='%.9g'
+        )
+
+    np.savetxt(
+        os.path.join(raw_data_path, "displacement.csv"),
+        np.full((1, max(n_stops - 1, 1)), stop_length * 100), delimiter=',', fmt='%g'
+    )
+
+
+# ============================================================
+# SYNTHETIC STEREO FRAMES
+#   Rectified left / right views side by side, with a magenta
+#   laser spot of Gaussian profile on a dark noisy background.
+#   The spot core saturates as on the real frames; its colour
+#   passes the LOWER_MAGENTA / UPPER_MAGENTA thresholds near the
+#   core only.
+# ============================================================
+SPOT_COLOR = np.array([255, 235, 255], dtype=np.float64)  # BGR
+
+
+def render_spot(image, centre, sigma=6.0, peak=1.6):
+    """Adds a Gaussian laser spot centred at (x, y) (sub-pixel) to a BGR image in place."""
+    height, width = image.shape[:2]
+    cx, cy = centre
+    r = int(np.ceil(4 * sigma))
+
+    x0, x1 = max(int(cx) - r, 0), min(int(cx) + r + 1, width)
+    y0, y1 = max(int(cy) - r, 0), min(int(cy) + r + 1, height)
+    if x1 <= x0 or y1 <= y0:
+        return image
+
+    x, y = np.meshgrid(np.arange(x0, x1), np.arange(y0, y1))
+    profile = np.minimum(peak * np.exp(-((x - cx) ** 2 + (y - cy) ** 2) / (2 * sigma ** 2)), 1.0)
+
+    region = image[y0:y1, x0:x1].astype(np.float64)
+    region = region * (1 - profile[..., None]) + SPOT_COLOR * profile[..., None]
+    image[y0:y1, x0:x1] = np.clip(np.rint(region), 0, 255).astype(np.uint8)
+
+    return image
+
+
+def stereo_frames(n_frames, image_shape=(720, 1280), disparity=(60, 200), background=30, seed=0):
+    """
+    Synthetic side-by-side stereo frames with one laser spot per view.
+
+    Parameters:
+        n_frames: number of frames
+        image_shape: (height, width) of each view
+        disparity: range of the horizontal spot disparity (px)
+        background: mean background level (noise of the same magnitude)
+        seed: random seed
+
+    Returns:
+        (frames, centres_left, centres_right): list of BGR frames
+        (height, 2 * width, 3) and the (n_frames, 2) true spot centres in
+        each view
+    """
+    rng = np.random.default_rng(seed)
+    height, width = image_shape
+
+    centres_left = np.column_stack([
+        rng.uniform(disparity[1] + 40, width - 40, n_frames),
+        rng.uniform(40, height - 40, n_frames),
+    ])
+    centres_right = centres_left - np.column_stack([rng.uniform(*disparity, n_frames), np.zeros(n_frames)])
+
+    frames = []
+    for left, right in zip(centres_left, centres_right):
+        frame = rng.integers(0, 2 * background, size=(height, 2 * width, 3), dtype=np.uint8)
+        render_spot(frame[:, :width], left)
+        render_spot(frame[:, width:], right)
+        frames.append(frame)
+
+    return frames, centres_left, centres_right
+
+
+def write_calibration(path, image_shape=(720, 1280), focal=1000.0):
+    """
+    Writes a calibration XML with identity rectification maps and an ideal
+    camera matrix, readable by stereo_calibration.load_calibration.
+    """
+    height, width = image_shape
+    x, y = np.meshgrid(np.arange(width, dtype=np.float32), np.arange(height, dtype=np.float32))
+    camera = np.array([[focal, 0, width / 2], [0, focal, height / 2], [0, 0, 1]])
+
+    cv_file = cv2.FileStorage(path, cv2.FileStorage_WRITE)
+    for side in ('L', 'R'):
+        cv_file.write(f'stereoMap{side}_x', x)
+        cv_file.write(f'stereoMap{side}_y', y)
+        cv_file.write(f'camera{side}', camera)
+    cv_file.release()
+
@@ -0,0 +1,159 @@
+import argparse
+import os
+import sys
+
+from data import path_utils
+
+
+# ============================================================
+# COMMAND LINE INTERFACE
+#   python cli.py <command> --help
+#
+#   camera        step 1: camera point clouds (P_CAM)
+#   displacement  step 2: TVS and displaced point clouds
+#   align         step 3: row-wise registration and RMSE
+#   run           steps 1 -> 2 -> 3 (Pipeline_Status.csv)
+#   register      registration of two saved point clouds
+#                 (numpy only, nothing written unless --output)
+#
+#   Every command imports the libraries of its own stage only;
+#   paths come from the arguments, not from the launch directory
+#   (--experiments-dir defaults to Experiments/ of the repository).
+# ============================================================
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fiducial-less CAM/TVS registration pipeline")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    experiments = argparse.ArgumentParser(add_help=False)
+    experiments.add_argument("--experiments-dir", default=os.path.join(path_utils.BASE_DIR, "Experiments"),
+                             help="folder holding the experiment folders (default: Experiments/ of the repository)")
+    experiments.add_argument("-e", "--experiments", default=None,
+                             help='selection, e.g. "1-20,35" or "01*" (default: all)')
+
+    camera = subparsers.add_parser("camera", parents=[experiments], help="step 1: camera point clouds")
+    camera.add_argument("--calibration", default=None, help="stereo calibration XML")
+    camera.add_argument("--workers", type=int, default=1, help="frame worker processes")
+
+    subparsers.add_parser("displacement", parents=[experiments], help="step 2: displaced point clouds")
+
+    align = subparsers.add_parser("align", parents=[experiments], help="step 3: registration and RMSE")
+    align.add_argument("--step", type=int, default=40, help="number of rows")
+    align.add_argument("--plot-mode", choices=["none", "files"], default="none")
+    align.add_argument("--robust", choices=["irls", "ransac"], default=None,
+                       help="robust line fits with outlier rejection")
+    align.add_argument("--inlier-threshold", type=float, default=None,
+                       help="inlier distance to the row lines in metres (default: 3 robust sigmas)")
+    align.add_argument("--global", dest="global_mode", choices=["rigid", "similarity"], default=None,
+                       help="also solve a single transform of all the pairs")
+
+    run = subparsers.add_parser("run", parents=[experiments], help="steps 1 -> 2 -> 3")
+    run.add_argument("--calibration", default=None, help="stereo calibration XML")
+    run.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                     help="experiments processed in parallel")
+    run.add_argument("--plot-mode", choices=["none", "files"], default="none")
+
+    register = subparsers.add_parser("register", help="registration of two saved point clouds")
+    register.add_argument("cam", help="CAM point cloud (.npy)")
+    register.add_argument("tvs", help="TVS point cloud (.npy)")
+    register.add_argument("--step", type=int, default=40, help="number of rows")
+    register.add_argument("--robust", choices=["irls", "ransac"], default=None,
+                          help="robust line fits with outlier rejection")
+    register.add_argument("--inlier-threshold", type=float, default=None,
+                          help="inlier distance to the row lines in metres (default: 3 robust sigmas)")
+    register.add_argument("--global", dest="global_mode", choices=["rigid", "similarity"], default=None,
+                          help="also solve a single transform of all the pairs")
+    register.add_argument("--output", default=None,
+                          help="optional .npz with the per-row transforms (and the global transform)")
+
+    return parser.parse_args(argv)
+
+
+def selected_experiments(args):
+    from data.pipeline_runner import discover_experiments, select_experiments
+
+    return select_experiments(discover_experiments(args.experiments_dir), args.experiments)
+
+
+def run_stage(args, function, **options):
+    """Runs one stage on every selected experiment; returns the number of failures."""
+    failures = 0
+
+    for experiment in selected_experiments(args):
+        print(f"--- Processing experiment folder: {experiment}")
+        try:
+            result = function(os.path.join(args.experiments_dir, experiment), **options)
+            print(f"    {experiment}: {result}\n")
+        except Exception as e:
+            failures += 1
+            print(f"    Error: {e}\n")
+
+    return failures
+
+
+def register(args):
+    from data import api
+
+    # Point cloud paths are given with or without their .npy extension
+    cam_path, tvs_path = (path[:-4] if path.endswith(".npy") else path for path in (args.cam, args.tvs))
+
+    result = api.register(cam_path, tvs_path, args.step, args.robust, args.inlier_threshold, args.global_mode)
+    print(f"Points: {int(result['counts'].sum())}, rows: {args.step}, RMSE: {result['rmse']:.6f}")
+
+    if args.robust is not None:
+        print(f"Inlier ratio: {result['inliers'].mean():.4f} ({args.robust})")
+
+    if args.global_mode is not None:
+        print(f"Global {args.global_mode} RMSE: {result['global']['rmse']:.6f} "
+              f"(scale: {result['global']['scale']:.6f})")
+
+    if args.output is not None:
+        import numpy as np
+
+        np.savez(args.output, **{
+            name: result[name]
+            for name in ("rotations", "cam_centroids", "tvs_centroids", "counts", "inliers")
+            if name in result
+        }, **({} if args.global_mode is None else {
+            "global_transform": result['global']['transform'],
+            "global_row_rmse": result['global']['row_rmse'],
+        }))
+        print(f"Saved {args.output}")
+
+    return 0
+
+
+def main(argv=None):
+    """Runs a command; returns the number of failed experiments."""
+    args = parse_args(argv)
+
+    if args.command == "register":
+        return register(args)
+
+    from data import api
+
+    if args.command == "camera":
+        return run_stage(args, api.camera_pointcloud, calibration_path=args.calibration, workers=args.workers)
+
+    if args.command == "displacement":
+        return run_stage(args, api.displacement)
+
+    if args.command == "align":
+        return run_stage(
+            args, api.alignment, plot_mode=args.plot_mode, step=args.step,
+            robust_mode=args.robust, inlier_threshold=args.inlier_threshold, global_mode=args.global_mode
+        )
+
+    df_status = api.run_pipeline(
+        args.experiments_dir, args.experiments,
+        workers=args.workers,
+        calibration_path=args.calibration,
+        plot_mode=args.plot_mode,
+        output_csv=os.path.join(args.experiments_dir, "Pipeline_Status.csv")
+    )
+    print(df_status.drop(columns="error").to_string(index=False))
+
+    return int((df_status["error"] != "").sum())
+
+
+if __name__ == "__main__":
+    sys.exit(1 if main() else 0)
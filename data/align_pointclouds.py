@@ -0,0 +1,315 @@
+import os
+
+import numpy as np
+
+from . import instrumentation
+from . import pointcloud_store
+from . import stage_cache
+from .split_rows import RowPartition
+from .row_statistics import RowStatistics
+from .pointcloud_plotting import (
+    set_output_dir,
+    show_figures,
+    plot_pointcloud,
+    plot_pointcloud_with_lines,
+    plot_pointcloud_with_lines_and_vectors,
+    plot_two_pointclouds
+)
+from .line_fitting import fit_lines
+from .line_vectors import compute_line_vectors
+from .line_rotations import estimate_line_rotations
+from .rotate_rows import rotate_rows
+from .rmse_rows import compute_rmse_rows
+from .robust_fitting import robust_inliers, inlier_statistics, point_inliers
+from .global_registration import register_global, save_transform
+
+
+# ============================================================
+# OPTIONS
+#   step             -> row split size
+#   export_csv       -> also write camera_pointcloud_aligned.csv next
+#                       to P_CAM_aligned.npy
+#   use_cache        -> skip an experiment whose inputs, parameters
+#                       and outputs are unchanged and read its RMSE
+#                       back from RMSE_<exp>.csv (never in "show" mode)
+#   content_hash     -> compare file contents instead of mtime/size
+#   robust_mode      -> None, "irls" or "ransac" (see robust_fitting)
+#   inlier_threshold -> inlier distance to the row lines (m), None for
+#                       3 robust standard deviations of the row
+#   global_mode      -> None, "rigid" or "similarity": also solve a
+#                       single transform (see global_registration)
+#   plot_mode        -> "none": no figures (the plotting module is not
+#                       used, so concurrent calls are independent);
+#                       "show" or "files": figures in the mode selected
+#                       with pointcloud_plotting.set_plot_mode
+#   run_reports      -> processed_data/run_report_alignment.json/.csv
+#                       (see instrumentation)
+#   profiler         -> None, "cprofile" or "pyinstrument"
+# ============================================================
+ALIGNMENT_DEFAULTS = {
+    'step': 40,
+    'export_csv': True,
+    'use_cache': True,
+    'content_hash': False,
+    'robust_mode': None,
+    'inlier_threshold': None,
+    'global_mode': None,
+    'plot_mode': "none",
+    'run_reports': True,
+    'profiler': None,
+}
+
+
+def alignment_options(options=None):
+    """ALIGNMENT_DEFAULTS overridden by options; unknown names raise TypeError."""
+    options = dict(options or {})
+
+    unknown = sorted(set(options) - set(ALIGNMENT_DEFAULTS))
+    if unknown:
+        raise TypeError(f"Unknown alignment options: {', '.join(unknown)}")
+
+    return {**ALIGNMENT_DEFAULTS, **options}
+
+
+# ============================================================
+# PHASE C: LINE-BASED ALIGNMENT + RMSE (CAM vs TVS)
+#   - Reads (memory-mapped):
+#       • P_CAM_disp.npy
+#       • P_TVS_disp.npy
+#   - Splits into rows and computes the per-row statistics once
+#   - Fits lines and vectors
+#   - Estimates per-row rotations
+#   - Aligns CAM rows to TVS rows
+#   - Writes:
+#       • P_CAM_aligned.npy (camera_pointcloud_aligned.csv if export_csv)
+#       • RMSE_<exp>.csv
+#       • global_transform.npz, RMSE_rows_<exp>.csv (if global_mode)
+#       • RMSE_Summary.csv (global)
+# ============================================================
+def process_experiment(experiment_folder, processed_data_path, cam_path, tvs_path, options=None):
+    """
+    Runs PHASE C on one experiment and returns its RMSE.
+
+    Parameters:
+        experiment_folder: experiment name (file names and titles)
+        processed_data_path: processed_data folder of the experiment
+        cam_path, tvs_path: point cloud paths without extension
+        options: dict overriding ALIGNMENT_DEFAULTS
+    """
+    options = alignment_options(options)
+
+    with instrumentation.run_report(
+        os.path.join(processed_data_path, "run_report_alignment"),
+        enabled=options['run_reports'], profiler=options['profiler'],
+        stage="alignment", experiment=experiment_folder, plot_mode=options['plot_mode']
+    ):
+        return align_experiment(experiment_folder, processed_data_path, cam_path, tvs_path, options)
+
+
+def align_experiment(experiment_folder, processed_data_path, cam_path, tvs_path, options):
+    import pandas as pd
+
+    step = options['step']
+    robust_mode = options['robust_mode']
+    global_mode = options['global_mode']
+    plot_mode = options['plot_mode']
+    export_csv = options['export_csv']
+
+    # Without figures the plotting module is not touched at all
+    figures = plot_mode != "none"
+
+    rmse_csv_individual = os.path.join(processed_data_path, f"RMSE_{experiment_folder}.csv")
+
+    cache = (
+        stage_cache.StageCache(processed_data_path, options['content_hash'])
+        if options['use_cache'] else None
+    )
+    stage_inputs = [
+        cam_path + ".npy", cam_path + "_meta.npz",
+        tvs_path + ".npy", tvs_path + "_meta.npz"
+    ]
+    stage_parameters = {
+        'step': step, 'plot_mode': plot_mode, 'export_csv': export_csv,
+        'robust_mode': robust_mode, 'inlier_threshold': options['inlier_threshold'],
+        'global_mode': global_mode
+    }
+    stage_outputs = [
+        os.path.join(processed_data_path, "P_CAM_aligned.npy"),
+        os.path.join(processed_data_path, "P_CAM_aligned_meta.npz"),
+        rmse_csv_individual
+    ]
+    global_transform_path = os.path.join(processed_data_path, "global_transform.npz")
+    rmse_rows_csv = os.path.join(processed_data_path, f"RMSE_rows_{experiment_folder}.csv")
+    if global_mode is not None:
+        stage_outputs += [global_transform_path, rmse_rows_csv]
+    if export_csv:
+        stage_outputs.append(os.path.join(processed_data_path, "camera_pointcloud_aligned.csv"))
+
+    if (cache is not None and plot_mode != "show"
+            and cache.is_valid("alignment", stage_inputs, stage_parameters, stage_outputs)):
+        rmse = pd.read_csv(rmse_csv_individual)["RMSE"].iloc[0]
+        print(f"    Up to date, skipped (RMSE: {rmse:.6f})")
+        return rmse
+
+    if figures:
+        set_output_dir(os.path.join(processed_data_path, "figures"))
+
+    # --------------------------------------------------------
+    # 1) Load point clouds
+    # --------------------------------------------------------
+    cam_points, cam_columns = pointcloud_store.load_pointcloud(cam_path, mmap_mode='r')
+    tvs_points, _ = pointcloud_store.load_pointcloud(tvs_path, mmap_mode='r')
+
+    print(f"    CAM points: {len(cam_points)}")
+    print(f"    TVS points: {len(tvs_points)}")
+
+    # --------------------------------------------------------
+    # 2) Split into rows
+    # --------------------------------------------------------
+    with instrumentation.span("split_rows", points=len(cam_points) + len(tvs_points)):
+        cam_rows = RowPartition(cam_points, step)
+        tvs_rows = RowPartition(tvs_points, step)
+
+    print(f"    CAM rows: {len(cam_rows)} (step={step})")
+    print(f"    TVS rows: {len(tvs_rows)} (step={step})")
+
+    # Per-row counts, centroids, scatter and CAM-TVS cross matrices:
+    # lines, alignment and RMSE are derived from them (inlier pairs
+    # only in robust mode)
+    inliers = None
+    if robust_mode is None:
+        statistics = RowStatistics.from_rows(cam_rows, tvs_rows)
+    else:
+        robust = robust_inliers(cam_rows, tvs_rows, robust_mode, threshold=options['inlier_threshold'])
+        statistics = inlier_statistics(cam_rows, tvs_rows, robust['inliers'])
+        inliers = point_inliers(robust['inliers'], len(cam_points))
+
+        print(f"    Inlier pairs ({robust_mode}): {inliers.sum()}/{len(inliers)} "
+              f"(row ratio min={np.nanmin(robust['inlier_ratio']):.4f})")
+        if len(robust['fallback_rows']):
+            print(f"    Rows without enough inliers, all pairs kept: {robust['fallback_rows'].tolist()}")
+
+    # --------------------------------------------------------
+    # 3) Visualize raw point clouds (optional figures)
+    # --------------------------------------------------------
+    if figures:
+        plot_pointcloud(cam_rows, title=f"CAM point cloud {experiment_folder}")
+        plot_pointcloud(tvs_rows, title=f"TVS point cloud {experiment_folder}")
+
+    # --------------------------------------------------------
+    # 4) Fit lines per row
+    # --------------------------------------------------------
+    cam_lines, cam_linearity = fit_lines(statistics.cam, return_quality=True)
+    tvs_lines, tvs_linearity = fit_lines(statistics.tvs, return_quality=True)
+
+    print(f"    CAM fitted lines: {len(cam_lines)} "
+          f"(linearity min={cam_linearity.min():.4f}, mean={cam_linearity.mean():.4f})")
+    print(f"    TVS fitted lines: {len(tvs_lines)} "
+          f"(linearity min={tvs_linearity.min():.4f}, mean={tvs_linearity.mean():.4f})")
+
+    if figures:
+        plot_pointcloud_with_lines(
+            cam_rows, cam_lines, title=f"CAM lines {experiment_folder}"
+        )
+        plot_pointcloud_with_lines(
+            tvs_rows, tvs_lines, title=f"TVS lines {experiment_folder}"
+        )
+
+    # --------------------------------------------------------
+    # 5) Compute line direction vectors
+    # --------------------------------------------------------
+    cam_vectors = compute_line_vectors(cam_lines)
+    tvs_vectors = compute_line_vectors(tvs_lines)
+
+    if figures:
+        plot_pointcloud_with_lines_and_vectors(
+            cam_rows, cam_lines, cam_vectors, title=f"CAM vectors {experiment_folder}"
+        )
+        plot_pointcloud_with_lines_and_vectors(
+            tvs_rows, tvs_lines, tvs_vectors, title=f"TVS vectors {experiment_folder}"
+        )
+
+    # --------------------------------------------------------
+    # 6) Estimate rotations (CAM → TVS)
+    # --------------------------------------------------------
+    rotations = estimate_line_rotations(cam_vectors, tvs_vectors)
+    print(f"    Rotations estimated: {len(rotations)}")
+
+    # --------------------------------------------------------
+    # 7) Rotate / align CAM rows to TVS rows
+    # --------------------------------------------------------
+    cam_rows_aligned = rotate_rows(cam_rows, tvs_rows, rotations, statistics)
+
+    aligned_csv = os.path.join(processed_data_path, "camera_pointcloud_aligned.csv")
+    pointcloud_store.save_pointcloud(
+        os.path.join(processed_data_path, "P_CAM_aligned"),
+        cam_rows_aligned.xyz,
+        csv_path=aligned_csv if export_csv else None,
+        **cam_columns,
+        **({} if inliers is None else {'inlier': inliers})
+    )
+    print("    Saved P_CAM_aligned.npy")
+
+    # --------------------------------------------------------
+    # 8) Compare aligned CAM vs TVS
+    # --------------------------------------------------------
+    if figures:
+        plot_two_pointclouds(
+            cam_rows_aligned, tvs_rows,
+            title=f"CAM vs TVS comparison {experiment_folder}"
+        )
+
+    # --------------------------------------------------------
+    # 9) RMSE computation (analytic, from the row statistics)
+    # --------------------------------------------------------
+    with instrumentation.span("rmse", rows=len(statistics)):
+        rmse = statistics.rmse(np.array(rotations))
+    print(f"    RMSE: {rmse:.6f}")
+
+    rmse_row = {"Experiment": experiment_folder, "RMSE": rmse}
+
+    # Robust mode: RMSE of the inliers above, of every point here
+    if inliers is not None:
+        rmse_row.update(
+            RMSE_all=compute_rmse_rows(cam_rows_aligned, tvs_rows),
+            inlier_ratio=inliers.mean() if len(inliers) else np.nan,
+            robust_mode=robust_mode
+        )
+        print(f"    RMSE (all points): {rmse_row['RMSE_all']:.6f}, inlier ratio: {rmse_row['inlier_ratio']:.4f}")
+
+    # --------------------------------------------------------
+    # 10) Single global transform (optional, same pairs)
+    # --------------------------------------------------------
+    if global_mode is not None:
+        global_result = register_global(
+            statistics, similarity=global_mode == "similarity", rotations=np.array(rotations)
+        )
+        save_transform(global_transform_path, global_result)
+
+        pd.DataFrame({
+            "row": np.arange(len(statistics)),
+            "n_points": global_result['counts'],
+            "RMSE_rowwise": global_result['rowwise_row_rmse'],
+            "RMSE_global": global_result['row_rmse'],
+        }).to_csv(rmse_rows_csv, index=False)
+
+        rmse_row.update(RMSE_global=global_result['rmse'], global_scale=global_result['scale'])
+        print(f"    RMSE (global {global_mode}): {global_result['rmse']:.6f} "
+              f"(worst row: {np.nanmax(global_result['row_rmse']):.6f})")
+        print(f"    Saved global_transform.npz and RMSE_rows_{experiment_folder}.csv")
+
+    # Save per-experiment RMSE inside the experiment folder
+    pd.DataFrame([rmse_row]).to_csv(
+        rmse_csv_individual,
+        index=False
+    )
+    print(f"    Saved RMSE_{experiment_folder}.csv")
+
+    if cache is not None:
+        cache.record("alignment", stage_inputs, stage_parameters, stage_outputs)
+
+    # Show and close figures to free memory (no-op when headless)
+    if figures:
+        show_figures()
+
+    return rmse
@@ -0,0 +1,244 @@
+import functools
+import os
+
+
+# ============================================================
+# STAGES OF ONE EXPERIMENT
+#   The stages are implemented in data/stereo_laser_pointcloud.py,
+#   data/apply_displacement.py and data/align_pointclouds.py with
+#   explicit options (the numbered scripts only call them). Each
+#   stage module is imported on first use, so a call pays for the
+#   libraries of its own stage (OpenCV for the camera point cloud,
+#   pandas for steps 2-3, matplotlib only when figures are drawn).
+# ============================================================
+def camera_pointcloud(experiment_path, calibration_path=None, **options):
+    """
+    Step 1: stereo-laser camera point cloud of one experiment.
+
+    Parameters:
+        experiment_path: experiment folder (with raw_data)
+        calibration_path: stereo calibration XML (data/ of the repository
+                          if omitted)
+        **options: see CAMERA_DEFAULTS in data/stereo_laser_pointcloud.py
+                   (e.g. workers=4, tracking_mode=False)
+
+    Returns:
+        path of P_CAM (without extension)
+    """
+    from . import stereo_calibration
+    from . import stereo_laser_pointcloud
+
+    calibration = stereo_calibration.load_calibration(calibration_path)
+    stereo_laser_pointcloud.process_experiment(experiment_path, calibration, options)
+
+    return os.path.join(experiment_path, "processed_data", "P_CAM")
+
+
+def displacement(experiment_path, **options):
+    """
+    Step 2: TVS point clouds and displaced camera point cloud of one
+    experiment.
+
+    Parameters:
+        experiment_path: experiment folder (with raw_data and P_CAM)
+        **options: see DISPLACEMENT_DEFAULTS in data/apply_displacement.py
+
+    Returns:
+        validation status ("Correct" or "Mismatch"); raises RuntimeError
+        when a point cloud cannot be generated
+    """
+    from . import apply_displacement
+
+    processed_data_path = os.path.join(experiment_path, "processed_data")
+
+    status = apply_displacement.process_tvs_experiment(experiment_path, options)
+    if status not in ("Correct", "Mismatch"):
+        raise RuntimeError(status)
+
+    if not apply_displacement.apply_camera_displacement(processed_data_path, options):
+        raise RuntimeError("P_CAM_disp could not be generated")
+
+    return status
+
+
+def alignment(experiment_path, plot_mode="none", **options):
+    """
+    Step 3: row-wise registration of the displaced clouds and RMSE of one
+    experiment.
+
+    Parameters:
+        experiment_path: experiment folder (with P_CAM_disp and P_TVS_disp)
+        plot_mode: "none" or "files" (PNG files in processed_data/figures;
+                   the plotting mode is process-wide, see
+                   pointcloud_plotting.set_plot_mode)
+        **options: see ALIGNMENT_DEFAULTS in data/align_pointclouds.py
+                   (e.g. step=40)
+
+    Returns:
+        RMSE of the experiment
+    """
+    from . import align_pointclouds
+
+    experiment = os.path.basename(os.path.normpath(experiment_path))
+    processed_data_path = os.path.join(experiment_path, "processed_data")
+    cam_path = os.path.join(processed_data_path, "P_CAM_disp")
+    tvs_path = os.path.join(processed_data_path, "P_TVS_disp")
+
+    for path in (cam_path, tvs_path):
+        if not os.path.exists(f"{path}.npy"):
+            raise FileNotFoundError(f"Missing file: {path}.npy")
+
+    options = dict(options, plot_mode=plot_mode)
+
+    if plot_mode == "none":
+        return align_pointclouds.process_experiment(experiment, processed_data_path, cam_path, tvs_path, options)
+
+    from .pointcloud_plotting import set_plot_mode, close_plotting
+
+    set_plot_mode(plot_mode, output_dir=processed_data_path, workers=1)
+    try:
+        return align_pointclouds.process_experiment(experiment, processed_data_path, cam_path, tvs_path, options)
+    finally:
+        close_plotting()
+
+
+def register(cam_path, tvs_path, step=40, robust_mode=None, inlier_threshold=None, global_mode=None):
+    """
+    Row-wise registration of two saved point clouds (see pointcloud_store)
+    from their row statistics. Only needs numpy: no OpenCV, pandas or
+    matplotlib import, and nothing is written.
+
+    Parameters:
+        cam_path, tvs_path: point cloud paths without extension
+        step: number of rows
+        robust_mode: None, "irls" or "ransac" (see robust_fitting)
+        inlier_threshold: inlier distance to the row lines (m), None for
+                          3 robust standard deviations
+        global_mode: None, "rigid" or "similarity": also solve a single
+                     transform of the same pairs (see global_registration)
+
+    Returns:
+        dict of registration_engine.register_statistics (rotations,
+        centroids, directions, linearity, counts and 'rmse', of the
+        inlier pairs in robust mode), with 'inliers' (N,) per-point mask
+        and 'inlier_ratio' (n_rows,) in robust mode, and 'global' (dict
+        of global_registration.register_global) with a global_mode
+    """
+    from . import pointcloud_store
+    from .global_registration import register_global
+    from .registration_engine import register_statistics
+    from .robust_fitting import robust_inliers, inlier_statistics, point_inliers
+    from .row_statistics import RowStatistics
+    from .split_rows import RowPartition
+
+    cam_points, _ = pointcloud_store.load_pointcloud(cam_path)
+    tvs_points, _ = pointcloud_store.load_pointcloud(tvs_path)
+
+    cam_rows = RowPartition(cam_points, step)
+    tvs_rows = RowPartition(tvs_points, step)
+
+    if robust_mode is None:
+        statistics = RowStatistics.from_rows(cam_rows, tvs_rows)
+        result = register_statistics(statistics)
+    else:
+        robust = robust_inliers(cam_rows, tvs_rows, robust_mode, threshold=inlier_threshold)
+        statistics = inlier_statistics(cam_rows, tvs_rows, robust['inliers'])
+        result = register_statistics(statistics)
+        result['inliers'] = point_inliers(robust['inliers'], len(cam_points))
+        result['inlier_ratio'] = robust['inlier_ratio']
+
+    if global_mode is not None:
+        result['global'] = register_global(
+            statistics, similarity=global_mode == "similarity", rotations=result['rotations']
+        )
+
+    return result
+
+
+def global_transform(cam_path, tvs_path, similarity=False, chunk_size=None):
+    """
+    Single rigid (or similarity) transform of two saved point clouds
+    with point-to-point correspondence, in one streaming pass over the
+    memory-mapped clouds (no row split). Only needs numpy.
+
+    Parameters:
+        cam_path, tvs_path: point cloud paths without extension
+        similarity: also estimate a uniform scale
+        chunk_size: points read at once (default CHUNK_POINTS)
+
+    Returns:
+        (4, 4) transform mapping CAM points onto TVS points (see
+        global_registration.apply_transform) and the RMSE of all the pairs
+    """
+    from . import pointcloud_store
+    from .global_registration import (
+        CHUNK_POINTS, stream_statistics, umeyama, transform_matrix, transform_squared_errors
+    )
+
+    cam_points, _ = pointcloud_store.load_pointcloud(cam_path)
+    tvs_points, _ = pointcloud_store.load_pointcloud(tvs_path)
+
+    statistics = stream_statistics(cam_points, tvs_points, chunk_size=chunk_size or CHUNK_POINTS)
+    rotation, translation, scale = umeyama(statistics, similarity)
+
+    squared_errors = transform_squared_errors(statistics, rotation, translation, scale)
+    rmse = float(squared_errors.sum() / statistics.n_points) ** 0.5
+
+    return transform_matrix(rotation, translation, scale), rmse
+
+
+# ============================================================
+# WHOLE PIPELINE
+# ============================================================
+def _run_step(function, experiments_dir, options, experiment):
+    function(os.path.join(experiments_dir, experiment), **options)
+
+
+def _init_worker():
+    # One experiment per process: no nested thread pools
+    import cv2
+    cv2.setNumThreads(1)
+
+
+def run_pipeline(experiments_dir, selection=None, workers=1, calibration_path=None, plot_mode="none",
+                 output_csv=None):
+    """
+    Steps 1 -> 2 -> 3 on every selected experiment (see pipeline_runner).
+
+    Parameters:
+        experiments_dir: folder holding the experiment folders
+        selection: None (all) or a selection of pipeline_runner.select_experiments
+        workers: experiments processed in parallel (1 = serial)
+        calibration_path: stereo calibration XML (data/ of the repository
+                          if omitted)
+        plot_mode: figures of step 3, "none" or "files"
+        output_csv: optional path of the status table
+
+    Returns:
+        DataFrame with the status of every step of every experiment
+    """
+    from .pipeline_runner import discover_experiments, select_experiments
+    from .pipeline_runner import run_pipeline as run_steps
+
+    experiments = select_experiments(discover_experiments(experiments_dir), selection)
+    parallel = workers > 1 and len(experiments) > 1
+
+    # Step 1 runs serially inside each worker process
+    camera_options = {'calibration_path': calibration_path}
+    if parallel:
+        camera_options['workers'] = 1
+
+    steps = [
+        ("step1_camera", camera_pointcloud, camera_options),
+        ("step2_displacement", displacement, {}),
+        ("step3_registration", alignment, {'plot_mode': plot_mode}),
+    ]
+
+    return run_steps(
+        experiments,
+        [(name, functools.partial(_run_step, function, experiments_dir, options))
+         for name, function, options in steps],
+        workers=min(workers, max(len(experiments), 1)),
+        initializer=_init_worker if parallel else None,
+        output_csv=output_csv
+    )
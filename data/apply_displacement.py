@@ -0,0 +1,280 @@
+import os
+
+import numpy as np
+
+from . import instrumentation
+from . import pointcloud_store
+from . import stage_cache
+from . import tvs_loader
+
+
+# ============================================================
+# OPTIONS
+#   export_csv   -> also write the CSV files next to the .npy point
+#                   clouds (P_TVS, P_TVS_disp, P_CAM_disp)
+#   use_cache    -> skip a stage whose inputs, parameters and outputs
+#                   are unchanged (see stage_cache)
+#   content_hash -> compare file contents instead of mtime/size
+#   run_reports  -> processed_data/run_report_<stage>.json/.csv
+#                   (see instrumentation)
+#   profiler     -> None, "cprofile" or "pyinstrument"
+# ============================================================
+DISPLACEMENT_DEFAULTS = {
+    'export_csv': True,
+    'use_cache': True,
+    'content_hash': False,
+    'run_reports': True,
+    'profiler': None,
+}
+
+
+def displacement_options(options=None):
+    """DISPLACEMENT_DEFAULTS overridden by options; unknown names raise TypeError."""
+    options = dict(options or {})
+
+    unknown = sorted(set(options) - set(DISPLACEMENT_DEFAULTS))
+    if unknown:
+        raise TypeError(f"Unknown displacement options: {', '.join(unknown)}")
+
+    return {**DISPLACEMENT_DEFAULTS, **options}
+
+
+# ============================================================
+# RUN REPORTS
+# ============================================================
+def instrumented_stage(stage, processed_data_path, options, function, *args):
+    """Runs one stage of an experiment and writes its run report."""
+    with instrumentation.run_report(
+        os.path.join(processed_data_path, f"run_report_{stage}"),
+        enabled=options['run_reports'], profiler=options['profiler'],
+        stage=stage, experiment=os.path.basename(os.path.dirname(processed_data_path))
+    ):
+        return function(*args)
+
+
+# ============================================================
+# PHASE A: TVS POINT CLOUD PROCESSING
+# ============================================================
+def process_tvs_experiment(subfolder_path, options=None):
+    """
+    Builds the TVS point clouds (P_TVS, P_TVS_disp) of one experiment.
+
+    Parameters:
+        subfolder_path: experiment folder (with raw_data)
+        options: dict overriding DISPLACEMENT_DEFAULTS
+
+    Returns:
+        validation status ("Correct", "Mismatch" or the configuration error)
+    """
+    options = displacement_options(options)
+
+    return instrumented_stage(
+        "tvs_pointcloud", os.path.join(subfolder_path, "processed_data"), options,
+        build_tvs_pointcloud, subfolder_path, options
+    )
+
+
+def build_tvs_pointcloud(subfolder_path, options):
+    raw_data_path = os.path.join(subfolder_path, "raw_data")
+    processed_data_path = os.path.join(subfolder_path, "processed_data")
+
+    if not (os.path.isdir(subfolder_path) and os.path.isdir(raw_data_path)):
+        print("    Skipped: required directories not found\n")
+        return "Missing experiment/raw_data folder"
+
+    os.makedirs(processed_data_path, exist_ok=True)
+    print("    Output directory verified")
+
+    displacement_path = os.path.join(raw_data_path, "displacement.csv")
+    if not os.path.exists(displacement_path):
+        print("    Missing displacement.csv\n")
+        return "Missing displacement.csv"
+
+    # Read incremental displacements (cm → m) and accumulate them
+    accumulated_displacements = tvs_loader.accumulated_displacements(displacement_path)
+    print(f"    Read {len(accumulated_displacements) - 1} incremental displacements")
+    print(f"    Accumulated displacement count: {len(accumulated_displacements)}")
+
+    # TVS CSV files in stop order (tvs_2 before tvs_10)
+    tvs_files = tvs_loader.list_tvs_files(raw_data_path)
+
+    print(f"    Found {len(tvs_files)} TVS CSV files")
+
+    if len(tvs_files) != len(accumulated_displacements):
+        print("    Configuration error: TVS files and displacement count mismatch\n")
+        return "Configuration error (count mismatch)"
+
+    # Consistency check
+    num_imgs = len([
+        f for f in os.listdir(raw_data_path)
+        if f.lower().endswith(".jpg")
+    ])
+
+    status = "Correct" if len(tvs_files) == num_imgs else "Mismatch"
+
+    # Stage cache
+    export_csv = options['export_csv']
+    cache = (
+        stage_cache.StageCache(processed_data_path, options['content_hash'])
+        if options['use_cache'] else None
+    )
+    stage_inputs = [displacement_path] + [os.path.join(raw_data_path, f) for f in tvs_files]
+    stage_parameters = {'export_csv': export_csv, 'columns': tvs_loader.TVS_COLUMNS}
+    stage_outputs = [
+        os.path.join(processed_data_path, name)
+        for name in ("P_TVS.npy", "P_TVS_meta.npz", "P_TVS_disp.npy", "P_TVS_disp_meta.npz")
+    ]
+    if export_csv:
+        stage_outputs += [
+            os.path.join(processed_data_path, name)
+            for name in ("tvs_pointcloud_without_displacement.csv",
+                         "tvs_pointcloud_with_displacement.csv",
+                         "DisplacementVector.csv")
+        ]
+
+    if cache is not None and cache.is_valid("tvs_pointcloud", stage_inputs, stage_parameters, stage_outputs):
+        print("    TVS point clouds are up to date, skipped")
+        print(f"    Validation: TVS files = {len(tvs_files)}, images = {num_imgs} -> {status}\n")
+        return status
+
+    # All TVS files in one preallocated array, displaced per stop
+    tvs = tvs_loader.load_tvs_experiment(raw_data_path, tvs_files, accumulated_displacements)
+
+    points_per_file = np.bincount(tvs["k"], minlength=len(tvs_files))
+    for idx, filename in enumerate(tvs_files):
+        print(f"        TVS file {idx+1}/{len(tvs_files)}: {filename}, points read: {points_per_file[idx]}")
+
+    # Index, angle and timestamp columns of every point
+    tvs_columns = {
+        name: tvs[name]
+        for name in ["k", "j"] + tvs_loader.TVS_COLUMNS[3:]
+    }
+
+    pointcloud_store.save_pointcloud(
+        os.path.join(processed_data_path, "P_TVS"),
+        tvs["xyz"],
+        **tvs_columns
+    )
+    print("    Saved P_TVS.npy")
+
+    pointcloud_store.save_pointcloud(
+        os.path.join(processed_data_path, "P_TVS_disp"),
+        tvs["xyz_disp"],
+        displacement=tvs["displacement"],
+        **tvs_columns
+    )
+    print("    Saved P_TVS_disp.npy")
+
+    if export_csv:
+        import pandas as pd
+
+        df_without_disp = pd.DataFrame(tvs["xyz"], columns=["X", "Y", "Z"])
+        df_with_disp = pd.DataFrame(tvs["xyz_disp"], columns=["X", "Y", "Z"])
+
+        df_without_disp.to_csv(
+            os.path.join(processed_data_path, "tvs_pointcloud_without_displacement.csv"),
+            index=False
+        )
+        print("    Saved tvs_pointcloud_without_displacement.csv")
+
+        df_with_disp.to_csv(
+            os.path.join(processed_data_path, "tvs_pointcloud_with_displacement.csv"),
+            index=False
+        )
+        print("    Saved tvs_pointcloud_with_displacement.csv")
+
+        pd.DataFrame(tvs["displacement"]).to_csv(
+            os.path.join(processed_data_path, "DisplacementVector.csv"),
+            index=False,
+            header=False
+        )
+        print("    Saved DisplacementVector.csv")
+
+    if cache is not None:
+        cache.record("tvs_pointcloud", stage_inputs, stage_parameters, stage_outputs)
+
+    print(f"    Validation: TVS files = {len(tvs_files)}, images = {num_imgs} -> {status}\n")
+
+    return status
+
+
+# ============================================================
+# PHASE B: APPLY DISPLACEMENT TO CAMERA POINT CLOUD
+# ============================================================
+def apply_camera_displacement(processed_data_path, options=None):
+    """
+    Applies the TVS displacement vector to the camera point cloud of one
+    experiment (P_CAM -> P_CAM_disp).
+
+    Parameters:
+        processed_data_path: processed_data folder of the experiment
+        options: dict overriding DISPLACEMENT_DEFAULTS
+
+    Returns:
+        True if P_CAM_disp was saved or is up to date, False otherwise
+    """
+    options = displacement_options(options)
+
+    return instrumented_stage(
+        "camera_displacement", processed_data_path, options,
+        build_camera_displacement, processed_data_path, options
+    )
+
+
+def build_camera_displacement(processed_data_path, options):
+    cam_path = os.path.join(processed_data_path, "P_CAM")
+    tvs_path = os.path.join(processed_data_path, "P_TVS_disp")
+    out_path = os.path.join(processed_data_path, "P_CAM_disp")
+
+    if not (pointcloud_store.pointcloud_exists(cam_path) and pointcloud_store.pointcloud_exists(tvs_path)):
+        print("    Required files not found\n")
+        return False
+
+    export_csv = options['export_csv']
+    cache = (
+        stage_cache.StageCache(processed_data_path, options['content_hash'])
+        if options['use_cache'] else None
+    )
+    stage_inputs = [
+        cam_path + ".npy", cam_path + "_meta.npz",
+        tvs_path + ".npy", tvs_path + "_meta.npz"
+    ]
+    stage_parameters = {'export_csv': export_csv}
+    stage_outputs = [out_path + ".npy", out_path + "_meta.npz"]
+    if export_csv:
+        stage_outputs.append(os.path.join(processed_data_path, "camera_pointcloud_with_displacement.csv"))
+
+    if cache is not None and cache.is_valid("camera_displacement", stage_inputs, stage_parameters, stage_outputs):
+        print("    P_CAM_disp is up to date, skipped\n")
+        return True
+
+    cam_points, cam_columns = pointcloud_store.load_pointcloud(cam_path)
+    _, tvs_columns = pointcloud_store.load_pointcloud(tvs_path)
+    displacement_vec = tvs_columns["displacement"]
+
+    print(f"    Camera points: {len(cam_points)}")
+    print(f"    Displacement vector length: {len(displacement_vec)}")
+
+    if len(cam_points) != len(displacement_vec):
+        print("    Dimension mismatch\n")
+        return False
+
+    cam_shifted = np.array(cam_points)
+    cam_shifted[:, 1] += displacement_vec
+
+    pointcloud_store.save_pointcloud(
+        out_path,
+        cam_shifted,
+        csv_path=(
+            os.path.join(processed_data_path, "camera_pointcloud_with_displacement.csv")
+            if export_csv else None
+        ),
+        displacement=displacement_vec,
+        **cam_columns
+    )
+    print("    Saved P_CAM_disp.npy\n")
+
+    if cache is not None:
+        cache.record("camera_displacement", stage_inputs, stage_parameters, stage_outputs)
+
+    return True
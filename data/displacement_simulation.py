@@ -0,0 +1,276 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from . import pointcloud_store
+from .registration_engine import rows_to_tensor_batch, register_statistics
+from .row_statistics import RowStatistics
+
+
+# ============================================================
+# SCENARIO PARAMETERS
+#   Lengths in metres, angles in degrees. Every trial draws:
+#     - a rigid motion per stop k: the nominal platform
+#       translation along Y (times displacement_scale), plus a
+#       random translation (stop_translation_sigma) and rotation
+#       (stop_rotation_sigma), applied to both clouds
+#     - a rigid motion of the whole CAM cloud with a random axis
+#       and direction and fixed magnitudes (cam_rotation,
+#       cam_translation)
+#     - isotropic Gaussian noise on both clouds and a fraction of
+#       CAM outliers
+# ============================================================
+SCENARIO_DEFAULTS = {
+    'step': 40,
+    'displacement_scale': 1.0,
+    'stop_translation_sigma': 0.0,
+    'stop_rotation_sigma': 0.0,
+    'cam_rotation': 0.0,
+    'cam_translation': 0.0,
+    'cam_noise_sigma': 0.0,
+    'tvs_noise_sigma': 0.0,
+    'outlier_fraction': 0.0,
+    'outlier_sigma': 0.01,
+}
+
+
+# ============================================================
+# BASE DATA
+# ============================================================
+def load_simulation_base(processed_data_path):
+    """
+    Undisplaced CAM and TVS clouds of an experiment, paired by their
+    (k, j) index, with the nominal displacement of every stop.
+
+    Returns:
+        dict with 'cam' and 'tvs' (N, 3) arrays, 'k' (N,) stop indices and
+        'displacements' (n_stops,) accumulated displacement of every stop (m)
+    """
+    cam, cam_columns = pointcloud_store.load_pointcloud(os.path.join(processed_data_path, "P_CAM"))
+    tvs, tvs_columns = pointcloud_store.load_pointcloud(os.path.join(processed_data_path, "P_TVS"))
+    _, tvs_disp_columns = pointcloud_store.load_pointcloud(os.path.join(processed_data_path, "P_TVS_disp"))
+
+    if 'k' not in cam_columns or 'k' not in tvs_columns:
+        raise ValueError("P_CAM and P_TVS need their (k, j) index; rerun steps 1 and 2")
+
+    # Point pairs with the same (k, j) index
+    width = max(int(tvs_columns['j'].max(initial=0)), int(cam_columns['j'].max(initial=0))) + 1
+    _, cam_index, tvs_index = np.intersect1d(
+        cam_columns['k'] * width + cam_columns['j'],
+        tvs_columns['k'] * width + tvs_columns['j'],
+        return_indices=True
+    )
+
+    # Accumulated displacement of every stop
+    displacements = np.zeros(int(tvs_columns['k'].max(initial=-1)) + 1)
+    displacements[tvs_columns['k']] = tvs_disp_columns['displacement']
+
+    return {
+        'cam': np.asarray(cam[cam_index], dtype=np.float64),
+        'tvs': np.asarray(tvs[tvs_index], dtype=np.float64),
+        'k': tvs_columns['k'][tvs_index],
+        'displacements': displacements,
+    }
+
+
+# ============================================================
+# BATCHED RIGID TRANSFORMS
+# ============================================================
+def axis_angle_rotations(axes, angles):
+    """Rotation matrices (..., 3, 3) from unit axes (..., 3) and angles (...) in radians (Rodrigues)."""
+    x, y, z = np.moveaxis(axes, -1, 0)
+    zero = np.zeros_like(x)
+
+    skew = np.stack([
+        np.stack([zero, -z, y], axis=-1),
+        np.stack([z, zero, -x], axis=-1),
+        np.stack([-y, x, zero], axis=-1),
+    ], axis=-2)
+
+    sin = np.sin(angles)[..., None, None]
+    cos = np.cos(angles)[..., None, None]
+
+    return np.eye(3) + sin * skew + (1 - cos) * skew @ skew
+
+
+def random_unit_vectors(rng, shape):
+    vectors = rng.normal(size=shape + (3,))
+    return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+
+def random_rotations(rng, shape, sigma=None, angle=None):
+    """
+    Random rotations (shape + (3, 3)) about uniformly distributed axes,
+    with Gaussian angles of standard deviation sigma or a fixed angle
+    (degrees).
+    """
+    if angle is not None:
+        angles = np.full(shape, np.radians(angle))
+    else:
+        angles = rng.normal(scale=np.radians(sigma), size=shape)
+
+    return axis_angle_rotations(random_unit_vectors(rng, shape), angles)
+
+
+def simulate_batch(base, scenario, n_trials, rng):
+    """
+    Perturbed, displaced CAM and TVS clouds of n_trials Monte Carlo trials.
+
+    Returns:
+        cam, tvs: (n_trials, N, 3) arrays
+    """
+    k = base['k']
+    n_stops = len(base['displacements'])
+
+    # Rigid motion of every stop: nominal translation along Y plus jitter
+    translations = np.zeros((n_trials, n_stops, 3))
+    translations[:, :, 1] = scenario['displacement_scale'] * base['displacements']
+    translations += rng.normal(scale=scenario['stop_translation_sigma'], size=(n_trials, n_stops, 3))
+    rotations = random_rotations(rng, (n_trials, n_stops), sigma=scenario['stop_rotation_sigma'])
+
+    cam = np.einsum('bnij,nj->bni', rotations[:, k], base['cam']) + translations[:, k]
+    tvs = np.einsum('bnij,nj->bni', rotations[:, k], base['tvs']) + translations[:, k]
+
+    # Rigid motion of the whole CAM cloud
+    if scenario['cam_rotation'] or scenario['cam_translation']:
+        cam_rotation = random_rotations(rng, (n_trials,), angle=scenario['cam_rotation'])
+        cam_translation = scenario['cam_translation'] * random_unit_vectors(rng, (n_trials,))
+        cam = cam @ cam_rotation.transpose(0, 2, 1) + cam_translation[:, None, :]
+
+    # Measurement noise and outliers
+    if scenario['cam_noise_sigma']:
+        cam += rng.normal(scale=scenario['cam_noise_sigma'], size=cam.shape)
+    if scenario['tvs_noise_sigma']:
+        tvs += rng.normal(scale=scenario['tvs_noise_sigma'], size=tvs.shape)
+    if scenario['outlier_fraction']:
+        outliers = rng.random(cam.shape[:2]) < scenario['outlier_fraction']
+        cam[outliers] += rng.normal(scale=scenario['outlier_sigma'], size=(outliers.sum(), 3))
+
+    return cam, tvs
+
+
+def register_batch(cam, tvs, step):
+    """
+    Row-wise registration of every trial of a batch at once.
+
+    Returns:
+        (n_trials,) RMSE of every trial
+    """
+    cam_rows, counts = rows_to_tensor_batch(cam, step)
+    tvs_rows, _ = rows_to_tensor_batch(tvs, step)
+
+    statistics = RowStatistics.from_row_tensors(cam_rows, tvs_rows, counts)
+    result = register_statistics(statistics)
+
+    squared_errors = statistics.squared_errors(result['rotations']).reshape(len(cam), step)
+    n_points = counts.reshape(len(cam), step).sum(axis=1)
+
+    return np.sqrt(squared_errors.sum(axis=1) / n_points)
+
+
+# ============================================================
+# MONTE CARLO RUNS
+# ============================================================
+def run_trials(base, scenario=None, n_trials=1000, seed=0, batch_size=256):
+    """
+    Monte Carlo trials of one scenario on one experiment, registered in
+    batches straight from memory (nothing is written to disk).
+
+    Parameters:
+        base: dict of load_simulation_base
+        scenario: dict overriding SCENARIO_DEFAULTS
+        n_trials: number of trials
+        seed: seed of the random generator (trials are reproducible for a
+              given seed and batch_size)
+        batch_size: trials registered at once
+
+    Returns:
+        (n_trials,) RMSE of every trial
+    """
+    scenario = {**SCENARIO_DEFAULTS, **(scenario or {})}
+    rng = np.random.default_rng(seed)
+
+    rmse = np.empty(n_trials)
+    for start in range(0, n_trials, batch_size):
+        n = min(batch_size, n_trials - start)
+        cam, tvs = simulate_batch(base, scenario, n, rng)
+        rmse[start:start + n] = register_batch(cam, tvs, scenario['step'])
+
+    return rmse
+
+
+# Columns of the per-trial results table
+RESULT_COLUMNS = ['Experiment', 'scenario', 'seed', 'trial', 'RMSE']
+
+_bases = {}
+
+
+def _simulation_task(task):
+    """Worker task: runs the trials of one (experiment, scenario), loading each experiment once per process."""
+    experiment_name, processed_data_path, scenario_name, scenario, n_trials, seed = task
+
+    if processed_data_path not in _bases:
+        _bases[processed_data_path] = load_simulation_base(processed_data_path)
+
+    rmse = run_trials(_bases[processed_data_path], scenario, n_trials, seed)
+
+    return pd.DataFrame({
+        'Experiment': experiment_name,
+        'scenario': scenario_name,
+        'seed': seed,
+        'trial': np.arange(n_trials),
+        'RMSE': rmse,
+    })
+
+
+def run_simulation(experiments, scenarios, n_trials=1000, seed=0, workers=1, output_csv=None):
+    """
+    Runs every scenario on every experiment.
+
+    Parameters:
+        experiments: dict {experiment name: processed_data path}
+        scenarios: dict {scenario name: dict overriding SCENARIO_DEFAULTS}
+        n_trials: Monte Carlo trials per (experiment, scenario)
+        seed: base seed; each (experiment, scenario) gets its own stream
+        workers: number of worker processes (1 = serial)
+        output_csv: optional path of the per-trial results table
+
+    Returns:
+        DataFrame with one row per trial
+    """
+    seeds = np.random.SeedSequence(seed).spawn(len(experiments) * len(scenarios))
+    tasks = [
+        (name, path, scenario_name, scenario, n_trials,
+         int(seeds[i * len(scenarios) + s].generate_state(1)[0]))
+        for i, (name, path) in enumerate(experiments.items())
+        for s, (scenario_name, scenario) in enumerate(scenarios.items())
+    ]
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_simulation_task, tasks))
+    else:
+        results = [_simulation_task(task) for task in tasks]
+
+    df_results = pd.concat(results, ignore_index=True) if results else pd.DataFrame(columns=RESULT_COLUMNS)
+
+    if output_csv is not None:
+        df_results.to_csv(output_csv, index=False)
+
+    return df_results
+
+
+def summarize_simulation(df_results):
+    """RMSE statistics per (experiment, scenario): mean, std and percentiles."""
+    grouped = df_results.groupby(['Experiment', 'scenario'], sort=False)['RMSE']
+
+    return grouped.agg(
+        trials='count',
+        mean='mean',
+        std='std',
+        p05=lambda rmse: rmse.quantile(0.05),
+        median='median',
+        p95=lambda rmse: rmse.quantile(0.95),
+    ).reset_index()
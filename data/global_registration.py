@@ -0,0 +1,237 @@
+import numpy as np
+
+from .instrumentation import instrumented
+from .row_statistics import RowStatistics
+
+
+# Point pairs read at once by stream_statistics
+CHUNK_POINTS = 1 << 20
+
+
+# ============================================================
+# GLOBAL MOMENTS
+#   A single rigid (or similarity) transform of all the point
+#   pairs only needs the moments of the whole set: the number of
+#   pairs, both centroids, the CAM scatter matrix and the 3x3
+#   CAM-TVS cross matrix. They are kept as a one-row
+#   RowStatistics, obtained either
+#     - exactly from the per-row statistics of the row-wise
+#       registration (no pass over the points), or
+#     - in one streaming pass over two (memory-mapped) clouds,
+#       merging the moments of fixed-size chunks.
+# ============================================================
+def pooled_statistics(statistics):
+    """
+    Statistics of the union of all the rows of a RowStatistics, as a
+    one-row RowStatistics (exact, from the per-row moments).
+    """
+    counts = statistics.counts
+    n = counts.sum()
+
+    if n == 0:
+        return RowStatistics.empty(1)
+
+    weights = counts[:, None] / n
+    cam_mean = (weights * statistics.cam_mean).sum(axis=0)
+    tvs_mean = (weights * statistics.tvs_mean).sum(axis=0)
+
+    # Spread of the row centroids about the global centroids
+    delta_cam = (statistics.cam_mean - cam_mean) * (counts[:, None] > 0)
+    delta_tvs = (statistics.tvs_mean - tvs_mean) * (counts[:, None] > 0)
+
+    return RowStatistics(
+        [n], cam_mean[None], tvs_mean[None],
+        (statistics.cam_scatter.sum(axis=0) + np.einsum('r,ri,rj->ij', counts, delta_cam, delta_cam))[None],
+        (statistics.tvs_scatter.sum(axis=0) + np.einsum('r,ri,rj->ij', counts, delta_tvs, delta_tvs))[None],
+        (statistics.cross.sum(axis=0) + np.einsum('r,ri,rj->ij', counts, delta_cam, delta_tvs))[None]
+    )
+
+
+def _chunk_statistics(cam, tvs):
+    cam_mean = cam.mean(axis=0)
+    tvs_mean = tvs.mean(axis=0)
+
+    cam_centered = cam - cam_mean
+    tvs_centered = tvs - tvs_mean
+
+    return RowStatistics(
+        [len(cam)], cam_mean[None], tvs_mean[None],
+        (cam_centered.T @ cam_centered)[None],
+        (tvs_centered.T @ tvs_centered)[None],
+        (cam_centered.T @ tvs_centered)[None]
+    )
+
+
+@instrumented(count=lambda statistics: {'points': statistics.n_points})
+def stream_statistics(cam_points, tvs_points, mask=None, chunk_size=CHUNK_POINTS):
+    """
+    One-row RowStatistics of all the corresponding pairs of two clouds,
+    in one pass over chunks of chunk_size points: memory-mapped clouds
+    are never loaded whole.
+
+    Parameters:
+        cam_points, tvs_points: (N, 3) corresponding points (pair i = point i)
+        mask: optional (N,) boolean mask of the pairs to use (e.g. inliers)
+        chunk_size: points per chunk
+    """
+    if len(cam_points) != len(tvs_points):
+        raise ValueError(
+            f"CAM ({len(cam_points)}) and TVS ({len(tvs_points)}) point clouds differ in size"
+        )
+
+    total = RowStatistics.empty(1)
+
+    for start in range(0, len(cam_points), chunk_size):
+        cam = np.asarray(cam_points[start:start + chunk_size], dtype=np.float64)
+        tvs = np.asarray(tvs_points[start:start + chunk_size], dtype=np.float64)
+
+        if mask is not None:
+            keep = np.asarray(mask[start:start + chunk_size], dtype=bool)
+            cam, tvs = cam[keep], tvs[keep]
+
+        if len(cam):
+            total = total.merge(_chunk_statistics(cam, tvs))
+
+    return total
+
+
+# ============================================================
+# CLOSED-FORM TRANSFORM (Kabsch / Umeyama)
+# ============================================================
+def umeyama(statistics, similarity=False):
+    """
+    Rigid (or similarity) transform q ~ s R p + t minimizing the sum of
+    squared distances of all the pairs, from their global moments: SVD of
+    the 3x3 cross matrix C = U S V^T, R = V D U^T with D = diag(1, 1, +-1)
+    so that det(R) = 1, and s = tr(S D) / tr(S_cam) (s = 1 when rigid).
+
+    Parameters:
+        statistics: one-row RowStatistics (pooled_statistics or
+                    stream_statistics)
+        similarity: also estimate the uniform scale
+
+    Returns:
+        rotation (3, 3), translation (3,), scale
+    """
+    if statistics.n_points < 3:
+        raise ValueError(f"At least 3 point pairs are needed, got {statistics.n_points}")
+
+    U, S, Vt = np.linalg.svd(statistics.cross[0])
+
+    D = np.ones(3)
+    D[2] = np.sign(np.linalg.det(Vt.T @ U.T)) or 1.0
+
+    rotation = (Vt.T * D) @ U.T
+
+    scale = 1.0
+    if similarity:
+        scale = float((S * D).sum() / np.trace(statistics.cam_scatter[0]))
+
+    translation = statistics.tvs_mean[0] - scale * rotation @ statistics.cam_mean[0]
+
+    return rotation, translation, scale
+
+
+def transform_matrix(rotation, translation, scale=1.0):
+    """4x4 homogeneous matrix of q = s R p + t."""
+    matrix = np.eye(4)
+    matrix[:3, :3] = scale * rotation
+    matrix[:3, 3] = translation
+    return matrix
+
+
+def apply_transform(points, transform):
+    """Applies a 4x4 transform (transform_matrix) to (N, 3) points."""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    return points @ transform[:3, :3].T + transform[:3, 3]
+
+
+# ============================================================
+# RESIDUALS
+# ============================================================
+def transform_squared_errors(statistics, rotation, translation, scale=1.0):
+    """
+    Sum of squared distances of every row after the single transform
+    q_hat = s R p + t, from the row statistics:
+        s^2 tr(S_cam_i) + tr(S_tvs_i) - 2 s tr(R C_i)
+        + n_i |s R c_cam_i + t - c_tvs_i|^2
+    """
+    offsets = scale * statistics.cam_mean @ rotation.T + translation - statistics.tvs_mean
+
+    errors = (
+        scale ** 2 * np.trace(statistics.cam_scatter, axis1=1, axis2=2)
+        + np.trace(statistics.tvs_scatter, axis1=1, axis2=2)
+        - 2 * scale * np.einsum('ij,rji->r', rotation, statistics.cross)
+        + statistics.counts * np.sum(offsets ** 2, axis=1)
+    )
+
+    return np.maximum(np.where(statistics.counts > 0, errors, 0.0), 0.0)
+
+
+def _row_rmse(squared_errors, counts):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, np.sqrt(squared_errors / counts), np.nan)
+
+
+@instrumented(count=lambda result: {'rows': len(result['counts'])})
+def register_global(statistics, similarity=False, rotations=None):
+    """
+    Single transform of all the point pairs of a RowStatistics, with its
+    residuals next to those of the row-wise registration.
+
+    Parameters:
+        statistics: per-row RowStatistics
+        similarity: also estimate a uniform scale (Umeyama)
+        rotations: optional (n_rows, 3, 3) row-wise rotations, to report
+                   the row-wise residuals of the same rows
+
+    Returns:
+        dict with
+            'rotation', 'translation', 'scale' and 'transform' (4x4)
+            'rmse': global RMSE of the single transform
+            'row_rmse': (n_rows,) RMSE of every row (NaN for empty rows)
+            'counts': (n_rows,) point pairs per row
+            'rowwise_row_rmse': (n_rows,) RMSE of every row after the
+                                row-wise alignment (only with rotations)
+    """
+    rotation, translation, scale = umeyama(pooled_statistics(statistics), similarity)
+
+    squared_errors = transform_squared_errors(statistics, rotation, translation, scale)
+
+    result = {
+        'rotation': rotation,
+        'translation': translation,
+        'scale': scale,
+        'transform': transform_matrix(rotation, translation, scale),
+        'rmse': np.sqrt(squared_errors.sum() / statistics.n_points),
+        'row_rmse': _row_rmse(squared_errors, statistics.counts),
+        'counts': statistics.counts,
+    }
+
+    if rotations is not None:
+        result['rowwise_row_rmse'] = _row_rmse(
+            statistics.squared_errors(np.asarray(rotations)), statistics.counts
+        )
+
+    return result
+
+
+# ============================================================
+# STORAGE
+# ============================================================
+def save_transform(path, result):
+    """Saves the transform of register_global to an .npz file."""
+    np.savez(
+        path,
+        transform=result['transform'],
+        rotation=result['rotation'],
+        translation=result['translation'],
+        scale=result['scale'],
+        rmse=result['rmse']
+    )
+
+
+def load_transform(path):
+    """4x4 transform saved by save_transform."""
+    with np.load(path) as data:
+        return data['transform']
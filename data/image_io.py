@@ -0,0 +1,170 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from . import laser_detection
+from .instrumentation import instrumented
+
+
+# JPEG decoding at 1/scale resolution (DCT scaling in libjpeg)
+READ_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+def jpeg_complete(data):
+    """
+    False for JPEG bytes without their end-of-image marker (FF D9), e.g. a
+    file still being written: OpenCV decodes such a truncated image without
+    error, with its missing lines grey. Trailing zero padding is ignored;
+    other formats are considered complete.
+    """
+    if data.size < 2 or data[0] != 0xFF or data[1] != 0xD8:
+        return True
+
+    end = len(data)
+    while end > 2 and data[end - 1] == 0:
+        end -= 1
+
+    return data[end - 2] == 0xFF and data[end - 1] == 0xD9
+
+
+@instrumented(count=lambda image: {'frames': int(image is not None)})
+def read_image(path, scale=1):
+    """
+    Reads a BGR image, optionally decoded at reduced resolution.
+
+    Parameters:
+        path: image file
+        scale: 1, 2, 4 or 8 (the image is decoded at 1/scale)
+
+    Returns:
+        BGR array, or None when the file is missing, empty, truncated (see
+        jpeg_complete) or cannot be decoded.
+    """
+    try:
+        data = np.fromfile(path, dtype=np.uint8)
+    except OSError:
+        return None
+
+    if data.size == 0 or not jpeg_complete(data):
+        return None
+
+    return cv2.imdecode(data, READ_FLAGS[scale])
+
+
+# ============================================================
+# COARSE SPOT SEARCH
+#   The raw side-by-side frame is decoded at 1/scale and the spot
+#   is searched in both reduced halves. A square window of
+#   half-size window (full resolution pixels) around the coarse
+#   centroid is the search window of each half (raw coordinates).
+#   The thresholded spot shrinks with the scale, since its border
+#   is averaged with darker pixels: scale 8 may lose small spots.
+# ============================================================
+def coarse_search_windows(path, scale=4, window=128):
+    """
+    Search windows (x, y, w, h) of the laser spot in the raw left and right
+    halves of a stereo frame, from a reduced-resolution decode.
+
+    Returns:
+        (window_left, window_right), each None when the spot is not found,
+        or None when the frame cannot be read.
+    """
+    reduced = read_image(path, scale)
+
+    if reduced is None:
+        return None
+
+    mid = reduced.shape[1] // 2
+    windows = []
+
+    for half in (reduced[:, :mid], reduced[:, mid:]):
+        detection = laser_detection.detect_laser_spot(half)
+
+        if detection is None:
+            windows.append(None)
+            continue
+
+        # Centre of a reduced pixel in full resolution coordinates
+        cx, cy = ((c + 0.5) * scale - 0.5 for c in detection[0])
+        windows.append((cx - window, cy - window, 2 * window, 2 * window))
+
+    return tuple(windows)
+
+
+def load_frame(path, coarse_scale=None):
+    """
+    Full-resolution frame and, with coarse_scale, its coarse search
+    windows (see coarse_search_windows).
+
+    Returns:
+        (image, windows); image is None when the frame cannot be read.
+    """
+    windows = coarse_search_windows(path, coarse_scale) if coarse_scale else None
+
+    return read_image(path), windows
+
+
+# ============================================================
+# PREFETCHING
+# ============================================================
+class ImagePrefetcher:
+    """
+    Loads images on a thread pool ahead of the processing loop.
+
+    At most depth images are decoded or waiting in memory at any time;
+    they are yielded in the order of paths. OpenCV releases the GIL while
+    decoding, so decoding overlaps with the processing of earlier frames.
+
+    Parameters:
+        paths: image paths, in processing order
+        loader: function path -> loaded item (read_image by default)
+        workers: decoding threads (0 = load in the calling thread)
+        depth: maximum number of frames loaded ahead
+    """
+
+    def __init__(self, paths, loader=read_image, workers=2, depth=8):
+        self.paths = list(paths)
+        self.loader = loader
+        self.workers = workers
+        self.depth = max(depth, 1)
+        self.executor = ThreadPoolExecutor(max_workers=workers) if workers > 0 else None
+
+    def __iter__(self):
+        if self.executor is None:
+            for path in self.paths:
+                yield self.loader(path)
+            return
+
+        pending = deque()
+        remaining = iter(self.paths)
+
+        for path in remaining:
+            pending.append(self.executor.submit(self.loader, path))
+            if len(pending) >= self.depth:
+                break
+
+        while pending:
+            item = pending.popleft().result()
+
+            path = next(remaining, None)
+            if path is not None:
+                pending.append(self.executor.submit(self.loader, path))
+
+            yield item
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,300 @@
+import cProfile
+import csv
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:  # optional fallback for the memory figures
+    psutil = None
+
+try:
+    import pyinstrument
+except ImportError:  # optional sampling profiler
+    pyinstrument = None
+
+
+# ============================================================
+# SPANS
+#   A span measures one stage: wall time (perf_counter), CPU time
+#   of the whole process (process_time, so it includes helper
+#   threads), the peak resident memory reached so far and its
+#   growth, and item counts (frames, points, rows...). Spans nest
+#   per thread; a nested span is reported as "parent/child".
+#   Measurements are aggregated per span path as they close, so
+#   memory does not grow with the number of calls and the cost
+#   is a few microseconds per span. Spans only record inside a
+#   run (see run_report); elsewhere they are no-ops. Spans opened
+#   by other threads (e.g. the image prefetcher) are reported at
+#   the top level; worker processes are not recorded.
+# ============================================================
+_lock = threading.Lock()
+_local = threading.local()
+_run = {'active': False, 'spans': {}, 'metadata': {}}
+
+
+def peak_rss_mb():
+    """Peak resident memory of the process (MB), None if unavailable."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kB on Linux, bytes on macOS
+        return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+    if psutil is not None:
+        memory = psutil.Process().memory_info()
+        return getattr(memory, 'peak_wset', memory.rss) / 2**20
+
+    return None
+
+
+def _stack():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+
+class Span:
+    """Context manager measuring one stage (see span)."""
+
+    __slots__ = ('name', 'items', 'path', 'wall', 'cpu', 'rss')
+
+    def __init__(self, name, items):
+        self.name = name
+        self.items = items
+
+    def count(self, **items):
+        """Adds item counts (e.g. frames=1, points=n) to the span."""
+        for key, value in items.items():
+            self.items[key] = self.items.get(key, 0) + value
+
+    def __enter__(self):
+        stack = _stack()
+        self.path = f"{stack[-1]}/{self.name}" if stack else self.name
+        stack.append(self.path)
+
+        self.rss = peak_rss_mb()
+        self.cpu = time.process_time()
+        self.wall = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        wall = time.perf_counter() - self.wall
+        cpu = time.process_time() - self.cpu
+        rss = peak_rss_mb()
+        _stack().pop()
+
+        with _lock:
+            if not _run['active']:
+                return False
+
+            record = _run['spans'].get(self.path)
+            if record is None:
+                record = _run['spans'][self.path] = {
+                    'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0,
+                    'peak_rss_mb': None, 'rss_growth_mb': 0.0, 'items': {}
+                }
+
+            record['calls'] += 1
+            record['wall_s'] += wall
+            record['cpu_s'] += cpu
+            if rss is not None:
+                record['peak_rss_mb'] = max(record['peak_rss_mb'] or 0.0, rss)
+                record['rss_growth_mb'] += rss - self.rss
+            for key, value in self.items.items():
+                record['items'][key] = record['items'].get(key, 0) + value
+
+        return False
+
+
+class _NullSpan:
+    """Span returned outside a run: records nothing."""
+
+    def count(self, **items):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_null_span = _NullSpan()
+
+
+def span(name, **items):
+    """
+    Measures a stage of the processing:
+
+        with span("triangulation", points=len(points)) as s:
+            ...
+            s.count(rows=n_rows)
+
+    Returns a no-op span outside a run.
+    """
+    if not _run['active']:
+        return _null_span
+
+    return Span(name, dict(items))
+
+
+def instrumented(name=None, count=None):
+    """
+    Decorator measuring every call of a function as a span.
+
+    Parameters:
+        name: span name (the function name by default)
+        count: optional function result -> dict of item counts
+    """
+    def decorator(function):
+        span_name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _run['active']:
+                return function(*args, **kwargs)
+
+            with Span(span_name, {}) as current:
+                result = function(*args, **kwargs)
+                if count is not None:
+                    current.count(**count(result))
+                return result
+
+        return wrapper
+
+    return decorator
+
+
+# ============================================================
+# RUN REPORTS
+# ============================================================
+@contextmanager
+def run_report(path, enabled=True, profiler=None, **metadata):
+    """
+    Records the spans of one run (e.g. one stage of one experiment) and
+    writes them as <path>.json and <path>.csv when it ends, also after an
+    error. Nothing is written when the output folder does not exist.
+
+    Parameters:
+        path: report path without extension
+        enabled: False disables recording and reporting
+        profiler: None, "cprofile" (writes <path>.prof) or "pyinstrument"
+                  (writes <path>.html, if installed)
+        **metadata: stored in the JSON report (experiment, stage...)
+    """
+    if not enabled:
+        yield
+        return
+
+    with _lock:
+        _run.update(active=True, spans={}, metadata=dict(metadata))
+
+    start_wall = time.perf_counter()
+    start_cpu = time.process_time()
+    start_rss = peak_rss_mb()
+    started = datetime.now().isoformat(timespec='seconds')
+    error = None
+
+    profile = _start_profiler(profiler)
+
+    try:
+        yield
+    except BaseException as exc:
+        error = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        _stop_profiler(profiler, profile, path)
+
+        with _lock:
+            _run['active'] = False
+            spans = _run['spans']
+
+        end_rss = peak_rss_mb()
+        report = _rounded({
+            'metadata': dict(metadata, started=started, error=error),
+            'wall_s': time.perf_counter() - start_wall,
+            'cpu_s': time.process_time() - start_cpu,
+            'peak_rss_mb': end_rss,
+            'rss_growth_mb': end_rss - start_rss if end_rss is not None else None,
+            'spans': [dict(span=path_, **record) for path_, record in spans.items()],
+        })
+
+        if os.path.isdir(os.path.dirname(os.path.abspath(path))):
+            write_report(report, path)
+
+
+def write_report(report, path):
+    """Writes a run report as <path>.json and one CSV line per span at <path>.csv."""
+    with open(path + ".json", 'w') as json_file:
+        json.dump(report, json_file, indent=2)
+
+    item_names = sorted({name for record in report['spans'] for name in record['items']})
+    columns = ['span', 'calls', 'wall_s', 'cpu_s', 'peak_rss_mb', 'rss_growth_mb']
+
+    with open(path + ".csv", 'w', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(columns + item_names)
+        for record in report['spans']:
+            writer.writerow(
+                [record[column] for column in columns]
+                + [record['items'].get(name, '') for name in item_names]
+            )
+
+
+def _rounded(value):
+    """Rounds the floats of a report (microseconds, kilobytes)."""
+    if isinstance(value, float):
+        return round(value, 6)
+    if isinstance(value, dict):
+        return {key: _rounded(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_rounded(item) for item in value]
+    return value
+
+
+def _start_profiler(profiler):
+    if profiler == "cprofile":
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    if profiler == "pyinstrument":
+        if pyinstrument is None:
+            print("    pyinstrument is not installed, profiling disabled")
+            return None
+        profile = pyinstrument.Profiler()
+        profile.start()
+        return profile
+
+    if profiler is not None:
+        raise ValueError(f"Unknown profiler: {profiler}")
+
+    return None
+
+
+def _stop_profiler(profiler, profile, path):
+    if profile is None:
+        return
+
+    writable = os.path.isdir(os.path.dirname(os.path.abspath(path)))
+
+    if profiler == "cprofile":
+        profile.disable()
+        if writable:
+            profile.dump_stats(path + ".prof")
+    else:
+        profile.stop()
+        if writable:
+            with open(path + ".html", 'w') as html_file:
+                html_file.write(profile.output_html())
@@ -0,0 +1,308 @@
+import cv2
+import numpy as np
+
+
+# HSV thresholds of the magenta laser spot
+LOWER_MAGENTA = np.array([100, 0, 245])
+UPPER_MAGENTA = np.array([170, 30, 255])
+
+
+# ============================================================
+# SPOT QUALITY
+#   Sub-pixel centroids weight every spot pixel by its brightness
+#   above the V threshold (1 at the threshold, 11 at 255), so the
+#   core of the spot dominates the ragged border of the mask.
+#   The confidence in [0, 1] of a spot is the product of
+#     - an area term: small spots give noisy centroids
+#       (SPOT_REFERENCE_AREA px -> 0.5)
+#     - a saturation term: clipped pixels (V = 255) carry no
+#       intensity information (fully clipped -> 0.5)
+#     - a dominance term: share of the spot in the thresholded
+#       area; reflections or magenta clutter split the mask into
+#       several contours and lower it
+# ============================================================
+SPOT_REFERENCE_AREA = 20
+
+
+def spot_confidence(area, saturation, mask_area):
+    """Confidence in [0, 1] of detected spots (scalars or arrays)."""
+    area = np.asarray(area, dtype=np.float64)
+    mask_area = np.maximum(np.asarray(mask_area, dtype=np.float64), area)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        confidence = area / (area + SPOT_REFERENCE_AREA) * (1 - 0.5 * np.asarray(saturation)) * (area / mask_area)
+
+    return np.nan_to_num(confidence)
+
+
+def _spot_moments(contour, mask, value):
+    """
+    Intensity-weighted moments of the mask pixels inside a contour,
+    computed on its bounding box.
+
+    Returns:
+        (cx, cy, area, saturation) with the centroid in the coordinates of
+        mask, or None for an empty spot.
+    """
+    x, y, w, h = cv2.boundingRect(contour)
+
+    spot = np.zeros((h, w), dtype=np.uint8)
+    cv2.drawContours(spot, [contour], -1, 255, -1, offset=(-x, -y))
+    spot &= mask[y:y + h, x:x + w]
+
+    region = value[y:y + h, x:x + w]
+    weights = np.where(spot > 0, region.astype(np.float64) - (LOWER_MAGENTA[2] - 1), 0.0)
+    moments = cv2.moments(weights)
+
+    if moments["m00"] == 0:
+        return None
+
+    area = cv2.countNonZero(spot)
+    saturation = np.count_nonzero(region[spot > 0] == 255) / area
+
+    return moments["m10"] / moments["m00"] + x, moments["m01"] / moments["m00"] + y, area, saturation
+
+
+def detect_laser_spot(image, roi=None, subpixel=False):
+    """
+    Detects the magenta laser spot in an image, optionally restricted to a
+    search window.
+
+    Parameters:
+        image: BGR image
+        roi: optional search window (x, y, w, h) in image coordinates.
+             It is clipped to the image borders.
+        subpixel: True -> intensity-weighted centroid (float, see
+                  SPOT QUALITY); False -> contour centroid truncated to
+                  whole pixels
+
+    Returns:
+        ((cx, cy), contour, info) in full-image coordinates, or None when no
+        spot is found. info is a dict with the 'area', 'saturation',
+        'n_contours' and 'confidence' of the spot ('saturation' and
+        'confidence' are None when subpixel is False).
+    """
+    x0, y0 = 0, 0
+
+    if roi is not None:
+        height, width = image.shape[:2]
+        x, y, w, h = roi
+        x0, y0 = max(int(x), 0), max(int(y), 0)
+        x1, y1 = min(int(x + w), width), min(int(y + h), height)
+        if x1 <= x0 or y1 <= y0:
+            return None
+        image = image[y0:y1, x0:x1]
+
+    if subpixel:
+        detection = _subpixel_spot(np.ascontiguousarray(image))
+        if detection is None:
+            return None
+
+        (cx, cy), laser_contour, info = detection
+        return (cx + x0, cy + y0), laser_contour + np.array([x0, y0], dtype=laser_contour.dtype), info
+
+    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+
+    mask = cv2.inRange(hsv, LOWER_MAGENTA, UPPER_MAGENTA)
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    if not contours:
+        return None
+
+    laser_contour = max(contours, key=cv2.contourArea)
+    moments = cv2.moments(laser_contour)
+
+    if moments["m00"] == 0:
+        return None
+
+    cx = int(moments["m10"] / moments["m00"]) + x0
+    cy = int(moments["m01"] / moments["m00"]) + y0
+
+    info = {
+        'area': int(moments["m00"]),
+        'saturation': None,
+        'n_contours': len(contours),
+        'confidence': None,
+    }
+
+    return (cx, cy), laser_contour + np.array([x0, y0], dtype=laser_contour.dtype), info
+
+
+def clipped_by_window(contour, roi, shape):
+    """
+    True when a contour (full-image coordinates) touches a border of the
+    search window roi that is not an image border, i.e. the spot may
+    extend beyond the window.
+    """
+    height, width = shape[:2]
+    x, y, w, h = roi
+    x0, y0 = max(int(x), 0), max(int(y), 0)
+    x1, y1 = min(int(x + w), width), min(int(y + h), height)
+
+    bx, by, bw, bh = cv2.boundingRect(contour)
+
+    return (
+        (bx <= x0 and x0 > 0) or (by <= y0 and y0 > 0)
+        or (bx + bw >= x1 and x1 < width) or (by + bh >= y1 and y1 < height)
+    )
+
+
+def _subpixel_spot(image):
+    """
+    Laser spot of an image with its intensity-weighted centroid and
+    confidence (see SPOT QUALITY).
+
+    Returns:
+        ((cx, cy), contour, info) as detect_laser_spot, or None.
+    """
+    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    mask = cv2.inRange(hsv, LOWER_MAGENTA, UPPER_MAGENTA)
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    if not contours:
+        return None
+
+    laser_contour = max(contours, key=cv2.contourArea)
+    moments = _spot_moments(laser_contour, mask, hsv[:, :, 2])
+
+    if moments is None:
+        return None
+
+    cx, cy, area, saturation = moments
+
+    info = {
+        'area': int(area),
+        'saturation': float(saturation),
+        'n_contours': len(contours),
+        'confidence': float(spot_confidence(area, saturation, cv2.countNonZero(mask))),
+    }
+
+    return (float(cx), float(cy)), laser_contour, info
+
+
+class LaserSpotTracker:
+    """
+    Tracks the laser spot along the frames of one scan (consecutive j indices
+    of the same stop k).
+
+    The left search window is predicted from the previous centroids with a
+    constant-velocity model. In rectified images, the right image is searched
+    in a band around the epipolar row of the left spot, shifted by the
+    previous disparity. The rows of raw (unrectified) images are not aligned,
+    so there the right window is the left spot shifted by the previous
+    left-right offset, and the first frame is searched full-frame. Both
+    fall back to a full-frame search when the window holds no spot or a
+    doubtful one: several contours (a reflection or clutter competing with
+    the spot) or a spot clipped by the window border. The tracked result
+    is then the one of the full-frame search (largest contour of the frame).
+
+    Parameters:
+        window: half-size (px) of the left search window (and of the right
+                window of raw images)
+        band: half-height (px) of the right epipolar band (rectified images)
+        subpixel: passed to detect_laser_spot
+    """
+
+    def __init__(self, window=128, band=96, subpixel=False):
+        self.window = window
+        self.band = band
+        self.subpixel = subpixel
+        self.reset()
+
+    def reset(self):
+        """Forgets the tracked spot, e.g. when a new stop k starts."""
+        self.previous = None
+        self.velocity = (0, 0)
+        self.disparity = None
+        self.vertical_offset = None
+
+    def predict_left_roi(self):
+        if self.previous is None:
+            return None
+
+        px = self.previous[0] + self.velocity[0]
+        py = self.previous[1] + self.velocity[1]
+
+        return (px - self.window, py - self.window, 2 * self.window, 2 * self.window)
+
+    def predict_right_roi(self, centroid_left, width, rectified=True):
+        cx, cy = centroid_left
+
+        if not rectified:
+            if self.disparity is None:
+                return None
+            return (cx - self.disparity - self.window, cy - self.vertical_offset - self.window,
+                    2 * self.window, 2 * self.window)
+
+        if self.disparity is None:
+            x, w = 0, width
+        else:
+            x, w = cx - self.disparity - self.window, 2 * self.window
+
+        return (x, cy - self.band, w, 2 * self.band)
+
+    def search_window(self, image, roi):
+        """Spot found in a search window, or None when absent or doubtful."""
+        if roi is None:
+            return None
+
+        detection = detect_laser_spot(image, roi, self.subpixel)
+
+        if detection is None or detection[2]['n_contours'] > 1:
+            return None
+
+        if clipped_by_window(detection[1], roi, image.shape):
+            return None
+
+        return detection
+
+    def detect_pair(self, left_image, right_image, windows=None, rectified=True):
+        """
+        Detects the laser spot in a stereo pair.
+
+        Parameters:
+            left_image, right_image: stereo images
+            windows: optional (window_left, window_right) search windows
+                     tried before the full-frame fallback (e.g. from a
+                     coarse search); either one may be None
+            rectified: False for raw halves, whose rows are not aligned
+                       (no epipolar band)
+
+        Returns:
+            (detection_left, detection_right), each one as returned by
+            detect_laser_spot or None.
+        """
+        window_left, window_right = windows if windows is not None else (None, None)
+
+        detection_left = self.search_window(left_image, self.predict_left_roi())
+        if detection_left is None:
+            detection_left = self.search_window(left_image, window_left)
+        if detection_left is None:
+            detection_left = detect_laser_spot(left_image, subpixel=self.subpixel)
+
+        detection_right = None
+        if detection_left is not None:
+            roi = self.predict_right_roi(detection_left[0], right_image.shape[1], rectified)
+            detection_right = self.search_window(right_image, roi)
+        if detection_right is None:
+            detection_right = self.search_window(right_image, window_right)
+        if detection_right is None:
+            detection_right = detect_laser_spot(right_image, subpixel=self.subpixel)
+
+        self.update(detection_left, detection_right)
+
+        return detection_left, detection_right
+
+    def update(self, detection_left, detection_right):
+        if detection_left is None:
+            self.reset()
+            return
+
+        centroid = detection_left[0]
+        if self.previous is not None:
+            self.velocity = (centroid[0] - self.previous[0], centroid[1] - self.previous[1])
+        self.previous = centroid
+
+        if detection_right is not None:
+            self.disparity = centroid[0] - detection_right[0][0]
+            self.vertical_offset = centroid[1] - detection_right[0][1]
@@ -1,22 +1,83 @@
 import numpy as np
+from .instrumentation import instrumented
+from .registration_engine import (
+    as_row_tensor, row_arrays, fit_lines_batch, dominant_directions
+)
 
-def fit_lines(list_of_dfs):
+def scatter_matrix(points, chunk_size=None):
     """
-    Fits a 3D line to each DataFrame using SVD.
-    Each line is represented by a centroid and a direction vector.
+    Accumulates the centroid and the 3x3 scatter matrix of a point set,
+    optionally in chunks of chunk_size points (e.g. over a memory-mapped
+    array) so the centered N x 3 matrix is never materialized.
+
+    Returns:
+        centroid: (3,) array
+        scatter: (3, 3) array, sum of (p - c)(p - c)^T
     """
-    lines = []
+    points = np.asarray(points).reshape(-1, 3)
+    n_total = len(points)
+
+    if chunk_size is None:
+        chunk_size = max(n_total, 1)
+
+    # Shift by the first point to limit cancellation in the raw moments
+    shift = np.array(points[0], dtype=np.float64) if n_total else np.zeros(3)
+
+    n = 0
+    total = np.zeros(3)
+    outer = np.zeros((3, 3))
+
+    for start in range(0, n_total, chunk_size):
+        chunk = np.asarray(points[start:start + chunk_size], dtype=np.float64) - shift
+        n += len(chunk)
+        total += chunk.sum(axis=0)
+        outer += chunk.T @ chunk
+
+    mean = total / n if n else np.full(3, np.nan)
+    scatter = outer - n * np.outer(mean, mean) if n else np.zeros((3, 3))
 
-    for df in list_of_dfs:
-        points = df[['X', 'Y', 'Z']].to_numpy()
+    return mean + shift, scatter
 
-        centroid = points.mean(axis=0)
-        centered_points = points - centroid
 
-        _, _, Vt = np.linalg.svd(centered_points)
-        direction = Vt[0]  # Principal direction vector
+@instrumented()
+def fit_lines(list_of_dfs, return_quality=False, chunk_size=None):
+    """
+    Fits a 3D line to each row from the dominant eigenvector of its
+    3x3 scatter matrix (equivalent to the first right singular vector of
+    the centered points).
+    Each line is represented by a centroid and a direction vector.
+
+    Parameters:
+        list_of_dfs: RowPartition, list of DataFrames with X, Y, Z columns
+                     (one per row), or RowMoments (e.g. RowStatistics.cam),
+                     in which case the points are not read again
+        return_quality: also return the linearity score of every row
+                        (1 - lambda_2 / lambda_1, 1 for a perfect line)
+        chunk_size: if given, scatter matrices are accumulated row by row in
+                    chunks of this many points instead of all rows at once
+
+    Returns:
+        lines: list of (centroid, direction) tuples
+        linearity: (n_rows,) array, only if return_quality
+    """
+    if hasattr(list_of_dfs, 'scatter'):
+        centroids = list_of_dfs.centroids
+        directions, linearity = dominant_directions(list_of_dfs.scatter)
+        directions[list_of_dfs.counts == 0] = np.nan
+    elif chunk_size is None:
+        rows, counts = as_row_tensor(list_of_dfs)
+        centroids, directions, linearity = fit_lines_batch(rows, counts, True)
+    else:
+        moments = [scatter_matrix(points, chunk_size) for points in row_arrays(list_of_dfs)]
+        centroids = np.array([centroid for centroid, _ in moments]).reshape(-1, 3)
+        directions, linearity = dominant_directions(
+            np.array([scatter for _, scatter in moments]).reshape(-1, 3, 3)
+        )
+
+    # Each element is a tuple: (centroid, direction)
+    lines = list(zip(centroids, directions))
 
-        # Each element is a tuple: (centroid, direction)
-        lines.append((centroid, direction))
+    if return_quality:
+        return lines, linearity
 
     return lines
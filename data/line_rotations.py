@@ -1,5 +1,13 @@
-import numpy as np
+from .instrumentation import instrumented
+from .registration_engine import row_rotations
 
+TRIAD_COLUMNS = [
+    'e1x', 'e1y', 'e1z',
+    'e2x', 'e2y', 'e2z',
+    'e3x', 'e3y', 'e3z'
+]
+
+@instrumented()
 def estimate_line_rotations(cam_vectors, tvs_vectors):
     """
     Computes a 3x3 rotation matrix for each pair of corresponding lines
@@ -7,23 +15,9 @@ def estimate_line_rotations(cam_vectors, tvs_vectors):
 
     Each row of the input DataFrames represents an orthonormal triad.
     """
-    rotations = []
-
-    for i in range(len(cam_vectors)):
-        # Extract orthonormal vectors from CAM
-        e1_cam = cam_vectors.loc[i, ['e1x', 'e1y', 'e1z']].to_numpy()
-        e2_cam = cam_vectors.loc[i, ['e2x', 'e2y', 'e2z']].to_numpy()
-        e3_cam = cam_vectors.loc[i, ['e3x', 'e3y', 'e3z']].to_numpy()
-        E_cam = np.column_stack([e1_cam, e2_cam, e3_cam])
-
-        # Extract orthonormal vectors from TVS
-        e1_tvs = tvs_vectors.loc[i, ['e1x', 'e1y', 'e1z']].to_numpy()
-        e2_tvs = tvs_vectors.loc[i, ['e2x', 'e2y', 'e2z']].to_numpy()
-        e3_tvs = tvs_vectors.loc[i, ['e3x', 'e3y', 'e3z']].to_numpy()
-        E_tvs = np.column_stack([e1_tvs, e2_tvs, e3_tvs])
-
-        # Compute the rotation that aligns CAM with TVS
-        R_i = E_tvs @ E_cam.T
-        rotations.append(R_i)
+    # E matrices with the orthonormal vectors as columns
+    E_cam = cam_vectors[TRIAD_COLUMNS].to_numpy().reshape(-1, 3, 3).transpose(0, 2, 1)
+    E_tvs = tvs_vectors[TRIAD_COLUMNS].to_numpy().reshape(-1, 3, 3).transpose(0, 2, 1)
 
-    return rotations
+    # Rotations that align CAM with TVS
+    return list(row_rotations(E_cam, E_tvs))
@@ -1,6 +1,8 @@
 import numpy as np
-import pandas as pd
+from .instrumentation import instrumented
+from .registration_engine import line_triads
 
+@instrumented()
 def compute_line_vectors(lines):
     """
     Computes an orthonormal triad (e1, e2, e3) for each fitted 3D line.
@@ -9,31 +11,14 @@ def compute_line_vectors(lines):
     The output is a DataFrame containing the centroid and the three
     orthonormal basis vectors.
     """
-    data = []
+    import pandas as pd
 
-    for centroid, e1 in lines:
-        # Normalize primary direction vector
-        e1 = e1 / np.linalg.norm(e1)
+    centroids = np.array([centroid for centroid, _ in lines], dtype=np.float64).reshape(-1, 3)
+    directions = np.array([direction for _, direction in lines], dtype=np.float64).reshape(-1, 3)
 
-        # Enforce e1 orientation toward positive Y
-        if np.dot(e1, np.array([0, 1, 0])) < 0:
-            e1 = -e1
-
-        # Use a fixed reference vector to construct e2
-        reference = np.array([0, 0, 1])
-        if np.abs(np.dot(e1, reference)) > 0.95:
-            reference = np.array([1, 0, 0])
-
-        # Compute e2 orthogonal to e1
-        v_proj = reference - np.dot(reference, e1) * e1
-        e2 = v_proj / np.linalg.norm(v_proj)
-
-        # Compute e3 as the cross product
-        e3 = np.cross(e1, e2)
-        e3 /= np.linalg.norm(e3)
-
-        row = list(centroid) + list(e1) + list(e2) + list(e3)
-        data.append(row)
+    # Columns of each triad are e1, e2, e3
+    triads = line_triads(directions)
+    data = np.hstack([centroids, triads.transpose(0, 2, 1).reshape(-1, 9)])
 
     columns = [
         'cx', 'cy', 'cz',
@@ -0,0 +1,173 @@
+import os
+import re
+import time
+
+import numpy as np
+
+from .registration_engine import register_statistics
+from .row_statistics import RowStatistics
+
+
+# ============================================================
+# RUNNING ROW STATISTICS
+# ============================================================
+class OnlineRowRegistration:
+    """
+    Row-wise registration of a CAM cloud onto a TVS cloud updated as
+    points arrive. New points are reduced to per-row statistics and
+    merged (O(1) per point); the per-row centroids, directions, triads
+    and rotations and the global RMSE after alignment are derived from
+    the statistics without revisiting the points.
+
+    Parameters:
+        step: number of rows
+    """
+
+    def __init__(self, step):
+        self.step = step
+        self.statistics = RowStatistics.empty(step)
+
+    def add(self, rows, cam_points, tvs_points):
+        """
+        Adds corresponding CAM and TVS points.
+
+        Parameters:
+            rows: (n,) row index of every point
+            cam_points: (n, 3) CAM points
+            tvs_points: (n, 3) TVS points
+        """
+        self.statistics = self.statistics.merge(
+            RowStatistics.from_points(rows, cam_points, tvs_points, self.step)
+        )
+
+    def add_stop(self, offset, j, cam_points, tvs_points):
+        """
+        Adds the points of one stop. Point j of a stop starting at global
+        index offset goes to row (offset + j) % step, the row of its TVS
+        sample in the offline split of the concatenated clouds.
+
+        Parameters:
+            offset: global index of the first point of the stop (stop_offsets)
+            j: (n,) scan-line index of every point
+            cam_points: (n, 3) CAM points
+            tvs_points: (n, 3) TVS points
+        """
+        self.add((offset + np.asarray(j, dtype=np.int64)) % self.step, cam_points, tvs_points)
+
+    @property
+    def counts(self):
+        return self.statistics.counts
+
+    @property
+    def n_points(self):
+        return self.statistics.n_points
+
+    def solve(self):
+        """
+        Current row-wise registration.
+
+        Returns:
+            dict of register_statistics (per-row centroids, directions,
+            linearity scores, triads, rotations, counts and global RMSE)
+        """
+        return register_statistics(self.statistics)
+
+    def align(self, rows, cam_points, result=None):
+        """
+        Aligns CAM points with the current per-row transforms:
+            p_hat = R_i (p - c_cam_i) + c_tvs_i
+        """
+        if result is None:
+            result = self.solve()
+
+        rows = np.asarray(rows, dtype=np.int64).reshape(-1)
+        centered = np.asarray(cam_points, dtype=np.float64).reshape(-1, 3) - result['cam_centroids'][rows]
+
+        return np.einsum('nij,nj->ni', result['rotations'][rows], centered) + result['tvs_centroids'][rows]
+
+
+def stop_offsets(stop_sizes):
+    """
+    Global index of the first point of every stop in the offline cloud
+    (stops 0, 1, ... concatenated). A stop is only listed once the sizes
+    of all the stops before it are known.
+
+    Parameters:
+        stop_sizes: dict {k: number of TVS points of stop k}
+
+    Returns:
+        dict {k: offset}
+    """
+    offsets = {}
+    offset = 0
+    k = 0
+
+    while k in stop_sizes:
+        offsets[k] = offset
+        offset += stop_sizes[k]
+        k += 1
+
+    return offsets
+
+
+# ============================================================
+# RAW DATA ARRIVAL
+# ============================================================
+IMAGE_PATTERN = re.compile(r'^im_(\d+)_(\d+)\.jpg$', re.IGNORECASE)
+TVS_PATTERN = re.compile(r'^tvs_(\d+)\.csv$')
+
+
+def scan_raw_data(raw_data_path):
+    """
+    Lists the stops present in a raw_data folder.
+
+    Returns:
+        dict {k: {'tvs': path or None, 'frames': {j: path}, 'first_seen': mtime}}
+    """
+    stops = {}
+
+    for entry in os.scandir(raw_data_path):
+        image_match = IMAGE_PATTERN.match(entry.name)
+        tvs_match = TVS_PATTERN.match(entry.name)
+
+        if image_match is None and tvs_match is None:
+            continue
+
+        k = int((image_match or tvs_match).group(1))
+        stop = stops.setdefault(k, {'tvs': None, 'frames': {}, 'first_seen': np.inf})
+        stop['first_seen'] = min(stop['first_seen'], entry.stat().st_mtime)
+
+        if image_match is not None:
+            stop['frames'][int(image_match.group(2))] = entry.path
+        else:
+            stop['tvs'] = entry.path
+
+    return stops
+
+
+def pending_frames(stop, processed, n_rows, max_latency, now=None):
+    """
+    Frames of a stop that can be processed now: all the unprocessed
+    frames once the stop is complete (one frame per TVS row) or once its
+    first file is older than max_latency seconds. Late frames of an
+    already processed stop are taken as soon as they appear.
+
+    Parameters:
+        stop: entry of scan_raw_data
+        processed: set of the frame indices j already processed
+        n_rows: number of TVS rows of the stop (None if not known yet)
+        max_latency: seconds to wait for a stop to complete
+
+    Returns:
+        sorted list of frame indices j
+    """
+    now = time.time() if now is None else now
+    frames = sorted(j for j in stop['frames'] if j not in processed)
+
+    if not frames:
+        return []
+
+    complete = n_rows is not None and len(stop['frames']) >= n_rows
+    expired = now - stop['first_seen'] >= max_latency
+
+    return frames if (complete or expired or processed) else []
@@ -0,0 +1,202 @@
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from . import pointcloud_store
+from .registration_engine import register_statistics
+from .row_statistics import RowStatistics, combine
+
+
+# ============================================================
+# EXPERIMENT DATA
+# ============================================================
+def load_experiment(processed_data_path):
+    """
+    Loads the displaced CAM and TVS point clouds of an experiment once
+    (memory-mapped), with the stop index k of every point.
+
+    Returns:
+        dict with 'cam' and 'tvs' (N, 3) arrays and 'k' (N,) stop indices
+        (None when the clouds carry no index metadata).
+    """
+    cam, cam_columns = pointcloud_store.load_pointcloud(os.path.join(processed_data_path, "P_CAM_disp"))
+    tvs, _ = pointcloud_store.load_pointcloud(os.path.join(processed_data_path, "P_TVS_disp"))
+
+    if len(cam) != len(tvs):
+        raise ValueError(f"CAM ({len(cam)}) and TVS ({len(tvs)}) point clouds differ in size")
+
+    return {'cam': cam, 'tvs': tvs, 'k': cam_columns.get('k'), 'statistics': {}}
+
+
+def sweep_grid(steps, row_strides=(1,), stops=(None,)):
+    """
+    Cartesian product of the sweep parameters.
+
+    Parameters:
+        steps: row split sizes
+        row_strides: keep every row_stride-th row (angular step multiplier)
+        stops: stop subsets, each one None (all stops), an int n (first n
+               stops) or a tuple of stop indices k
+
+    Returns:
+        list of configuration dicts
+    """
+    return [
+        {'step': step, 'row_stride': row_stride, 'stops': stop_subset}
+        for step, row_stride, stop_subset in itertools.product(steps, row_strides, stops)
+    ]
+
+
+def select_stops(experiment, stops, step):
+    """
+    Returns the CAM points, TVS points and stop indices of a subset of
+    stops. Without stop metadata, consecutive blocks of step points are
+    taken as stops.
+    """
+    cam, tvs, k = experiment['cam'], experiment['tvs'], experiment['k']
+
+    if k is None:
+        k = np.arange(len(cam)) // step
+
+    if stops is None:
+        return cam, tvs, k
+
+    if isinstance(stops, (int, np.integer)):
+        mask = k < stops
+    else:
+        mask = np.isin(k, stops)
+
+    return cam[mask], tvs[mask], k[mask]
+
+
+def stop_statistics(experiment, step):
+    """
+    Per-stop row statistics of an experiment, computed once per step.
+    Point i belongs to row i % step of the whole cloud, as in
+    rows_to_tensor; any subset of stops is then registered by merging
+    the statistics of its stops.
+
+    Returns:
+        dict {k: RowStatistics}
+    """
+    if step not in experiment['statistics']:
+        cam, tvs, k = select_stops(experiment, None, step)
+        rows = np.arange(len(cam)) % step
+
+        experiment['statistics'][step] = {
+            stop: RowStatistics.from_points(rows[k == stop], cam[k == stop], tvs[k == stop], step)
+            for stop in np.unique(k)
+        }
+
+    return experiment['statistics'][step]
+
+
+def stops_label(stops):
+    if stops is None:
+        return "all"
+    if isinstance(stops, (int, np.integer)):
+        return f"first {stops}"
+    return "-".join(str(k) for k in stops)
+
+
+# ============================================================
+# EVALUATION
+# ============================================================
+def evaluate_configuration(experiment, step, row_stride=1, stops=None):
+    """
+    Runs the row-wise registration for one sweep configuration from the
+    cached per-stop statistics (see stop_statistics): the points are
+    only read once per experiment and step.
+
+    Returns:
+        dict with the number of stops, rows and points used and the RMSE
+    """
+    per_stop = stop_statistics(experiment, step)
+
+    if stops is None:
+        selected = list(per_stop)
+    elif isinstance(stops, (int, np.integer)):
+        selected = [k for k in per_stop if k < stops]
+    else:
+        selected = [k for k in per_stop if k in set(stops)]
+
+    if not selected:
+        return {'n_stops': 0, 'n_rows': 0, 'n_points': 0, 'RMSE': np.nan}
+
+    # Row subsampling (coarser angular resolution)
+    statistics = combine(per_stop[k] for k in selected)[::row_stride]
+    counts = statistics.counts
+
+    rmse = register_statistics(statistics)['rmse'] if counts.sum() else np.nan
+
+    return {
+        'n_stops': len(selected),
+        'n_rows': int(np.count_nonzero(counts)),
+        'n_points': int(counts.sum()),
+        'RMSE': rmse,
+    }
+
+
+# Columns of the results table
+RESULT_COLUMNS = ['Experiment', 'step', 'row_stride', 'stops', 'n_stops', 'n_rows', 'n_points', 'RMSE', 'error']
+
+_experiments = {}
+
+
+def _evaluate_task(task):
+    """Worker task: evaluates one configuration, loading each experiment once per process."""
+    experiment_name, processed_data_path, config = task
+
+    if processed_data_path not in _experiments:
+        _experiments[processed_data_path] = load_experiment(processed_data_path)
+
+    result = {
+        'Experiment': experiment_name,
+        'step': config['step'],
+        'row_stride': config['row_stride'],
+        'stops': stops_label(config['stops']),
+    }
+
+    try:
+        result.update(evaluate_configuration(_experiments[processed_data_path], **config))
+        result['error'] = ""
+    except Exception as e:
+        result.update({'n_stops': 0, 'n_rows': 0, 'n_points': 0, 'RMSE': np.nan, 'error': str(e)})
+
+    return result
+
+
+def run_sweep(experiments, grid, workers=1, output_csv=None):
+    """
+    Evaluates every configuration of a sweep grid on every experiment.
+
+    Parameters:
+        experiments: dict {experiment name: processed_data path}
+        grid: list of configurations (see sweep_grid)
+        workers: number of worker processes (1 = serial)
+        output_csv: optional path of the results table
+
+    Returns:
+        DataFrame with one row per (experiment, configuration)
+    """
+    tasks = [
+        (name, path, config)
+        for name, path in experiments.items()
+        for config in grid
+    ]
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_evaluate_task, tasks, chunksize=max(1, len(tasks) // (4 * workers))))
+    else:
+        results = [_evaluate_task(task) for task in tasks]
+
+    df_results = pd.DataFrame(results, columns=RESULT_COLUMNS)
+
+    if output_csv is not None:
+        df_results.to_csv(output_csv, index=False)
+
+    return df_results
@@ -1,9 +1,26 @@
 import os
 import sys
 
+# Repository root: paths do not depend on the launch directory
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def experimentsDir(argv=None):
+    """
+    Folder holding the experiment folders: the --experiments-dir command
+    line argument if given, Experiments/ of the repository otherwise.
+    Other arguments are ignored.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--experiments-dir", default=os.path.join(BASE_DIR, "Experiments"))
+    args, _ = parser.parse_known_args(argv)
+
+    return os.path.abspath(args.experiments_dir)
+
 def dirData():
 
-    generalDir = os.getcwd()
+    generalDir = BASE_DIR
 
     if sys.platform.startswith('win'):
         dirData = generalDir + "\\data\\"
@@ -15,7 +32,7 @@ def dirData():
     return dirData
 
 def dirProfiles():
-    generalDir = os.getcwd()
+    generalDir = BASE_DIR
 
     if sys.platform.startswith('win'):
         dirProfiles = generalDir + "\\profiles\\"
@@ -27,7 +44,7 @@ def dirProfiles():
     return dirProfiles
 
 def dirLanguages():
-    generalDir = os.getcwd()
+    generalDir = BASE_DIR
 
     if sys.platform.startswith('win'):
         dirLanguages = generalDir + "\\languages\\"
@@ -39,7 +56,7 @@ def dirLanguages():
     return dirLanguages
 
 def dirResults():
-    generalDir = os.getcwd()
+    generalDir = BASE_DIR
 
     if sys.platform.startswith('win'):
         dirResults = generalDir + "\\results\\"
@@ -51,7 +68,7 @@ def dirResults():
     return dirResults
 
 def dirImg():
-    generalDir = os.getcwd()
+    generalDir = BASE_DIR
 
     if sys.platform.startswith('win'):
         dirImg = generalDir + "\\img\\"
@@ -63,7 +80,7 @@ def dirImg():
     return dirImg
 
 def dirCalibI():
-    generalDir = os.getcwd()
+    generalDir = BASE_DIR
 
     if sys.platform.startswith('win'):
         dirCalibI = generalDir + "\\img\\calibI\\"
@@ -75,7 +92,7 @@ def dirCalibI():
     return dirCalibI
 
 def dirCalibD():
-    generalDir = os.getcwd()
+    generalDir = BASE_DIR
 
     if sys.platform.startswith('win'):
         dirCalibD = generalDir + "\\img\\calibD\\"
@@ -87,7 +104,7 @@ def dirCalibD():
     return dirCalibD
 
 def dirScope():
-    generalDir = os.getcwd()
+    generalDir = BASE_DIR
 
     if sys.platform.startswith('win'):
         dirScope = generalDir + "\\data\\scope\\data\\"
@@ -99,7 +116,7 @@ def dirScope():
     return dirScope
 
 def dirScopeSS():
-    generalDir = os.getcwd()
+    generalDir = BASE_DIR
 
     if sys.platform.startswith('win'):
         dirScopeSS = generalDir + "\\data\\scope\\screenshots\\"
@@ -111,7 +128,7 @@ def dirScopeSS():
     return dirScopeSS
 
 def dirMasks():
-    generalDir = os.getcwd()
+    generalDir = BASE_DIR
 
     if sys.platform.startswith('win'):
         dirMasks = generalDir + "\\data\\masks\\"
@@ -120,4 +137,4 @@ def dirMasks():
     elif sys.platform.startswith('darwin'):
         dirMasks = generalDir + "/data/masks/"
 
-    return dirMasks
\ No newline at end of file
+    return dirMasks
\ No newline at end of file
@@ -0,0 +1,172 @@
+import fnmatch
+import os
+import re
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+
+# ============================================================
+# EXPERIMENT DISCOVERY AND SELECTION
+# ============================================================
+def _natural_key(name):
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', name)]
+
+
+def discover_experiments(experiments_dir):
+    """
+    Experiment folders of an archive: every sub-folder of experiments_dir
+    holding a raw_data or processed_data folder, in natural order.
+    """
+    if not os.path.isdir(experiments_dir):
+        return []
+
+    return sorted(
+        (
+            name for name in os.listdir(experiments_dir)
+            if os.path.isdir(os.path.join(experiments_dir, name, "raw_data"))
+            or os.path.isdir(os.path.join(experiments_dir, name, "processed_data"))
+        ),
+        key=_natural_key
+    )
+
+
+def select_experiments(experiments, selection=None):
+    """
+    Filters experiment folder names with a selection.
+
+    Parameters:
+        experiments: folder names (see discover_experiments)
+        selection: None (all), or a list of (or a comma-separated string
+                   of) items, each one
+                     - a number, "5" or 5        -> folder 005
+                     - an inclusive range "1-20" -> folders 001 to 020
+                     - a glob pattern "01*"      -> matching folder names
+
+    Returns:
+        selected names, in the order of experiments
+    """
+    if selection is None:
+        return list(experiments)
+
+    if isinstance(selection, (str, int)):
+        selection = [selection]
+
+    items = []
+    for item in selection:
+        items += [part.strip() for part in str(item).split(',') if part.strip()]
+
+    def matches(name, item):
+        number = int(name) if name.isdigit() else None
+
+        if item.isdigit():
+            return number == int(item) if number is not None else name == item
+
+        bounds = re.fullmatch(r'(\d+)\s*-\s*(\d+)', item)
+        if bounds:
+            return number is not None and int(bounds.group(1)) <= number <= int(bounds.group(2))
+
+        return fnmatch.fnmatch(name, item)
+
+    return [name for name in experiments if any(matches(name, item) for item in items)]
+
+
+# ============================================================
+# DEPENDENCY GRAPH EXECUTION
+#   Every experiment is a chain of steps (step i needs step i-1
+#   of the same experiment). Ready tasks are submitted to the pool
+#   as workers become free, later steps first, so an experiment
+#   moves on to its registration while others are still in their
+#   first step.
+# ============================================================
+def _run_task(function, experiment):
+    """Runs one step of one experiment, capturing any exception."""
+    start = time.perf_counter()
+
+    try:
+        function(experiment)
+        error = ""
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}\n{traceback.format_exc()}"
+
+    return error, time.perf_counter() - start
+
+
+def run_pipeline(experiments, steps, workers=1, initializer=None, initargs=(), output_csv=None):
+    """
+    Runs a chain of steps on every experiment.
+
+    Parameters:
+        experiments: experiment names passed to the step functions
+        steps: list of (step name, function(experiment)) in dependency
+               order; a step fails by raising an exception
+        workers: number of worker processes (1 = serial, in this process)
+        initializer, initargs: worker process initializer (also called
+                               once in this process when serial)
+        output_csv: optional path of the status table
+
+    Returns:
+        DataFrame with one row per experiment: the status of every step
+        ("ok", "failed" or "blocked" by a failed step), the error of the
+        failed step and the total time
+    """
+    status = {
+        experiment: {'Experiment': experiment, **{name: "pending" for name, _ in steps},
+                     'error': "", 'time_s': 0.0}
+        for experiment in experiments
+    }
+
+    def finish(experiment, index, error, elapsed):
+        name = steps[index][0]
+        status[experiment]['time_s'] += elapsed
+
+        if error:
+            status[experiment][name] = "failed"
+            status[experiment]['error'] = error.splitlines()[0]
+            for blocked_name, _ in steps[index + 1:]:
+                status[experiment][blocked_name] = "blocked"
+            print(f"[{experiment}] {name} failed ({elapsed:.1f} s)\n{error}")
+            return False
+
+        status[experiment][name] = "ok"
+        print(f"[{experiment}] {name} completed ({elapsed:.1f} s)")
+        return True
+
+    if workers > 1:
+        ready = [(experiment, 0) for experiment in experiments]
+        running = {}
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as executor:
+            while ready or running:
+
+                # Later steps first, then experiments in order
+                ready.sort(key=lambda task: (-task[1], experiments.index(task[0])))
+                while ready and len(running) < workers:
+                    experiment, index = ready.pop(0)
+                    future = executor.submit(_run_task, steps[index][1], experiment)
+                    running[future] = (experiment, index)
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    experiment, index = running.pop(future)
+                    if finish(experiment, index, *future.result()) and index + 1 < len(steps):
+                        ready.append((experiment, index + 1))
+    else:
+        if initializer is not None:
+            initializer(*initargs)
+
+        for experiment in experiments:
+            for index, (_, function) in enumerate(steps):
+                if not finish(experiment, index, *_run_task(function, experiment)):
+                    break
+
+    # pandas is only needed for the status table
+    import pandas as pd
+
+    df_status = pd.DataFrame(list(status.values()))
+
+    if output_csv is not None:
+        df_status.to_csv(output_csv, index=False)
+
+    return df_status
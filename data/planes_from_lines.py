@@ -1,5 +1,4 @@
 import numpy as np
-import pandas as pd
 
 def planes_from_lines(lines, global_centroid=None):
     """
@@ -8,6 +7,8 @@ def planes_from_lines(lines, global_centroid=None):
     Each plane is defined by an orthonormal basis (e1, e2, e3) and
     a reference point lying midway between consecutive line centroids.
     """
+    import pandas as pd
+
     data = []
 
     if global_centroid is None:
@@ -1,162 +1,334 @@
-import matplotlib.pyplot as plt
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
-from mpl_toolkits.mplot3d import Axes3D
 
+from .instrumentation import instrumented
+from .registration_engine import row_arrays
 
-def plot_pointcloud(row_subclouds, title):
-    fig = plt.figure()
-    ax = fig.add_subplot(111, projection='3d')
 
-    colors = ['red', 'green', 'blue', 'orange', 'purple', 'cyan']
+COLORS = ['red', 'green', 'blue', 'orange', 'purple', 'cyan']
 
-    for i, sub_df in enumerate(row_subclouds):
-        ax.scatter(
-            sub_df['X'], sub_df['Y'], sub_df['Z'],
-            color=colors[i % len(colors)],
-            label=f'Offset {i}', s=10
-        )
+AXIS_LIMITS = ((0.126, 0.287), (-0.05, 0.05), (0, 0.139))
 
-        # Plot the first point of each subcloud in black (larger)
-        if not sub_df.empty:
-            p = sub_df.iloc[0]
-            ax.scatter(
-                p['X'], p['Y'], p['Z'],
-                color='black', s=40, marker='o',
-                edgecolors='white', linewidths=0.5
-            )
+TRIAD_COLUMNS = ['e1x', 'e1y', 'e1z', 'e2x', 'e2y', 'e2z', 'e3x', 'e3y', 'e3z']
 
-    # ax.set_xlabel('X')
-    # ax.set_ylabel('Y')
-    # ax.set_zlabel('Z')
-    ax.set_xlim(0.126, 0.287)
-    ax.set_ylim(-0.05, 0.05)
-    ax.set_zlim(0, 0.139)
 
-    ax.legend()
-    ax.set_title(title)
-    plt.tight_layout()
+# ============================================================
+# PLOT MODE
+#   "show"  -> figures are drawn in this process and displayed
+#              by show_figures()
+#   "files" -> figures are rendered to PNG files by a pool of
+#              background worker processes (headless)
+#   "none"  -> no figures at all
+# ============================================================
+_settings = {'mode': 'show', 'output_dir': None, 'workers': 1}
+_renderer = {'executor': None, 'pending': []}
 
 
-def plot_pointcloud_with_lines(row_subclouds, lines, title):
-    fig = plt.figure()
-    ax = fig.add_subplot(111, projection='3d')
+def set_plot_mode(mode, output_dir=None, workers=1):
+    """
+    Selects how figures are produced (see PLOT MODE above).
 
-    colors = ['red', 'green', 'blue', 'orange', 'purple', 'cyan']
-    plotted_anything = False  # Flag to check if something was plotted
-
-    for i, (sub_df, (centroid, direction)) in enumerate(zip(row_subclouds, lines)):
-        # if i == 0:
-        if i != 999:
-            # Plot points
-            ax.scatter(
-                sub_df['X'], sub_df['Y'], sub_df['Z'],
-                color=colors[i % len(colors)],
-                label=f'Offset {i}', s=10
-            )
-
-            # Generate line points
-            t = np.linspace(-50, 50, 100)
-            x_line = centroid[0] + t * direction[0]
-            y_line = centroid[1] + t * direction[1]
-            z_line = centroid[2] + t * direction[2]
-            ax.plot(x_line, y_line, z_line, color=colors[i % len(colors)], linewidth=2)
-
-            plotted_anything = True
-
-    if plotted_anything:
-        # ax.set_xlabel('X')
-        # ax.set_ylabel('Y')
-        # ax.set_zlabel('Z')
-        ax.set_xlim(0.126, 0.287)
-        ax.set_ylim(-0.05, 0.05)
-        ax.set_zlim(0, 0.139)
-
-        ax.legend()
-        ax.set_title(title)
-        plt.tight_layout()
-    else:
-        print("Index 15 was not found in the data.")
+    Parameters:
+        mode: "show", "files" or "none"
+        output_dir: folder of the PNG files ("files" mode)
+        workers: number of background rendering processes ("files" mode)
+    """
+    if mode not in ('show', 'files', 'none'):
+        raise ValueError(f"Unknown plot mode: {mode}")
 
+    if mode == 'files' and output_dir is None:
+        raise ValueError("Plot mode 'files' requires an output_dir")
 
-def plot_pointcloud_with_lines_and_vectors(row_subclouds, lines, line_vectors_df, title):
-    fig = plt.figure()
-    ax = fig.add_subplot(111, projection='3d')
+    if mode != 'files' or workers != _settings['workers']:
+        close_plotting()
+
+    _settings.update({'mode': mode, 'output_dir': output_dir, 'workers': workers})
+
+
+def set_output_dir(output_dir):
+    """Changes the folder of the PNG files, e.g. for each experiment."""
+    _settings['output_dir'] = output_dir
+
+
+@instrumented()
+def show_figures():
+    """
+    Displays and closes the figures drawn in "show" mode. Does nothing in
+    the headless modes, so unattended runs never wait on the GUI.
+    """
+    if _settings['mode'] != 'show':
+        return
+
+    import matplotlib.pyplot as plt
+    plt.show()
+    plt.close("all")
+
+
+def wait_for_figures():
+    """
+    Waits for the figures submitted in "files" mode.
 
-    colors = ['red', 'green', 'blue', 'orange', 'purple', 'cyan']
+    Returns:
+        list of the written file paths
+    """
+    pending, _renderer['pending'] = _renderer['pending'], []
+    return [future.result() for future in pending]
 
-    for i, (sub_df, (centroid, direction)) in enumerate(zip(row_subclouds, lines)):
-        color = colors[i % len(colors)]
 
-        # Plot row points
-        ax.scatter(
-            sub_df['X'], sub_df['Y'], sub_df['Z'],
-            color=color, label=f'Offset {i}', s=10
+def close_plotting():
+    """Waits for pending figures and shuts the rendering pool down."""
+    wait_for_figures()
+
+    if _renderer['executor'] is not None:
+        _renderer['executor'].shutdown()
+        _renderer['executor'] = None
+
+
+def _init_renderer():
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def _render_to_file(draw, path, *args):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig = draw(*args)
+    fig.savefig(path, dpi=150)
+    plt.close(fig)
+
+    return path
+
+
+def _submit(draw, title, *args):
+    """Draws a figure now, renders it in the background or skips it."""
+    mode = _settings['mode']
+
+    if mode == 'none':
+        return
+
+    if mode == 'show':
+        draw(title, *args)
+        return
+
+    if _renderer['executor'] is None:
+        _renderer['executor'] = ProcessPoolExecutor(
+            max_workers=_settings['workers'], initializer=_init_renderer
         )
 
-        # Plot fitted line
-        t = np.linspace(-50, 50, 100)
-        x_line = centroid[0] + t * direction[0]
-        y_line = centroid[1] + t * direction[1]
-        z_line = centroid[2] + t * direction[2]
-        ax.plot(x_line, y_line, z_line, color=color, linewidth=2)
+    os.makedirs(_settings['output_dir'], exist_ok=True)
+    file_name = re.sub(r'[^\w\-]+', '_', title).strip('_') + '.png'
+    path = os.path.join(_settings['output_dir'], file_name)
 
-        # Extract e1, e2, e3 from line_vectors_df
-        row = line_vectors_df.iloc[i]
-        cx, cy, cz = row[['cx', 'cy', 'cz']]
-        e1 = row[['e1x', 'e1y', 'e1z']].to_numpy()
-        e2 = row[['e2x', 'e2y', 'e2z']].to_numpy()
-        e3 = row[['e3x', 'e3y', 'e3z']].to_numpy()
+    _renderer['pending'].append(
+        _renderer['executor'].submit(_render_to_file, draw, path, title, *args)
+    )
 
-        # Plot centroid point
-        ax.scatter(cx, cy, cz, c='black', marker='o', s=30)
 
-        # Plot vectors as arrows
-        ax.quiver(cx, cy, cz, *e1, color='black', length=15, normalize=True)
-        ax.quiver(cx, cy, cz, *e2, color='gray', length=15, normalize=True)
-        ax.quiver(cx, cy, cz, *e3, color='yellow', length=15, normalize=True)
+# ============================================================
+# HELPERS
+# ============================================================
+def _stack_rows(row_subclouds):
+    """
+    Concatenates the rows into one (N, 3) array with the row index of
+    every point, so each cloud is drawn with a single scatter call.
+    """
+    rows = row_arrays(row_subclouds)
 
-    # ax.set_xlabel('X')
-    # ax.set_ylabel('Y')
-    # ax.set_zlabel('Z')
+    if not rows:
+        return np.empty((0, 3)), np.empty(0, dtype=int), 0
 
-    ax.set_xlim(0.126, 0.287)
-    ax.set_ylim(-0.05, 0.05)
-    ax.set_zlim(0, 0.139)
+    points = np.concatenate([np.asarray(row, dtype=np.float64).reshape(-1, 3) for row in rows])
+    row_index = np.repeat(np.arange(len(rows)), [len(row) for row in rows])
 
-    ax.set_title(title)
-    ax.legend()
-    plt.tight_layout()
+    return points, row_index, len(rows)
 
 
-def plot_two_pointclouds(row_subclouds_1, row_subclouds_2, title, label_1='CAM', label_2='TVS'):
+def _row_colors(row_index):
+    return np.array(COLORS, dtype=object)[row_index % len(COLORS)].tolist()
+
+
+def _line_segments(lines):
+    """Segments of the fitted lines (centroid +/- 50 * direction)."""
+    if not lines:
+        return np.empty((0, 2, 3))
+
+    centroids = np.array([centroid for centroid, _ in lines], dtype=np.float64)
+    directions = np.array([direction for _, direction in lines], dtype=np.float64)
+
+    return np.stack([centroids - 50 * directions, centroids + 50 * directions], axis=1)
+
+
+def _new_axes():
+    import matplotlib.pyplot as plt
+
     fig = plt.figure()
     ax = fig.add_subplot(111, projection='3d')
+    return fig, ax
 
-    colors = ['red', 'green', 'blue', 'orange', 'purple', 'cyan']
 
-    for i, (df1, df2) in enumerate(zip(row_subclouds_1, row_subclouds_2)):
-        color = colors[i % len(colors)]
+def _legend_handles(n_rows, prefix='', **style):
+    from matplotlib.lines import Line2D
 
-        # Cloud 1 (e.g., CAM): filled circles
-        ax.scatter(
-            df1['X'], df1['Y'], df1['Z'],
-            color=color, label=f'{label_1} Offset {i}', s=10, marker='o'
-        )
+    return [
+        Line2D([], [], linestyle='', marker='o', color=COLORS[i % len(COLORS)],
+               label=f'{prefix}Offset {i}', **style)
+        for i in range(n_rows)
+    ]
 
-        # Cloud 2 (e.g., TVS): hollow circles
-        ax.scatter(
-            df2['X'], df2['Y'], df2['Z'],
-            edgecolors=color, facecolors='none',
-            label=f'{label_2} Offset {i}', s=30, marker='o'
-        )
 
+def _finish_axes(fig, ax, title, handles):
     # ax.set_xlabel('X')
     # ax.set_ylabel('Y')
     # ax.set_zlabel('Z')
-    ax.set_xlim(0.126, 0.287)
-    ax.set_ylim(-0.05, 0.05)
-    ax.set_zlim(0, 0.139)
+    ax.set_xlim(*AXIS_LIMITS[0])
+    ax.set_ylim(*AXIS_LIMITS[1])
+    ax.set_zlim(*AXIS_LIMITS[2])
 
+    ax.legend(handles=handles)
     ax.set_title(title)
-    ax.legend()
-    plt.tight_layout()
+    fig.tight_layout()
+
+
+def _draw_lines(ax, segments, n_rows):
+    from mpl_toolkits.mplot3d.art3d import Line3DCollection
+
+    colors = [COLORS[i % len(COLORS)] for i in range(n_rows)]
+    ax.add_collection3d(Line3DCollection(segments, colors=colors, linewidths=2))
+
+
+# ============================================================
+# FIGURES
+# ============================================================
+def _draw_pointcloud(title, points, row_index, n_rows, first_points):
+    fig, ax = _new_axes()
+
+    ax.scatter(points[:, 0], points[:, 1], points[:, 2], c=_row_colors(row_index), s=10)
+
+    # First point of each subcloud in black (larger)
+    ax.scatter(
+        first_points[:, 0], first_points[:, 1], first_points[:, 2],
+        color='black', s=40, marker='o',
+        edgecolors='white', linewidths=0.5
+    )
+
+    _finish_axes(fig, ax, title, _legend_handles(n_rows))
+    return fig
+
+
+@instrumented()
+def plot_pointcloud(row_subclouds, title):
+    points, row_index, n_rows = _stack_rows(row_subclouds)
+
+    # Rows are stacked in order, so the first point of each row is found by bisection
+    first_points = points[np.searchsorted(row_index, np.unique(row_index))]
+
+    _submit(_draw_pointcloud, title, points, row_index, n_rows, first_points)
+
+
+def _draw_pointcloud_with_lines(title, points, row_index, n_rows, segments):
+    fig, ax = _new_axes()
+
+    # Plot points
+    ax.scatter(points[:, 0], points[:, 1], points[:, 2], c=_row_colors(row_index), s=10)
+
+    # Fitted lines
+    _draw_lines(ax, segments, n_rows)
+
+    _finish_axes(fig, ax, title, _legend_handles(n_rows))
+    return fig
+
+
+@instrumented()
+def plot_pointcloud_with_lines(row_subclouds, lines, title):
+    points, row_index, n_rows = _stack_rows(row_subclouds)
+    n_rows = min(n_rows, len(lines))
+
+    if n_rows == 0:
+        print("No rows to plot.")
+        return
+
+    keep = row_index < n_rows
+    _submit(
+        _draw_pointcloud_with_lines, title,
+        points[keep], row_index[keep], n_rows, _line_segments(lines[:n_rows])
+    )
+
+
+def _draw_pointcloud_with_lines_and_vectors(title, points, row_index, n_rows, segments, centroids, triads):
+    fig, ax = _new_axes()
+
+    # Plot row points
+    ax.scatter(points[:, 0], points[:, 1], points[:, 2], c=_row_colors(row_index), s=10)
+
+    # Plot fitted lines
+    _draw_lines(ax, segments, n_rows)
+
+    # Plot centroid points
+    ax.scatter(centroids[:, 0], centroids[:, 1], centroids[:, 2], c='black', marker='o', s=30)
+
+    # Plot vectors as arrows
+    cx, cy, cz = centroids.T
+    for k, color in enumerate(['black', 'gray', 'yellow']):
+        e = triads[:, 3 * k:3 * k + 3]
+        ax.quiver(cx, cy, cz, e[:, 0], e[:, 1], e[:, 2], color=color, length=15, normalize=True)
+
+    _finish_axes(fig, ax, title, _legend_handles(n_rows))
+    return fig
+
+
+@instrumented()
+def plot_pointcloud_with_lines_and_vectors(row_subclouds, lines, line_vectors_df, title):
+    points, row_index, n_rows = _stack_rows(row_subclouds)
+    n_rows = min(n_rows, len(lines), len(line_vectors_df))
+
+    keep = row_index < n_rows
+    centroids = line_vectors_df[['cx', 'cy', 'cz']].to_numpy()[:n_rows]
+    triads = line_vectors_df[TRIAD_COLUMNS].to_numpy()[:n_rows]
+
+    _submit(
+        _draw_pointcloud_with_lines_and_vectors, title,
+        points[keep], row_index[keep], n_rows, _line_segments(lines[:n_rows]), centroids, triads
+    )
+
+
+def _draw_two_pointclouds(title, points_1, row_index_1, points_2, row_index_2, n_rows, label_1, label_2):
+    fig, ax = _new_axes()
+
+    # Cloud 1 (e.g., CAM): filled circles
+    ax.scatter(
+        points_1[:, 0], points_1[:, 1], points_1[:, 2],
+        c=_row_colors(row_index_1), s=10, marker='o'
+    )
+
+    # Cloud 2 (e.g., TVS): hollow circles
+    ax.scatter(
+        points_2[:, 0], points_2[:, 1], points_2[:, 2],
+        edgecolors=_row_colors(row_index_2), facecolors='none', s=30, marker='o'
+    )
+
+    handles = (
+        _legend_handles(n_rows, prefix=f'{label_1} ')
+        + _legend_handles(n_rows, prefix=f'{label_2} ', markerfacecolor='none')
+    )
+    _finish_axes(fig, ax, title, handles)
+    return fig
+
+
+@instrumented()
+def plot_two_pointclouds(row_subclouds_1, row_subclouds_2, title, label_1='CAM', label_2='TVS'):
+    points_1, row_index_1, n_rows_1 = _stack_rows(row_subclouds_1)
+    points_2, row_index_2, n_rows_2 = _stack_rows(row_subclouds_2)
+    n_rows = min(n_rows_1, n_rows_2)
+
+    keep_1 = row_index_1 < n_rows
+    keep_2 = row_index_2 < n_rows
+    _submit(
+        _draw_two_pointclouds, title,
+        points_1[keep_1], row_index_1[keep_1], points_2[keep_2], row_index_2[keep_2],
+        n_rows, label_1, label_2
+    )
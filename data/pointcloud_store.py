@@ -0,0 +1,78 @@
+import os
+
+import numpy as np
+
+from .instrumentation import instrumented
+
+
+@instrumented()
+def save_pointcloud(path, xyz, csv_path=None, **columns):
+    """
+    Saves a point cloud in binary form.
+
+    The XYZ coordinates are written to <path>.npy as an (N, 3) float64
+    array that can be memory-mapped. Extra per-point columns (e.g. the
+    (j, k) index, source image names or TVS metadata) are written to
+    <path>_meta.npz.
+
+    Parameters:
+        path: output path without extension (e.g. processed_data/P_CAM)
+        xyz: (N, 3) array of points
+        csv_path: optional CSV export with X, Y, Z and the extra columns
+        **columns: one-dimensional arrays of length N
+    """
+    xyz = np.ascontiguousarray(xyz, dtype=np.float64).reshape(-1, 3)
+
+    for name, values in columns.items():
+        if len(values) != len(xyz):
+            raise ValueError(
+                f"Column '{name}' has {len(values)} values for {len(xyz)} points"
+            )
+
+    np.save(f"{path}.npy", xyz)
+    np.savez(f"{path}_meta.npz", **{name: np.asarray(values) for name, values in columns.items()})
+
+    if csv_path is not None:
+        export_csv(csv_path, xyz, **columns)
+
+
+@instrumented(count=lambda pointcloud: {'points': len(pointcloud[0])})
+def load_pointcloud(path, mmap_mode='r'):
+    """
+    Loads a point cloud saved with save_pointcloud.
+
+    Parameters:
+        path: path without extension
+        mmap_mode: passed to np.load (None loads the points in memory)
+
+    Returns:
+        xyz: (N, 3) float64 array (memory-mapped by default)
+        columns: dict of per-point metadata arrays
+    """
+    xyz = np.load(f"{path}.npy", mmap_mode=mmap_mode)
+
+    columns = {}
+    meta_path = f"{path}_meta.npz"
+    if os.path.exists(meta_path):
+        with np.load(meta_path) as meta:
+            columns = {name: meta[name] for name in meta.files}
+
+    return xyz, columns
+
+
+def pointcloud_exists(path):
+    return os.path.exists(f"{path}.npy")
+
+
+def export_csv(csv_path, xyz, **columns):
+    """
+    Writes a point cloud to CSV with X, Y, Z columns followed by the
+    extra per-point columns.
+    """
+    import pandas as pd
+
+    df = pd.DataFrame(np.asarray(xyz).reshape(-1, 3), columns=['X', 'Y', 'Z'])
+    for name, values in columns.items():
+        df[name] = values
+
+    df.to_csv(csv_path, index=False)
@@ -0,0 +1,306 @@
+import numpy as np
+
+from .instrumentation import instrumented
+from .row_statistics import RowStatistics
+
+
+# ============================================================
+# ROW TENSORS
+#   A segmented point cloud is handled as a padded tensor
+#   rows[i, p] (n_rows, n_pts, 3) plus the number of valid
+#   points of each row, counts[i]. Padding entries are zero.
+# ============================================================
+def rows_to_tensor(xyz, step):
+    """
+    Reshapes a point cloud into a padded row tensor. Row i holds the points
+    i, i + step, i + 2*step, ... (the same split as split_rows).
+
+    When the number of points is a multiple of step the tensor is a view
+    of xyz (no copy).
+
+    Returns:
+        rows: (step, n_pts, 3) array
+        counts: (step,) number of valid points per row
+    """
+    xyz = np.asarray(xyz, dtype=np.float64).reshape(-1, 3)
+    n = len(xyz)
+    n_pts = -(-n // step)
+
+    if n != n_pts * step:
+        padded = np.zeros((n_pts * step, 3))
+        padded[:n] = xyz
+        xyz = padded
+
+    rows = xyz.reshape(n_pts, step, 3).transpose(1, 0, 2)
+    counts = np.maximum(n - np.arange(step) + step - 1, 0) // step
+
+    return rows, counts
+
+
+def rows_to_tensor_batch(clouds, step):
+    """
+    rows_to_tensor for a batch of clouds of the same size, with the rows of
+    all clouds stacked: the rows of cloud b are rows[b * step:(b + 1) * step].
+
+    Parameters:
+        clouds: (n_batch, N, 3) array
+
+    Returns:
+        rows: (n_batch * step, n_pts, 3) array
+        counts: (n_batch * step,) number of valid points per row
+    """
+    clouds = np.asarray(clouds, dtype=np.float64)
+    n_batch, n = clouds.shape[:2]
+    n_pts = -(-n // step)
+
+    if n != n_pts * step:
+        padded = np.zeros((n_batch, n_pts * step, 3))
+        padded[:, :n] = clouds
+        clouds = padded
+
+    rows = clouds.reshape(n_batch, n_pts, step, 3).transpose(0, 2, 1, 3).reshape(-1, n_pts, 3)
+    counts = np.maximum(n - np.arange(step) + step - 1, 0) // step
+
+    return rows, np.tile(counts, n_batch)
+
+
+def stack_rows(row_points):
+    """
+    Stacks a list of (n_i, 3) point arrays into a padded row tensor.
+
+    Returns:
+        rows: (n_rows, max n_i, 3) array
+        counts: (n_rows,) number of valid points per row
+    """
+    counts = np.array([len(points) for points in row_points], dtype=np.int64)
+    rows = np.zeros((len(row_points), counts.max(initial=0), 3))
+
+    for i, points in enumerate(row_points):
+        rows[i, :counts[i]] = points
+
+    return rows, counts
+
+
+def row_arrays(rows):
+    """
+    List of (n_i, 3) point arrays from a RowPartition (strided views) or
+    from a list of rows given as DataFrames with X, Y, Z columns or arrays.
+    """
+    return [
+        row[['X', 'Y', 'Z']].to_numpy() if hasattr(row, 'columns') else np.asarray(row)
+        for row in rows
+    ]
+
+
+def as_row_tensor(rows):
+    """
+    Padded row tensor and counts from a RowPartition (no copy when the
+    cloud length is a multiple of the step) or from a list of rows
+    (see row_arrays).
+    """
+    if hasattr(rows, 'tensor'):
+        return rows.tensor()
+
+    return stack_rows(row_arrays(rows))
+
+
+def unstack_rows(rows, counts):
+    """Inverse of stack_rows: list of (n_i, 3) arrays."""
+    return [rows[i, :counts[i]] for i in range(len(counts))]
+
+
+def _valid_mask(rows, counts):
+    return np.arange(rows.shape[1])[None, :] < counts[:, None]
+
+
+# ============================================================
+# BATCHED REGISTRATION STEPS
+# ============================================================
+def row_centroids(rows, counts):
+    """Centroid of every row, (n_rows, 3). Empty rows are NaN."""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return rows.sum(axis=1) / counts[:, None]
+
+
+def row_covariances(rows, counts, centroids):
+    """3x3 scatter matrix of every row about its centroid, (n_rows, 3, 3)."""
+    centered = (rows - centroids[:, None, :]) * _valid_mask(rows, counts)[:, :, None]
+    return np.einsum('rpi,rpj->rij', centered, centered)
+
+
+def dominant_directions(covariances):
+    """
+    Dominant eigenvector of every symmetric 3x3 scatter matrix, computed
+    with a single stacked np.linalg.eigh.
+
+    Returns:
+        directions: (n_rows, 3) unit vectors
+        linearity: (n_rows,) 1 - lambda_2 / lambda_1, close to 1 for points
+                   lying on a line and 0 for isotropic (or degenerate) rows
+    """
+    eigenvalues, eigenvectors = np.linalg.eigh(covariances)
+
+    # Eigenvalues are returned in ascending order
+    directions = eigenvectors[:, :, 2]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        linearity = np.where(
+            eigenvalues[:, 2] > 0, 1 - eigenvalues[:, 1] / eigenvalues[:, 2], 0.0
+        )
+
+    return directions, linearity
+
+
+def fit_lines_batch(rows, counts, return_linearity=False):
+    """
+    Fits a 3D line to every row at once.
+
+    The principal direction is the dominant eigenvector of the row's 3x3
+    scatter matrix, so the full (n_pts, 3) point sets are never decomposed.
+
+    Returns:
+        centroids: (n_rows, 3)
+        directions: (n_rows, 3) unit vectors
+        linearity: (n_rows,) only if return_linearity (see dominant_directions)
+    """
+    centroids = row_centroids(rows, counts)
+    covariances = row_covariances(rows, counts, np.nan_to_num(centroids))
+
+    directions, linearity = dominant_directions(covariances)
+
+    directions[counts == 0] = np.nan
+
+    if return_linearity:
+        return centroids, directions, linearity
+
+    return centroids, directions
+
+
+def line_triads(directions):
+    """
+    Orthonormal triad (e1, e2, e3) of every fitted line, as in
+    compute_line_vectors.
+
+    Returns:
+        triads: (n_rows, 3, 3) matrices whose columns are e1, e2, e3
+    """
+    e1 = directions / np.linalg.norm(directions, axis=1, keepdims=True)
+
+    # Enforce e1 orientation toward positive Y
+    e1 = np.where(e1[:, 1:2] < 0, -e1, e1)
+
+    # Fixed reference vector, replaced by X when e1 is close to Z
+    reference = np.tile([0.0, 0.0, 1.0], (len(e1), 1))
+    reference[np.abs(e1[:, 2]) > 0.95] = [1.0, 0.0, 0.0]
+
+    # e2 orthogonal to e1
+    v_proj = reference - np.sum(reference * e1, axis=1, keepdims=True) * e1
+    e2 = v_proj / np.linalg.norm(v_proj, axis=1, keepdims=True)
+
+    # e3 as the cross product
+    e3 = np.cross(e1, e2)
+    e3 /= np.linalg.norm(e3, axis=1, keepdims=True)
+
+    return np.stack([e1, e2, e3], axis=2)
+
+
+def row_rotations(cam_triads, tvs_triads):
+    """Rotation of every row, R_i = E_tvs @ E_cam.T, (n_rows, 3, 3)."""
+    return tvs_triads @ cam_triads.transpose(0, 2, 1)
+
+
+def align_rows(cam_rows, counts, cam_centroids, tvs_centroids, rotations):
+    """
+    Aligns every CAM row with its TVS row:
+        p_hat = R_i (p - c_cam_i) + c_tvs_i
+
+    Returns:
+        aligned: (n_rows, n_pts, 3) padded tensor (padding is zero)
+    """
+    centered = cam_rows - cam_centroids[:, None, :]
+    aligned = centered @ rotations.transpose(0, 2, 1) + tvs_centroids[:, None, :]
+
+    return aligned * _valid_mask(cam_rows, counts)[:, :, None]
+
+
+def rows_rmse(cam_rows, tvs_rows, counts):
+    """Global RMSE over all valid points of two corresponding row tensors."""
+    diff = (cam_rows - tvs_rows) * _valid_mask(cam_rows, counts)[:, :, None]
+    return np.sqrt(np.sum(diff ** 2) / counts.sum())
+
+
+# ============================================================
+# FULL ROW-WISE REGISTRATION
+# ============================================================
+def register_rows(cam_xyz, tvs_xyz, step):
+    """
+    Row-wise registration of a CAM cloud onto a TVS cloud with
+    point-to-point correspondence, in a handful of batched NumPy calls.
+
+    Parameters:
+        cam_xyz: (N, 3) CAM points
+        tvs_xyz: (N, 3) TVS points
+        step: number of rows (split step)
+
+    Returns:
+        dict with the per-row centroids, directions, linearity scores,
+        triads and rotations of both clouds, the aligned CAM tensor, the row counts and the
+        global RMSE.
+    """
+    if len(cam_xyz) != len(tvs_xyz):
+        raise ValueError(
+            f"CAM ({len(cam_xyz)}) and TVS ({len(tvs_xyz)}) point clouds differ in size"
+        )
+
+    cam_rows, counts = rows_to_tensor(cam_xyz, step)
+    tvs_rows, _ = rows_to_tensor(tvs_xyz, step)
+
+    return register_row_tensors(cam_rows, tvs_rows, counts)
+
+
+def register_row_tensors(cam_rows, tvs_rows, counts):
+    """register_rows on already segmented (padded) row tensors."""
+    result = register_statistics(RowStatistics.from_row_tensors(cam_rows, tvs_rows, counts))
+
+    result['aligned'] = align_rows(
+        cam_rows, counts, result['cam_centroids'], result['tvs_centroids'], result['rotations']
+    )
+
+    return result
+
+
+@instrumented()
+def register_statistics(statistics):
+    """
+    Row-wise registration derived from per-row statistics alone (see
+    RowStatistics): the points are not needed, so statistics of subsets
+    of stops or rows can be combined and registered directly.
+
+    Returns:
+        the register_rows dict without the aligned tensor; the RMSE is
+        obtained analytically from the scatter and cross matrices.
+    """
+    cam_directions, cam_linearity = dominant_directions(statistics.cam_scatter)
+    tvs_directions, tvs_linearity = dominant_directions(statistics.tvs_scatter)
+
+    empty = statistics.counts == 0
+    cam_directions[empty] = np.nan
+    tvs_directions[empty] = np.nan
+
+    cam_triads = line_triads(cam_directions)
+    tvs_triads = line_triads(tvs_directions)
+
+    rotations = row_rotations(cam_triads, tvs_triads)
+
+    return {
+        'cam_centroids': statistics.cam.centroids,
+        'tvs_centroids': statistics.tvs.centroids,
+        'cam_directions': cam_directions,
+        'tvs_directions': tvs_directions,
+        'cam_linearity': cam_linearity,
+        'tvs_linearity': tvs_linearity,
+        'cam_triads': cam_triads,
+        'tvs_triads': tvs_triads,
+        'rotations': rotations,
+        'counts': statistics.counts,
+        'rmse': statistics.rmse(rotations),
+    }
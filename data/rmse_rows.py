@@ -1,4 +1,5 @@
 import numpy as np
+from .registration_engine import as_row_tensor, rows_rmse
 
 def compute_rmse_rows(cam_rows, tvs_rows):
     """
@@ -6,26 +7,22 @@ def compute_rmse_rows(cam_rows, tvs_rows):
     Point-to-point correspondence is assumed between corresponding rows.
 
     Parameters:
-        cam_rows: list of DataFrames (one per offset) from the CAM point cloud
-        tvs_rows: list of DataFrames (one per offset) from the TVS point cloud
+        cam_rows: RowPartition or list of DataFrames (one per offset) from the CAM point cloud
+        tvs_rows: RowPartition or list of DataFrames (one per offset) from the TVS point cloud
 
     Returns:
         global_rmse: scalar value of the global root mean square error
     """
-    squared_errors = []
+    cam_tensor, cam_counts = as_row_tensor(cam_rows)
+    tvs_tensor, tvs_counts = as_row_tensor(tvs_rows)
 
-    for i in range(len(cam_rows)):
-        cam_points = cam_rows[i][['X', 'Y', 'Z']].to_numpy()
-        tvs_points = tvs_rows[i][['X', 'Y', 'Z']].to_numpy()
+    # Lengths may differ: compare the rows both clouds have
+    mismatch = np.flatnonzero(cam_counts[:len(tvs_counts)] != tvs_counts[:len(cam_counts)])
+    if len(cam_counts) != len(tvs_counts) or len(mismatch):
+        i = mismatch[0] if len(mismatch) else min(len(cam_counts), len(tvs_counts))
+        raise ValueError(
+            f"Row {i} does not contain the same number of points in both point clouds"
+        )
 
-        if cam_points.shape != tvs_points.shape:
-            raise ValueError(
-                f"Row {i} does not contain the same number of points in both point clouds"
-            )
-
-        diff = cam_points - tvs_points
-        distances = np.linalg.norm(diff, axis=1)
-        squared_errors.extend(distances ** 2)
-
-    global_rmse = np.sqrt(np.mean(squared_errors))
+    global_rmse = rows_rmse(cam_tensor, tvs_tensor, cam_counts)
     return global_rmse
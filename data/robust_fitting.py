@@ -0,0 +1,361 @@
+import numpy as np
+
+from .instrumentation import instrumented
+from .registration_engine import as_row_tensor, dominant_directions
+from .row_statistics import RowStatistics
+
+
+# ============================================================
+# ROBUST LINE FITS
+#   A misdetected laser spot (e.g. a reflection) is a point far
+#   from the line of its row. Each row is fitted robustly and its
+#   points farther than a threshold from the line are outliers:
+#     - "irls":   least squares line reweighted with Tukey's
+#                 biweight until the weights settle
+#     - "ransac": lines through two random points of the row,
+#                 scored in batches (MSAC cost) on a subsample of
+#                 the points, stopped as soon as the best inlier
+#                 ratio reaches the requested confidence, then
+#                 refitted on their inliers
+#   The threshold is k_sigma times the robust scale of the row,
+#   estimated from the median distance to the line (Rayleigh
+#   distribution of a 2D Gaussian residual), or a fixed distance
+#   (m). Rows with fewer than min_points points keep all of them.
+# ============================================================
+RAYLEIGH_MEDIAN = np.sqrt(2 * np.log(2))
+TUKEY_C = 4.685
+
+# Points per row used to estimate the scale and score the hypotheses
+SCORE_POINTS = 1024
+
+
+def _valid_mask(counts, n_pts):
+    return np.arange(n_pts)[None, :] < counts[:, None]
+
+
+def _sample_points(counts, n_samples, rng):
+    """(n_rows, n_samples) random point indices of every row (0 for empty rows)."""
+    return (rng.random((len(counts), n_samples)) * np.maximum(counts, 1)[:, None]).astype(np.int64)
+
+
+def line_distances(rows, centroids, directions):
+    """Distance of every point of a padded row tensor to the line of its row, (n_rows, n_pts)."""
+    centered = rows - centroids[:, None, :]
+    along = np.einsum('rpk,rk->rp', centered, directions)
+    squared = np.einsum('rpk,rpk->rp', centered, centered) - along ** 2
+
+    return np.sqrt(np.maximum(squared, 0.0))
+
+
+def weighted_lines(rows, weights):
+    """
+    Line of every row from weighted points.
+
+    Parameters:
+        rows: (n_rows, n_pts, 3) padded row tensor
+        weights: (n_rows, n_pts) point weights (0 for padding and outliers)
+
+    Returns:
+        centroids: (n_rows, 3), zero for rows without weight
+        directions: (n_rows, 3) unit vectors
+    """
+    total = weights.sum(axis=1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        centroids = np.einsum('rp,rpk->rk', weights, rows) / total[:, None]
+    centroids = np.nan_to_num(centroids)
+
+    centered = (rows - centroids[:, None, :]) * np.sqrt(weights)[:, :, None]
+    directions, _ = dominant_directions(np.einsum('rpi,rpj->rij', centered, centered))
+
+    return centroids, directions
+
+
+def robust_scale(rows, counts, centroids, directions, samples):
+    """
+    Robust standard deviation of the distances to the line of every row,
+    from the median distance of the sampled points.
+    """
+    points = np.take_along_axis(rows, samples[:, :, None], axis=1)
+    distances = line_distances(points, centroids, directions)
+
+    return np.where(counts > 0, np.median(distances, axis=1) / RAYLEIGH_MEDIAN, 0.0)
+
+
+def _thresholds(scale, threshold, k_sigma, min_threshold):
+    if threshold is not None:
+        return np.full(len(scale), float(threshold))
+
+    return np.maximum(k_sigma * scale, min_threshold)
+
+
+def _final_inliers(rows, counts, weights, thresholds, min_points):
+    """Least squares refit on the inliers of weights and inlier mask of the refitted lines."""
+    valid = _valid_mask(counts, rows.shape[1])
+
+    centroids, directions = weighted_lines(rows, weights)
+    inliers = valid & (line_distances(rows, centroids, directions) <= thresholds[:, None])
+
+    # Rows too short for a robust fit keep all their points
+    inliers[counts < min_points] = valid[counts < min_points]
+
+    return inliers, centroids, directions
+
+
+def irls_lines(rows, counts, threshold=None, k_sigma=3.0, min_threshold=1e-5, min_points=5,
+               max_iterations=20, tolerance=1e-4, seed=0):
+    """
+    Robust line of every row by iteratively reweighted least squares
+    (Tukey's biweight), stopped when no line moves by more than
+    tolerance (direction change in radians, offset of the centroid from
+    the previous line in Tukey cutoffs).
+
+    Parameters:
+        rows, counts: padded row tensor and valid points per row
+        threshold: inlier distance (m), or None for k_sigma robust scales
+        k_sigma: inlier threshold in robust standard deviations
+        min_threshold: lower bound of the automatic threshold (m)
+        min_points: rows with fewer points keep all of them
+        max_iterations: maximum number of reweighting iterations
+        tolerance: largest line change of a converged fit
+        seed: seed of the point subsample of the scale estimate
+
+    Returns:
+        dict with 'inliers' (n_rows, n_pts) mask, 'centroids' and
+        'directions' (n_rows, 3) of the inlier lines, 'scale' and
+        'threshold' (n_rows,) and the number of 'iterations'
+    """
+    rows = np.asarray(rows, dtype=np.float64)
+    counts = np.asarray(counts, dtype=np.int64)
+    samples = _sample_points(counts, min(SCORE_POINTS, rows.shape[1]), np.random.default_rng(seed))
+
+    valid = _valid_mask(counts, rows.shape[1])
+    weights = valid.astype(np.float64)
+    centroids, directions = weighted_lines(rows, weights)
+
+    iterations = 0
+    for iterations in range(1, max_iterations + 1):
+        scale = robust_scale(rows, counts, centroids, directions, samples)
+        cutoff = TUKEY_C * np.maximum(scale, min_threshold / k_sigma)
+
+        u = line_distances(rows, centroids, directions) / cutoff[:, None]
+        weights = np.where(valid, np.maximum(1 - u ** 2, 0.0) ** 2, 0.0)
+
+        previous_centroids, previous_directions = centroids, directions
+        centroids, directions = weighted_lines(rows, weights)
+
+        turn = np.linalg.norm(np.cross(directions, previous_directions), axis=1)
+        shift = line_distances(centroids[:, None, :], previous_centroids, previous_directions)[:, 0] / cutoff
+        if max(turn.max(initial=0.0), shift.max(initial=0.0)) < tolerance:
+            break
+
+    scale = robust_scale(rows, counts, centroids, directions, samples)
+    thresholds = _thresholds(scale, threshold, k_sigma, min_threshold)
+    inliers, centroids, directions = _final_inliers(rows, counts, weights > 0, thresholds, min_points)
+
+    return {
+        'inliers': inliers,
+        'centroids': centroids,
+        'directions': directions,
+        'scale': scale,
+        'threshold': thresholds,
+        'iterations': iterations,
+    }
+
+
+def ransac_lines(rows, counts, threshold=None, k_sigma=3.0, min_threshold=1e-5, min_points=5,
+                 confidence=0.99, max_hypotheses=512, batch_size=8, seed=0):
+    """
+    Robust line of every row by RANSAC with MSAC scoring.
+
+    Hypotheses (lines through two distinct random points of a row) are
+    drawn in batches of growing size and scored at once for all rows on
+    a subsample of at most SCORE_POINTS points per row. Sampling stops
+    when, for every row, the best inlier ratio w gives the requested
+    confidence (log(1 - confidence) / log(1 - w^2) hypotheses), or after
+    max_hypotheses. The best line is refitted on its inliers.
+
+    Parameters:
+        rows, counts: padded row tensor and valid points per row
+        threshold: inlier distance (m), or None for k_sigma robust scales
+                   of the least squares line
+        k_sigma, min_threshold, min_points: see irls_lines
+        confidence: probability of drawing at least one outlier-free pair
+        max_hypotheses: maximum number of hypotheses per row
+        batch_size: hypotheses of the first batch (doubled every batch)
+        seed: seed of the random generator
+
+    Returns:
+        dict as irls_lines, with the number of 'hypotheses' per row
+    """
+    rows = np.asarray(rows, dtype=np.float64)
+    counts = np.asarray(counts, dtype=np.int64)
+    rng = np.random.default_rng(seed)
+    n_rows, n_pts = rows.shape[:2]
+
+    # Centered scoring subsample (limits cancellation in the distances)
+    valid = _valid_mask(counts, n_pts)
+    centroids, directions = weighted_lines(rows, valid.astype(np.float64))
+    samples = _sample_points(counts, min(SCORE_POINTS, n_pts), rng)
+    points = np.take_along_axis(rows, samples[:, :, None], axis=1) - centroids[:, None, :]
+    squared_norms = np.einsum('rsk,rsk->rs', points, points)
+
+    scale = robust_scale(rows, counts, centroids, directions, samples)
+    thresholds = _thresholds(scale, threshold, k_sigma, min_threshold)
+    squared_thresholds = thresholds[:, None, None] ** 2
+
+    best_cost = np.full(n_rows, np.inf)
+    best_anchor = np.zeros((n_rows, 3))
+    best_direction = directions.copy()
+    best_ratio = np.zeros(n_rows)
+    drawn = 0
+
+    active = counts >= max(min_points, 2)
+    while drawn < max_hypotheses and active.any():
+        n_batch = min(batch_size, max_hypotheses - drawn)
+
+        # Two distinct points of every row
+        first = (rng.random((n_rows, n_batch)) * np.maximum(counts, 2)[:, None]).astype(np.int64)
+        second = (rng.random((n_rows, n_batch)) * np.maximum(counts - 1, 1)[:, None]).astype(np.int64)
+        second += second >= first
+
+        anchors = np.take_along_axis(rows, first[:, :, None], axis=1) - centroids[:, None, :]
+        ends = np.take_along_axis(rows, second[:, :, None], axis=1) - centroids[:, None, :]
+        lengths = np.linalg.norm(ends - anchors, axis=2)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            units = (ends - anchors) / lengths[:, :, None]
+
+        # Squared distances of the sampled points to every hypothesis, (rows, batch, samples)
+        along = np.einsum('rsk,rbk->rbs', points, units) - np.einsum('rbk,rbk->rb', anchors, units)[:, :, None]
+        squared = (
+            squared_norms[:, None, :]
+            - 2 * np.einsum('rsk,rbk->rbs', points, anchors)
+            + np.einsum('rbk,rbk->rb', anchors, anchors)[:, :, None]
+            - along ** 2
+        )
+        costs = np.minimum(squared, squared_thresholds).sum(axis=2)
+        costs[~(lengths > 0) | ~active[:, None]] = np.inf
+
+        best = np.argmin(costs, axis=1)
+        batch_cost = costs[np.arange(n_rows), best]
+        improved = batch_cost < best_cost
+
+        best_cost[improved] = batch_cost[improved]
+        best_anchor[improved] = anchors[improved, best[improved]]
+        best_direction[improved] = units[improved, best[improved]]
+        best_ratio[improved] = (squared[improved, best[improved]] <= squared_thresholds[improved, 0]).mean(axis=1)
+
+        drawn += n_batch
+        batch_size *= 2
+
+        # Early termination: hypotheses needed for the requested confidence
+        with np.errstate(divide='ignore', invalid='ignore'):
+            needed = np.where(
+                best_ratio > 0,
+                np.log(1 - confidence) / np.log(1 - np.minimum(best_ratio, 1 - 1e-12) ** 2),
+                np.inf
+            )
+        active &= ~(drawn >= needed)
+
+    distances = line_distances(rows, best_anchor + centroids, best_direction)
+    inliers, centroids, directions = _final_inliers(
+        rows, counts, (valid & (distances <= thresholds[:, None])).astype(np.float64), thresholds, min_points
+    )
+
+    return {
+        'inliers': inliers,
+        'centroids': centroids,
+        'directions': directions,
+        'scale': scale,
+        'threshold': thresholds,
+        'hypotheses': drawn,
+    }
+
+
+ROBUST_METHODS = {
+    'irls': irls_lines,
+    'ransac': ransac_lines,
+}
+
+
+# ============================================================
+# ROBUST ROW-WISE REGISTRATION
+#   A point pair is kept when both its CAM and its TVS point are
+#   inliers of their row. The registration then runs on the row
+#   statistics of the inlier pairs (see RowStatistics), so the
+#   lines, rotations and RMSE ignore the outliers, and the
+#   alignment is still applied to every point.
+# ============================================================
+@instrumented(count=lambda result: {'rows': len(result['counts']), 'points': int(result['counts'].sum())})
+def robust_inliers(cam_rows, tvs_rows, method="irls", min_points=5, **options):
+    """
+    Inlier mask of the point pairs of two segmented clouds. Rows left with
+    fewer than min_points inlier pairs (e.g. with a threshold below the
+    noise of the row) keep all their pairs.
+
+    Parameters:
+        cam_rows, tvs_rows: RowPartitions or lists of rows with the same
+                            number of points per row
+        method: "irls" or "ransac"
+        min_points: see irls_lines
+        **options: passed to irls_lines / ransac_lines (threshold,
+                   k_sigma...)
+
+    Returns:
+        dict with
+            'inliers': (n_rows, n_pts) mask of the pairs in row tensor layout
+            'counts': (n_rows,) points per row
+            'inlier_ratio': (n_rows,) fraction of inlier pairs (NaN for empty rows)
+            'fallback_rows': indices of the rows that keep all their pairs
+            'cam', 'tvs': results of the line fits of each cloud
+    """
+    if method not in ROBUST_METHODS:
+        raise ValueError(f"Unknown robust method: {method} (expected {', '.join(ROBUST_METHODS)})")
+
+    cam_tensor, cam_counts = as_row_tensor(cam_rows)
+    tvs_tensor, tvs_counts = as_row_tensor(tvs_rows)
+
+    if len(cam_counts) != len(tvs_counts) or (cam_counts != tvs_counts).any():
+        raise ValueError("Both point clouds need the same number of points in every row")
+
+    cam_fit = ROBUST_METHODS[method](cam_tensor, cam_counts, min_points=min_points, **options)
+    tvs_fit = ROBUST_METHODS[method](tvs_tensor, tvs_counts, min_points=min_points, **options)
+    inliers = cam_fit['inliers'] & tvs_fit['inliers']
+
+    fallback_rows = np.flatnonzero(inliers.sum(axis=1) < np.minimum(min_points, cam_counts))
+    inliers[fallback_rows] = _valid_mask(cam_counts, cam_tensor.shape[1])[fallback_rows]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        inlier_ratio = inliers.sum(axis=1) / cam_counts
+
+    return {
+        'inliers': inliers,
+        'counts': cam_counts,
+        'inlier_ratio': inlier_ratio,
+        'fallback_rows': fallback_rows,
+        'cam': cam_fit,
+        'tvs': tvs_fit,
+    }
+
+
+def inlier_statistics(cam_rows, tvs_rows, inliers):
+    """RowStatistics of the inlier pairs only (see robust_inliers)."""
+    cam_tensor, _ = as_row_tensor(cam_rows)
+    tvs_tensor, _ = as_row_tensor(tvs_rows)
+
+    # Inliers first in every row, in their original order
+    order = np.argsort(~inliers, axis=1, kind='stable')[:, :, None]
+
+    return RowStatistics.from_row_tensors(
+        np.take_along_axis(cam_tensor, order, axis=1),
+        np.take_along_axis(tvs_tensor, order, axis=1),
+        inliers.sum(axis=1)
+    )
+
+
+def point_inliers(inliers, n_points):
+    """
+    Inlier mask of a row tensor in the original point order of the cloud
+    (point i, i + step, ... of row i, as rows_to_tensor), shape (n_points,).
+    """
+    return inliers.T.reshape(-1)[:n_points]
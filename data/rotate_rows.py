@@ -1,34 +1,49 @@
-import pandas as pd
+import numpy as np
+from .instrumentation import instrumented
+from .registration_engine import as_row_tensor, unstack_rows, row_centroids, align_rows
+from .split_rows import RowPartition
 
-def rotate_rows(cam_rows, tvs_rows, rotations):
+def _count_points(rows):
+    """Number of aligned points of a RowPartition or of a list of rows."""
+    if isinstance(rows, RowPartition):
+        return {'points': len(rows.xyz)}
+    return {'points': sum(len(row) for row in rows)}
+
+
+@instrumented(count=_count_points)
+def rotate_rows(cam_rows, tvs_rows, rotations, statistics=None):
     """
     Applies an individual rotation to each row of the CAM point cloud, aligning it
     with the corresponding row in the TVS point cloud. Uses the local centroid and
     the per-row rotation matrix.
-    """
-    aligned_cam_rows = []
-
-    for i in range(len(cam_rows)):
-        df_cam = cam_rows[i].copy()
-        df_tvs = tvs_rows[i]
-        R_i = rotations[i]
-
-        # Compute centroids
-        cam_centroid = df_cam[['X', 'Y', 'Z']].mean().to_numpy()
-        tvs_centroid = df_tvs[['X', 'Y', 'Z']].mean().to_numpy()
 
-        # Center CAM points
-        cam_points = df_cam[['X', 'Y', 'Z']].to_numpy()
-        centered_points = cam_points - cam_centroid
-
-        # Apply rotation
-        rotated_points = (R_i @ centered_points.T).T
-
-        # Translate to TVS frame
-        aligned_points = rotated_points + tvs_centroid
-
-        # Store aligned DataFrame
-        df_aligned = pd.DataFrame(aligned_points, columns=['X', 'Y', 'Z'])
-        aligned_cam_rows.append(df_aligned)
-
-    return aligned_cam_rows
+    Rows can be given as RowPartitions (a RowPartition of the aligned cloud is
+    returned) or as lists of DataFrames (a list of DataFrames is returned).
+    The centroids are taken from statistics (RowStatistics) when given.
+    """
+    cam_tensor, cam_counts = as_row_tensor(cam_rows)
+
+    # Compute centroids
+    if statistics is not None:
+        cam_centroids = statistics.cam.centroids
+        tvs_centroids = statistics.tvs.centroids
+    else:
+        tvs_tensor, tvs_counts = as_row_tensor(tvs_rows)
+        cam_centroids = row_centroids(cam_tensor, cam_counts)
+        tvs_centroids = row_centroids(tvs_tensor, tvs_counts)
+
+    # Center, rotate and translate to TVS frame
+    aligned = align_rows(
+        cam_tensor, cam_counts, cam_centroids, tvs_centroids,
+        np.asarray(rotations, dtype=np.float64).reshape(-1, 3, 3)
+    )
+
+    if isinstance(cam_rows, RowPartition):
+        return RowPartition.from_tensor(aligned, cam_counts)
+
+    # Store aligned DataFrames
+    import pandas as pd
+    return [
+        pd.DataFrame(points, columns=['X', 'Y', 'Z'])
+        for points in unstack_rows(aligned, cam_counts)
+    ]
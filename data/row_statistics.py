@@ -0,0 +1,259 @@
+import numpy as np
+
+from .instrumentation import instrumented
+
+
+# ============================================================
+# ROW STATISTICS
+#   Everything the row-wise registration needs from the points
+#   of a row i is a handful of moments:
+#       n_i                      number of point pairs
+#       c_cam_i, c_tvs_i         centroids
+#       S_cam_i, S_tvs_i         3x3 centered scatter matrices
+#       C_i                      3x3 centered CAM-TVS cross matrix
+#   Two sets of moments of the same row are merged exactly
+#   (pairwise update of Chan et al.), so statistics of stops or
+#   chunks can be computed once and combined freely.
+# ============================================================
+def _grouped_sum(index, values, n_groups):
+    """Sums of values (n, ...) grouped by index (n,), shape (n_groups, ...)."""
+    values = np.asarray(values, dtype=np.float64)
+    flat = values.reshape(len(values), int(np.prod(values.shape[1:])))
+
+    sums = np.zeros((n_groups, flat.shape[1]))
+    for i in range(flat.shape[1]):
+        sums[:, i] = np.bincount(index, weights=flat[:, i], minlength=n_groups)
+
+    return sums.reshape((n_groups,) + values.shape[1:])
+
+
+class RowMoments:
+    """
+    Moments of the rows of one point cloud (a view on RowStatistics).
+
+    Attributes:
+        counts: (n_rows,) number of points
+        mean: (n_rows, 3) centroids (zero for empty rows)
+        scatter: (n_rows, 3, 3) centered scatter matrices
+    """
+
+    def __init__(self, counts, mean, scatter):
+        self.counts = counts
+        self.mean = mean
+        self.scatter = scatter
+
+    def __len__(self):
+        return len(self.counts)
+
+    @property
+    def centroids(self):
+        """Centroids with NaN for empty rows (as row_centroids)."""
+        return np.where(self.counts[:, None] > 0, self.mean, np.nan)
+
+
+class RowStatistics:
+    """
+    Merge-able per-row statistics of two corresponding (CAM, TVS) clouds.
+
+    Centroids, line directions, triads, rotations and the RMSE after the
+    row-wise alignment are all derived from it (see register_statistics
+    in registration_engine), without touching the points again.
+
+    Attributes:
+        counts: (n_rows,) number of point pairs per row
+        cam_mean, tvs_mean: (n_rows, 3) centroids (zero for empty rows)
+        cam_scatter, tvs_scatter: (n_rows, 3, 3) centered scatter matrices
+        cross: (n_rows, 3, 3) centered cross matrices sum (p - c_cam)(q - c_tvs)^T
+    """
+
+    def __init__(self, counts, cam_mean, tvs_mean, cam_scatter, tvs_scatter, cross):
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.cam_mean = cam_mean
+        self.tvs_mean = tvs_mean
+        self.cam_scatter = cam_scatter
+        self.tvs_scatter = tvs_scatter
+        self.cross = cross
+
+    # --------------------------------------------------------
+    # CONSTRUCTION
+    # --------------------------------------------------------
+    @classmethod
+    def empty(cls, n_rows):
+        return cls(
+            np.zeros(n_rows, dtype=np.int64),
+            np.zeros((n_rows, 3)), np.zeros((n_rows, 3)),
+            np.zeros((n_rows, 3, 3)), np.zeros((n_rows, 3, 3)), np.zeros((n_rows, 3, 3))
+        )
+
+    @classmethod
+    def from_row_tensors(cls, cam_rows, tvs_rows, counts):
+        """
+        Statistics of two padded row tensors (n_rows, n_pts, 3) sharing the
+        same counts (see registration_engine.rows_to_tensor).
+        """
+        counts = np.asarray(counts, dtype=np.int64)
+        mask = (np.arange(cam_rows.shape[1])[None, :] < counts[:, None])[:, :, None]
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cam_mean = np.where(counts[:, None] > 0, (cam_rows * mask).sum(axis=1) / counts[:, None], 0.0)
+            tvs_mean = np.where(counts[:, None] > 0, (tvs_rows * mask).sum(axis=1) / counts[:, None], 0.0)
+
+        cam_centered = (cam_rows - cam_mean[:, None, :]) * mask
+        tvs_centered = (tvs_rows - tvs_mean[:, None, :]) * mask
+
+        return cls(
+            counts, cam_mean, tvs_mean,
+            np.einsum('rpi,rpj->rij', cam_centered, cam_centered),
+            np.einsum('rpi,rpj->rij', tvs_centered, tvs_centered),
+            np.einsum('rpi,rpj->rij', cam_centered, tvs_centered)
+        )
+
+    @classmethod
+    @instrumented(count=lambda statistics: {'rows': len(statistics), 'points': statistics.n_points})
+    def from_rows(cls, cam_rows, tvs_rows):
+        """
+        Statistics of two segmented clouds given as RowPartitions or lists
+        of rows (see registration_engine.as_row_tensor).
+        """
+        from .registration_engine import as_row_tensor
+
+        cam_tensor, cam_counts = as_row_tensor(cam_rows)
+        tvs_tensor, tvs_counts = as_row_tensor(tvs_rows)
+
+        mismatch = np.flatnonzero(cam_counts[:len(tvs_counts)] != tvs_counts[:len(cam_counts)])
+        if len(cam_counts) != len(tvs_counts) or len(mismatch):
+            i = mismatch[0] if len(mismatch) else min(len(cam_counts), len(tvs_counts))
+            raise ValueError(
+                f"Row {i} does not contain the same number of points in both point clouds"
+            )
+
+        return cls.from_row_tensors(cam_tensor, tvs_tensor, cam_counts)
+
+    @classmethod
+    def from_points(cls, rows, cam_points, tvs_points, n_rows):
+        """
+        Statistics of corresponding point pairs with an explicit row index.
+
+        Parameters:
+            rows: (n,) row index of every pair
+            cam_points, tvs_points: (n, 3) corresponding points
+            n_rows: number of rows
+        """
+        rows = np.asarray(rows, dtype=np.int64).reshape(-1)
+        cam_points = np.asarray(cam_points, dtype=np.float64).reshape(-1, 3)
+        tvs_points = np.asarray(tvs_points, dtype=np.float64).reshape(-1, 3)
+
+        if len(cam_points) != len(rows) or len(tvs_points) != len(rows):
+            raise ValueError("rows, CAM points and TVS points differ in size")
+
+        if len(rows) and (rows.min() < 0 or rows.max() >= n_rows):
+            raise ValueError(f"Row indices must lie in [0, {n_rows})")
+
+        counts = np.bincount(rows, minlength=n_rows)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cam_mean = np.nan_to_num(_grouped_sum(rows, cam_points, n_rows) / counts[:, None])
+            tvs_mean = np.nan_to_num(_grouped_sum(rows, tvs_points, n_rows) / counts[:, None])
+
+        cam_centered = cam_points - cam_mean[rows]
+        tvs_centered = tvs_points - tvs_mean[rows]
+
+        return cls(
+            counts, cam_mean, tvs_mean,
+            _grouped_sum(rows, cam_centered[:, :, None] * cam_centered[:, None, :], n_rows),
+            _grouped_sum(rows, tvs_centered[:, :, None] * tvs_centered[:, None, :], n_rows),
+            _grouped_sum(rows, cam_centered[:, :, None] * tvs_centered[:, None, :], n_rows)
+        )
+
+    # --------------------------------------------------------
+    # COMBINATION
+    # --------------------------------------------------------
+    def __len__(self):
+        return len(self.counts)
+
+    @property
+    def n_points(self):
+        return int(self.counts.sum())
+
+    def merge(self, other):
+        """Statistics of the union of the points of two row-wise compatible sets."""
+        if len(self) != len(other):
+            raise ValueError(f"Cannot merge statistics of {len(self)} and {len(other)} rows")
+
+        n_a = self.counts[:, None]
+        n_b = other.counts[:, None]
+        n = n_a + n_b
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            fraction = np.where(n > 0, n_b / n, 0.0)
+        weight = (n_a * fraction)[:, :, None]
+
+        delta_cam = other.cam_mean - self.cam_mean
+        delta_tvs = other.tvs_mean - self.tvs_mean
+
+        return RowStatistics(
+            self.counts + other.counts,
+            self.cam_mean + delta_cam * fraction,
+            self.tvs_mean + delta_tvs * fraction,
+            self.cam_scatter + other.cam_scatter + weight * delta_cam[:, :, None] * delta_cam[:, None, :],
+            self.tvs_scatter + other.tvs_scatter + weight * delta_tvs[:, :, None] * delta_tvs[:, None, :],
+            self.cross + other.cross + weight * delta_cam[:, :, None] * delta_tvs[:, None, :]
+        )
+
+    __add__ = merge
+
+    def __getitem__(self, index):
+        """Statistics of a subset of rows (slice, index array or mask)."""
+        return RowStatistics(
+            self.counts[index], self.cam_mean[index], self.tvs_mean[index],
+            self.cam_scatter[index], self.tvs_scatter[index], self.cross[index]
+        )
+
+    @property
+    def cam(self):
+        return RowMoments(self.counts, self.cam_mean, self.cam_scatter)
+
+    @property
+    def tvs(self):
+        return RowMoments(self.counts, self.tvs_mean, self.tvs_scatter)
+
+    # --------------------------------------------------------
+    # ERROR AFTER ALIGNMENT
+    # --------------------------------------------------------
+    def squared_errors(self, rotations):
+        """
+        Sum of squared distances of every row after the alignment
+        p_hat = R_i (p - c_cam_i) + c_tvs_i:
+            tr(S_cam_i) + tr(S_tvs_i) - 2 tr(R_i C_i)
+        """
+        valid = self.counts > 0
+        rotations = np.where(valid[:, None, None], rotations, 0.0)
+
+        errors = (
+            np.trace(self.cam_scatter, axis1=1, axis2=2)
+            + np.trace(self.tvs_scatter, axis1=1, axis2=2)
+            - 2 * np.trace(rotations @ self.cross, axis1=1, axis2=2)
+        )
+
+        return np.maximum(np.where(valid, errors, 0.0), 0.0)
+
+    def rmse(self, rotations):
+        """Global RMSE after the row-wise alignment with the given rotations."""
+        if self.n_points == 0:
+            return np.nan
+
+        return np.sqrt(self.squared_errors(rotations).sum() / self.n_points)
+
+
+def combine(statistics):
+    """Merges a sequence of RowStatistics (e.g. one per stop)."""
+    statistics = list(statistics)
+
+    if not statistics:
+        raise ValueError("No statistics to combine")
+
+    total = statistics[0]
+    for other in statistics[1:]:
+        total = total.merge(other)
+
+    return total
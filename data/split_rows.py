@@ -1,3 +1,7 @@
+import numpy as np
+from .registration_engine import rows_to_tensor
+
+
 def split_rows(df, step):
     """
     Splits a DataFrame into multiple sub-DataFrames using a fixed step and
@@ -18,3 +22,62 @@ def split_rows(df, step):
         subclouds.append(sub_df)
 
     return subclouds
+
+
+class RowPartition:
+    """
+    Row split of a point cloud without copies.
+
+    Holds one contiguous (N, 3) XYZ array; row i is the strided view
+    xyz[i::step] (the same split as split_rows). The padded row tensor used
+    by the registration engine is a reshaped view when N is a multiple of
+    step. DataFrames are only built on demand (e.g. for plotting).
+
+    Parameters:
+        xyz: (N, 3) array of points (a memory-mapped array is not copied)
+        step: integer step size used for row-wise subsampling
+    """
+
+    def __init__(self, xyz, step):
+        self.xyz = np.asarray(xyz, dtype=np.float64).reshape(-1, 3)
+        self.step = step
+        self._dataframes = None
+
+    def __len__(self):
+        return self.step
+
+    def __getitem__(self, i):
+        if not -self.step <= i < self.step:
+            raise IndexError(f"Row {i} out of range for step {self.step}")
+        return self.xyz[i % self.step::self.step]
+
+    def __iter__(self):
+        return (self[i] for i in range(self.step))
+
+    @property
+    def counts(self):
+        """Number of points of every row."""
+        return np.maximum(len(self.xyz) - np.arange(self.step) + self.step - 1, 0) // self.step
+
+    def tensor(self):
+        """Padded (step, n_pts, 3) row tensor and the row counts."""
+        return rows_to_tensor(self.xyz, self.step)
+
+    @classmethod
+    def from_tensor(cls, rows, counts):
+        """
+        Builds a partition from a padded row tensor laid out as
+        rows_to_tensor, restoring the original point order.
+        """
+        step = len(counts)
+        xyz = rows.transpose(1, 0, 2).reshape(-1, 3)[:int(counts.sum())]
+        return cls(xyz, step)
+
+    def to_dataframes(self):
+        """List of DataFrames, one per row (built once and cached)."""
+        if self._dataframes is None:
+            import pandas as pd
+            self._dataframes = [
+                pd.DataFrame(self[i], columns=['X', 'Y', 'Z']) for i in range(self.step)
+            ]
+        return self._dataframes
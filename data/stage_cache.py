@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+
+
+CACHE_FILE = "stage_cache.json"
+FRAME_CACHE_FILE = "frame_cache.json"
+
+
+# ============================================================
+# SIGNATURES
+# ============================================================
+def file_signature(path, content_hash=False):
+    """
+    Signature of a file: size and modification time, plus the SHA-1 of
+    its content when content_hash is enabled. None if the file is missing.
+    """
+    if not os.path.exists(path):
+        return None
+
+    stat = os.stat(path)
+    signature = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    if content_hash:
+        sha1 = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha1.update(block)
+        signature['sha1'] = sha1.hexdigest()
+
+    return signature
+
+
+def parameters_signature(parameters):
+    """Stable hash of a JSON-serializable parameter dict."""
+    text = json.dumps(parameters, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def _load_json(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_json(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+# ============================================================
+# STAGE CACHE
+# ============================================================
+class StageCache:
+    """
+    Records, for every stage of an experiment, the signatures of its input
+    files, its parameters and its output files in
+    processed_data/stage_cache.json. A stage can be skipped while none of
+    them has changed.
+
+    Parameters:
+        processed_data_path: processed_data folder of the experiment
+        content_hash: compare file contents (SHA-1) instead of mtime/size
+    """
+
+    def __init__(self, processed_data_path, content_hash=False):
+        self.path = os.path.join(processed_data_path, CACHE_FILE)
+        self.content_hash = content_hash
+        self.entries = _load_json(self.path)
+
+    def _signatures(self, paths):
+        return {path: file_signature(path, self.content_hash) for path in sorted(paths)}
+
+    def is_valid(self, stage, inputs, parameters, outputs):
+        """
+        True if the stage was recorded with the same input signatures and
+        parameters and its outputs are unchanged since then.
+        """
+        entry = self.entries.get(stage)
+        if entry is None:
+            return False
+
+        outputs = self._signatures(outputs)
+
+        return (
+            entry['parameters'] == parameters_signature(parameters)
+            and entry['inputs'] == self._signatures(inputs)
+            and entry['outputs'] == outputs
+            and all(signature is not None for signature in outputs.values())
+        )
+
+    def record(self, stage, inputs, parameters, outputs):
+        """Stores the signatures of a stage that has just been run."""
+        self.entries[stage] = {
+            'parameters': parameters_signature(parameters),
+            'inputs': self._signatures(inputs),
+            'outputs': self._signatures(outputs),
+        }
+        _save_json(self.path, self.entries)
+
+    def invalidate(self, stage):
+        if self.entries.pop(stage, None) is not None:
+            _save_json(self.path, self.entries)
+
+
+# ============================================================
+# FRAME CACHE
+# ============================================================
+class FrameCache:
+    """
+    Per-frame results of step 1 (laser spot centroids) keyed on the
+    signature of every raw image, stored in processed_data/frame_cache.json.
+    The whole cache is discarded when the parameters (calibration,
+    detection settings) change.
+
+    Parameters:
+        processed_data_path: processed_data folder of the experiment
+        parameters: dict of everything the per-frame results depend on
+        content_hash: compare file contents (SHA-1) instead of mtime/size
+    """
+
+    def __init__(self, processed_data_path, parameters, content_hash=False):
+        self.path = os.path.join(processed_data_path, FRAME_CACHE_FILE)
+        self.content_hash = content_hash
+        self.parameters = parameters_signature(parameters)
+
+        data = _load_json(self.path)
+        self.frames = data.get('frames', {}) if data.get('parameters') == self.parameters else {}
+
+    def signature(self, image_path):
+        return file_signature(image_path, self.content_hash)
+
+    def get(self, image_name, signature):
+        """Cached result of a frame, or None if missing or outdated."""
+        entry = self.frames.get(image_name)
+        if entry is None or entry['signature'] != signature:
+            return None
+        return entry['result']
+
+    def put(self, image_name, signature, result):
+        self.frames[image_name] = {'signature': signature, 'result': result}
+
+    def prune(self, image_names):
+        """Drops the frames that are no longer present."""
+        keep = set(image_names)
+        self.frames = {name: entry for name, entry in self.frames.items() if name in keep}
+
+    def save(self):
+        _save_json(self.path, {'parameters': self.parameters, 'frames': self.frames})
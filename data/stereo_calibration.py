@@ -0,0 +1,254 @@
+import math
+from os.path import exists
+
+import cv2 as cv
+import numpy as np
+
+from . import path_utils
+from .instrumentation import instrumented
+
+
+CALIBRATION_FILE = 'stereo_rectification_map.xml'
+
+# Optional rectification parameters of each camera (node names in the
+# XML file): distortion coefficients, rectification rotation and
+# projection matrix. With them, points are rectified analytically;
+# otherwise the remap tables are inverted around each point.
+RECTIFICATION_NODES = {
+    'L': ('distL', 'rectL', 'projL'),
+    'R': ('distR', 'rectR', 'projR'),
+}
+
+# Stereo rig geometry: baseline (m) and sensor size (mm)
+BASELINE = 0.085
+SENSOR_H_MM = 4.61
+SENSOR_V_MM = 2.59
+
+_calibrations = {}
+
+
+class StereoCalibration:
+    """
+    Stereo calibration context shared by the rectifier and the triangulator.
+
+    The XML file is parsed once. Rectification maps are kept in fixed-point
+    format (cv.convertMaps) for a faster remap, and in floating point for
+    the rectification of single points. The FOV/theta constants used by the
+    triangulation are cached per image resolution.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.available = exists(path)
+
+        self.mapL = None
+        self.mapR = None
+        self.floatMapL = None
+        self.floatMapR = None
+        self.cameraL = None
+        self.cameraR = None
+        self.rectificationL = None
+        self.rectificationR = None
+        self._angles = {}
+
+        if not self.available:
+            return
+
+        cv_file = cv.FileStorage()
+        cv_file.open(path, cv.FileStorage_READ)
+
+        stereoMapL_x = cv_file.getNode('stereoMapL_x').mat()
+        stereoMapL_y = cv_file.getNode('stereoMapL_y').mat()
+        stereoMapR_x = cv_file.getNode('stereoMapR_x').mat()
+        stereoMapR_y = cv_file.getNode('stereoMapR_y').mat()
+        self.cameraL = cv_file.getNode('cameraL').mat()
+        self.cameraR = cv_file.getNode('cameraR').mat()
+
+        self.rectificationL = self._read_rectification(cv_file, self.cameraL, RECTIFICATION_NODES['L'])
+        self.rectificationR = self._read_rectification(cv_file, self.cameraR, RECTIFICATION_NODES['R'])
+
+        cv_file.release()
+
+        self.mapL = cv.convertMaps(stereoMapL_x, stereoMapL_y, cv.CV_16SC2)
+        self.mapR = cv.convertMaps(stereoMapR_x, stereoMapR_y, cv.CV_16SC2)
+        self.floatMapL = (stereoMapL_x, stereoMapL_y)
+        self.floatMapR = (stereoMapR_x, stereoMapR_y)
+
+    @staticmethod
+    def _read_rectification(cv_file, camera, names):
+        """(K, D, R, P) of one camera, or None if any of them is missing."""
+        matrices = [cv_file.getNode(name).mat() for name in names]
+
+        if camera is None or any(matrix is None for matrix in matrices):
+            return None
+
+        return (camera, *matrices)
+
+    @instrumented()
+    def rectify(self, imI, imD):
+        """
+        Rectifies a stereo pair. Images are returned unchanged when no
+        calibration file is available.
+        """
+        if not self.available:
+            return imI, imD
+
+        imD = cv.remap(imD, self.mapR[0], self.mapR[1], cv.INTER_LANCZOS4, cv.BORDER_CONSTANT, 0)
+        imI = cv.remap(imI, self.mapL[0], self.mapL[1], cv.INTER_LANCZOS4, cv.BORDER_CONSTANT, 0)
+
+        return imI, imD
+
+    @instrumented()
+    def rectify_points(self, pointsI, pointsD):
+        """
+        Rectified coordinates of raw image points, without remapping the
+        images. Uses cv.undistortPoints when the XML file holds the
+        rectification parameters (RECTIFICATION_NODES), and otherwise
+        inverts the remap tables locally.
+
+        Parameters:
+            pointsI, pointsD: (N, 2) raw points (x, y) of the left and right images
+
+        Returns:
+            (N, 2) float64 rectified points of each image; points that fall
+            outside the rectified image are NaN. Points are returned unchanged
+            when no calibration file is available.
+        """
+        pointsI = np.asarray(pointsI, dtype=np.float64).reshape(-1, 2)
+        pointsD = np.asarray(pointsD, dtype=np.float64).reshape(-1, 2)
+
+        if not self.available:
+            return pointsI, pointsD
+
+        return (
+            _rectify_points(pointsI, self.rectificationL, self.floatMapL),
+            _rectify_points(pointsD, self.rectificationR, self.floatMapR)
+        )
+
+    def angles(self, shape):
+        """
+        Returns (fx, FOV_H, FOV_V, theta_H, theta_V) for an image of the
+        given shape (height, width[, channels]).
+        """
+        V, H = shape[:2]
+
+        if (V, H) not in self._angles:
+            if self.cameraL is None:
+                raise FileNotFoundError(f"Calibration file not found: {self.path}")
+
+            fx = self.cameraL[0, 0]
+            fy = self.cameraL[1, 1]
+
+            Hsensor = SENSOR_H_MM / 1000
+            Vsensor = SENSOR_V_MM / 1000
+
+            # Lens parameters
+            f_mmx = fx * (Hsensor / H)
+            f_mmy = fy * (Vsensor / V)
+            FOV_H = 2 * math.degrees(math.atan(Hsensor / (2 * f_mmx)))
+            FOV_V = 2 * math.degrees(math.atan(Vsensor / (2 * f_mmy)))
+
+            theta_H = (180 - FOV_H) / 2
+            theta_V = (180 - FOV_V) / 2
+
+            self._angles[(V, H)] = (fx, FOV_H, FOV_V, theta_H, theta_V)
+
+        return self._angles[(V, H)]
+
+
+# ============================================================
+# POINT RECTIFICATION
+# ============================================================
+def _rectify_points(points, rectification, float_map):
+    if rectification is not None:
+        K, D, R, P = rectification
+        rectified = cv.undistortPoints(points.reshape(-1, 1, 2), K, D, R=R, P=P).reshape(-1, 2)
+
+        height, width = float_map[0].shape
+        outside = (
+            (rectified[:, 0] < 0) | (rectified[:, 0] > width - 1)
+            | (rectified[:, 1] < 0) | (rectified[:, 1] > height - 1)
+        )
+        rectified[outside] = np.nan
+        return rectified
+
+    return invert_map(float_map[0], float_map[1], points)
+
+
+def _sample_map(map_x, map_y, points):
+    """Bilinear interpolation of the remap tables at (N, 2) points inside the map."""
+    height, width = map_x.shape
+
+    x = points[:, 0]
+    y = points[:, 1]
+    x0 = np.clip(np.floor(x).astype(np.int64), 0, width - 2)
+    y0 = np.clip(np.floor(y).astype(np.int64), 0, height - 2)
+    fx = (x - x0)[:, None]
+    fy = (y - y0)[:, None]
+
+    corners = [
+        np.column_stack([map_x[yy, xx], map_y[yy, xx]])
+        for yy, xx in ((y0, x0), (y0, x0 + 1), (y0 + 1, x0), (y0 + 1, x0 + 1))
+    ]
+
+    return (
+        (1 - fy) * ((1 - fx) * corners[0] + fx * corners[1])
+        + fy * ((1 - fx) * corners[2] + fx * corners[3])
+    )
+
+
+def invert_map(map_x, map_y, points, iterations=20, tolerance=1e-3):
+    """
+    Rectified coordinates u of raw points p such that map(u) = p, where map
+    is the (bilinearly interpolated) remap table of cv.remap. Solved per
+    point with Newton iterations starting at u = p.
+
+    Parameters:
+        map_x, map_y: float remap tables (rectified pixel -> raw x, raw y)
+        points: (N, 2) raw points (x, y)
+        iterations: maximum number of Newton steps
+        tolerance: convergence threshold (px)
+
+    Returns:
+        (N, 2) rectified points, NaN where there is no solution inside the
+        rectified image.
+    """
+    height, width = map_x.shape
+    upper = np.array([width - 1, height - 1], dtype=np.float64)
+    step = np.array([[0.5, 0.0], [0.0, 0.5]])
+
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    rectified = np.clip(points, 0, upper)
+
+    for _ in range(iterations):
+        residual = _sample_map(map_x, map_y, rectified) - points
+        if np.all(np.abs(residual) < tolerance):
+            break
+
+        # Jacobian of the map by central differences
+        jacobian = np.stack([
+            _sample_map(map_x, map_y, np.clip(rectified + step[i], 0, upper))
+            - _sample_map(map_x, map_y, np.clip(rectified - step[i], 0, upper))
+            for i in range(2)
+        ], axis=-1)
+
+        rectified = np.clip(rectified - np.linalg.solve(jacobian, residual[:, :, None])[:, :, 0], 0, upper)
+
+    residual = _sample_map(map_x, map_y, rectified) - points
+    rectified[np.abs(residual).max(axis=1) > 100 * tolerance] = np.nan
+
+    return rectified
+
+
+def load_calibration(path=None):
+    """
+    Returns the calibration context for the given XML file, loading it only
+    the first time it is requested in this process.
+    """
+    if path is None:
+        path = path_utils.dirData() + CALIBRATION_FILE
+
+    if path not in _calibrations:
+        _calibrations[path] = StereoCalibration(path)
+
+    return _calibrations[path]
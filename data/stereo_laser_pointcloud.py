@@ -0,0 +1,686 @@
+import csv
+import functools
+import os
+import re  # Used for numeric extraction from filenames
+from collections import defaultdict  # grouping by base image name im_k_j
+
+import cv2
+import numpy as np
+
+from . import image_io
+from . import instrumentation
+from . import laser_detection
+from . import pointcloud_store
+from . import stage_cache
+from . import stereo_pipeline
+from . import stereo_rectification
+from . import stereo_triangulation
+
+
+# ============================================================
+# OPTIONS
+#   pipeline_mode      -> "streaming": each raw image is split,
+#                         rectified and searched for the laser spot
+#                         in memory
+#                         "files": split and rectified images are
+#                         written to disk and read back between stages
+#   write_debug_images -> streaming mode only: also write split /
+#                         rectified / spot images
+#   rectify_points     -> streaming mode only: detect the spot in the
+#                         raw images and rectify only its coordinates
+#                         (the full remap is still used with
+#                         write_debug_images)
+#   prefetch_workers   -> threads decoding frames ahead of the serial
+#                         processing loop (0 = decode in the loop)
+#   prefetch_depth     -> maximum number of frames decoded ahead
+#   coarse_scale       -> 2 or 4: search the spot in a frame decoded at
+#                         1/coarse_scale first and use its window at
+#                         full resolution (None = disabled)
+#   workers            -> streaming mode only: worker processes
+#                         (1 = serial; no tracking when workers > 1)
+#   export_csv         -> also write camera_pointcloud_ordered.csv and
+#                         camera_pointcloud.csv next to P_CAM.npy
+#   use_cache          -> skip an unchanged experiment and only process
+#                         new or modified frames
+#   content_hash       -> compare file contents instead of mtime/size
+#   tracking_mode      -> search a window predicted from the previous
+#                         j frame (full-frame fallback)
+#   subpixel_centroids -> intensity-weighted centroids (float) with a
+#                         confidence per spot, instead of contour
+#                         centroids truncated to whole pixels
+#   run_reports        -> processed_data/run_report_camera_pointcloud
+#                         .json/.csv (see instrumentation)
+#   profiler           -> None, "cprofile" or "pyinstrument"
+# ============================================================
+CAMERA_DEFAULTS = {
+    'pipeline_mode': "streaming",
+    'write_debug_images': False,
+    'rectify_points': True,
+    'prefetch_workers': 2,
+    'prefetch_depth': 8,
+    'coarse_scale': None,
+    'workers': 1,
+    'export_csv': True,
+    'use_cache': True,
+    'content_hash': False,
+    'tracking_mode': True,
+    'subpixel_centroids': False,
+    'run_reports': True,
+    'profiler': None,
+}
+
+
+def camera_options(options=None):
+    """CAMERA_DEFAULTS overridden by options; unknown names raise TypeError."""
+    options = dict(options or {})
+
+    unknown = sorted(set(options) - set(CAMERA_DEFAULTS))
+    if unknown:
+        raise TypeError(f"Unknown camera point cloud options: {', '.join(unknown)}")
+
+    return {**CAMERA_DEFAULTS, **options}
+
+
+# ============================================================
+# FUNCTION: Detect laser spot centroid
+# ============================================================
+def save_laser_spot(image, detection, image_name, laser_spot_detection_path):
+    """
+    Saves a visualization of a detected laser spot with contour and
+    centroid overlay and returns its centroid.
+    """
+    (cx, cy), laser_contour = detection[:2]
+
+    cv2.drawContours(image, [laser_contour], -1, (0, 255, 0), 2)
+    cv2.circle(image, (int(round(cx)), int(round(cy))), 5, (0, 0, 255), -1)
+
+    save_path = os.path.join(laser_spot_detection_path, f"{image_name}_spot.jpg")
+    cv2.imwrite(save_path, image)
+
+    print(f"Laser spot image saved at: {save_path}")
+    return (cx, cy)
+
+
+def find_laser_spot(image, image_name, laser_spot_detection_path, subpixel=False):
+    """
+    Detects the magenta laser spot in an image.
+    Saves a visualization with contour and centroid overlay.
+    Returns the detection (see laser_detection.detect_laser_spot) or None.
+    """
+    detection = laser_detection.detect_laser_spot(image, subpixel=subpixel)
+
+    if detection is None:
+        return None
+
+    save_laser_spot(image, detection, image_name, laser_spot_detection_path)
+    return detection
+
+
+# ============================================================
+# NATURAL SORTING KEYS
+# ============================================================
+
+# Original images: im_<k>_<j>.jpg  -> (k, j)
+def original_image_key(filename: str):
+    match = re.search(r'im_(\d+)_(\d+)\.jpg$', filename, re.IGNORECASE)
+    if match:
+        return (int(match.group(1)), int(match.group(2)))
+    nums = re.findall(r'\d+', filename)
+    return tuple(map(int, nums)) if nums else (0,)
+
+
+# Split images: im_<k>_<j>_(I|D).jpg -> (k, j, side) where I=0, D=1
+def split_image_key(filename: str):
+    match = re.search(r'im_(\d+)_(\d+)_(I|D)\.jpg$', filename, re.IGNORECASE)
+    if match:
+        k, j = int(match.group(1)), int(match.group(2))
+        side = 0 if match.group(3).upper() == 'I' else 1
+        return (k, j, side)
+
+    nums = re.findall(r'\d+', filename)
+    side = 0 if '_I' in filename.upper() else 1
+    return (*map(int, nums), side) if nums else (0, side)
+
+
+# Stereo pair base names: im_<k>_<j> -> (k, j)
+def base_key(base: str):
+    k, j = map(int, re.findall(r'\d+', base))
+    return (k, j)
+
+
+# ============================================================
+# FILE-BASED PIPELINE
+# ============================================================
+def split_images_to_disk(raw_data_path, split_images_path):
+    """
+    STEP 1: Splits the original stereo images into left (I) and right (D)
+    halves saved in split_images/.
+    """
+    original_images = sorted(
+        [f for f in os.listdir(raw_data_path) if f.lower().endswith(".jpg")],
+        key=original_image_key
+    )
+
+    for image_name in original_images:
+        image_path = os.path.join(raw_data_path, image_name)
+        image = cv2.imread(image_path)
+
+        if image is None:
+            print(f"Could not load image: {image_path}")
+            continue
+
+        left_image, right_image = stereo_pipeline.split_stereo_image(image)
+
+        base_name, ext = os.path.splitext(image_name)
+
+        left_path = os.path.join(split_images_path, f"{base_name}_I{ext}")
+        right_path = os.path.join(split_images_path, f"{base_name}_D{ext}")
+
+        cv2.imwrite(left_path, left_image)
+        cv2.imwrite(right_path, right_image)
+
+        print(f"Image {image_name} split successfully.")
+
+
+def rectify_images_on_disk(split_images_path, rectified_images_path, calibration):
+    """
+    STEP 2: Rectifies the split stereo pairs into rectified_images/.
+
+    Returns:
+        stereo_pairs: list of (left_name, right_name) ordered by (k, j)
+    """
+    split_images = sorted(
+        [f for f in os.listdir(split_images_path) if f.lower().endswith(".jpg")],
+        key=split_image_key
+    )
+
+    grouped_pairs = defaultdict(dict)
+
+    for filename in split_images:
+        match = re.search(r'(im_\d+_\d+)_(I|D)\.jpg$', filename, re.IGNORECASE)
+        if not match:
+            continue
+
+        base_name, side = match.group(1), match.group(2).upper()
+        grouped_pairs[base_name][side] = filename
+
+    stereo_pairs = []
+    for base in sorted(grouped_pairs.keys(), key=base_key):
+        if 'I' in grouped_pairs[base] and 'D' in grouped_pairs[base]:
+            stereo_pairs.append((grouped_pairs[base]['I'], grouped_pairs[base]['D']))
+
+    for left_name, right_name in stereo_pairs:
+
+        left_path = os.path.join(split_images_path, left_name)
+        right_path = os.path.join(split_images_path, right_name)
+
+        left_img = cv2.imread(left_path)
+        right_img = cv2.imread(right_path)
+
+        if left_img is None or right_img is None:
+            print(f"Failed to load stereo pair: {left_name}, {right_name}")
+            continue
+
+        left_rect, right_rect = stereo_rectification.run(left_img, right_img, calibration)
+
+        base_name = re.sub(r'_I$', '', os.path.splitext(left_name)[0])
+
+        left_rect_path = os.path.join(rectified_images_path, f"{base_name}_I_rect.jpg")
+        right_rect_path = os.path.join(rectified_images_path, f"{base_name}_D_rect.jpg")
+
+        cv2.imwrite(left_rect_path, left_rect)
+        cv2.imwrite(right_rect_path, right_rect)
+
+        print(f"Rectified images saved for {base_name}")
+
+    return stereo_pairs
+
+
+def detect_spots_on_disk(stereo_pairs, rectified_images_path, laser_spot_detection_path, options):
+    """
+    STEP 3: Detects the laser spot in every rectified stereo pair.
+
+    Returns:
+        (centroids_left, centroids_right, pair_names, image_shape, confidences)
+    """
+    centroids_left = []
+    centroids_right = []
+    pair_names = []
+    confidences = []
+    image_shape = None
+
+    subpixel = options['subpixel_centroids']
+    tracker = laser_detection.LaserSpotTracker(subpixel=subpixel) if options['tracking_mode'] else None
+    current_stop = None
+
+    for left_name, right_name in stereo_pairs:
+
+        base_name = re.sub(r'_I$', '', os.path.splitext(left_name)[0])
+
+        left_rect_path = os.path.join(rectified_images_path, f"{base_name}_I_rect.jpg")
+        right_rect_path = os.path.join(rectified_images_path, f"{base_name}_D_rect.jpg")
+
+        left_rect = cv2.imread(left_rect_path)
+        right_rect = cv2.imread(right_rect_path)
+
+        if tracker is not None:
+            # The spot is only tracked along the scan of a single stop k
+            k, _ = base_key(base_name)
+            if k != current_stop:
+                tracker.reset()
+                current_stop = k
+
+            detection_left, detection_right = tracker.detect_pair(left_rect, right_rect)
+
+            if detection_left is not None:
+                save_laser_spot(
+                    left_rect, detection_left, f"{base_name}_I_rect", laser_spot_detection_path
+                )
+            if detection_right is not None:
+                save_laser_spot(
+                    right_rect, detection_right, f"{base_name}_D_rect", laser_spot_detection_path
+                )
+        else:
+            detection_left = find_laser_spot(
+                left_rect, f"{base_name}_I_rect", laser_spot_detection_path, subpixel
+            )
+            detection_right = find_laser_spot(
+                right_rect, f"{base_name}_D_rect", laser_spot_detection_path, subpixel
+            )
+
+        if detection_left is not None and detection_right is not None:
+            centroids_left.append(detection_left[0])
+            centroids_right.append(detection_right[0])
+            pair_names.append((left_name, right_name))
+            confidences.append(stereo_pipeline.pair_confidence(detection_left, detection_right))
+            image_shape = left_rect.shape
+        else:
+            print(f"Laser spot not detected in pair {base_name}")
+
+    return centroids_left, centroids_right, pair_names, image_shape, confidences
+
+
+# ============================================================
+# STREAMING PIPELINE
+# ============================================================
+def process_images_serial(image_paths, processed_data_path, calibration, cached_results, options):
+    """
+    Processes the raw stereo images one by one in memory, tracking the
+    laser spot along each stop k when tracking_mode is enabled. Frames
+    with a cached result are not decoded again; the others are decoded
+    ahead on prefetch_workers threads.
+    Yields one process_stereo_image result per image (None if unreadable).
+    """
+    subpixel = options['subpixel_centroids']
+    rectify_points = options['rectify_points']
+
+    debug_sink = (
+        stereo_pipeline.DebugImageSink(processed_data_path) if options['write_debug_images'] else None
+    )
+    tracker = laser_detection.LaserSpotTracker(subpixel=subpixel) if options['tracking_mode'] else None
+    current_stop = None
+
+    prefetcher = image_io.ImagePrefetcher(
+        [path for path, cached in zip(image_paths, cached_results) if cached is None],
+        functools.partial(image_io.load_frame, coarse_scale=options['coarse_scale']),
+        options['prefetch_workers'], options['prefetch_depth']
+    )
+
+    with prefetcher:
+        frames = iter(prefetcher)
+
+        for image_path, cached in zip(image_paths, cached_results):
+            image_name = os.path.basename(image_path)
+            base_name = os.path.splitext(image_name)[0]
+
+            if tracker is not None:
+                k, _ = original_image_key(image_name)
+                if k != current_stop:
+                    tracker.reset()
+                    current_stop = k
+
+            if cached is not None:
+                # Cached centroids are rectified: with rectify_points the
+                # tracker works on the raw halves, so it starts over
+                if tracker is not None and rectify_points and debug_sink is None:
+                    tracker.reset()
+                elif tracker is not None:
+                    centroid_left, centroid_right = cached[:2]
+                    tracker.update(
+                        (centroid_left, None) if centroid_left else None,
+                        (centroid_right, None) if centroid_right else None
+                    )
+                yield cached
+                continue
+
+            image, windows = next(frames)
+
+            if image is None:
+                yield None
+                continue
+
+            yield stereo_pipeline.process_stereo_image(
+                image, base_name, calibration, tracker, debug_sink, subpixel, rectify_points, windows
+            )
+
+
+def detect_spots_streaming(raw_data_path, processed_data_path, calibration, options):
+    """
+    STEPS 1-3 in a single pass: every raw image is split, rectified and
+    searched for the laser spot in memory, without intermediate JPEG files
+    (unless write_debug_images is enabled). Frames are distributed over a
+    process pool when workers > 1; the output order is always (k, j).
+
+    Returns:
+        (centroids_left, centroids_right, pair_names, image_shape, confidences)
+    """
+    original_images = sorted(
+        [f for f in os.listdir(raw_data_path) if f.lower().endswith(".jpg")],
+        key=original_image_key
+    )
+
+    image_paths = [os.path.join(raw_data_path, f) for f in original_images]
+
+    # Per-frame cache: only new or modified frames are processed
+    frame_cache = None
+    cached_results = [None] * len(image_paths)
+
+    if options['use_cache'] and not options['write_debug_images']:
+        frame_cache = stage_cache.FrameCache(
+            processed_data_path, frame_parameters(calibration, options), options['content_hash']
+        )
+        frame_cache.prune(original_images)
+
+        signatures = [frame_cache.signature(path) for path in image_paths]
+        cached_results = [
+            decode_frame_result(frame_cache.get(image_name, signature))
+            for image_name, signature in zip(original_images, signatures)
+        ]
+
+        n_cached = sum(result is not None for result in cached_results)
+        print(f"Cached frames: {n_cached}/{len(image_paths)}")
+
+    if options['workers'] > 1:
+        pending = [i for i, cached in enumerate(cached_results) if cached is None]
+        computed = stereo_pipeline.process_images_parallel(
+            [image_paths[i] for i in pending], calibration, options['workers'],
+            processed_data_path if options['write_debug_images'] else None,
+            subpixel=options['subpixel_centroids'], rectify_points=options['rectify_points'],
+            coarse_scale=options['coarse_scale']
+        )
+        results = list(cached_results)
+        for i, result in zip(pending, computed):
+            results[i] = result
+    else:
+        results = process_images_serial(image_paths, processed_data_path, calibration, cached_results, options)
+
+    centroids_left = []
+    centroids_right = []
+    pair_names = []
+    confidences = []
+    image_shape = None
+
+    for i, (image_name, result) in enumerate(zip(original_images, results)):
+
+        if result is None:
+            print(f"Could not load image: {os.path.join(raw_data_path, image_name)}")
+            continue
+
+        if frame_cache is not None and cached_results[i] is None:
+            frame_cache.put(image_name, signatures[i], encode_frame_result(result))
+
+        base_name, ext = os.path.splitext(image_name)
+        centroid_left, centroid_right, shape, confidence = result
+
+        if centroid_left and centroid_right:
+            centroids_left.append(centroid_left)
+            centroids_right.append(centroid_right)
+            pair_names.append((f"{base_name}_I{ext}", f"{base_name}_D{ext}"))
+            confidences.append(confidence)
+            image_shape = shape
+            print(f"Image {image_name} processed.")
+        else:
+            print(f"Laser spot not detected in pair {base_name}")
+
+    if frame_cache is not None:
+        frame_cache.save()
+
+    return centroids_left, centroids_right, pair_names, image_shape, confidences
+
+
+# ============================================================
+# CACHE HELPERS
+# ============================================================
+def frame_parameters(calibration, options):
+    """Everything the per-frame centroids depend on."""
+    return {
+        'calibration': stage_cache.file_signature(calibration.path, options['content_hash']),
+        'tracking_mode': options['tracking_mode'] and options['workers'] == 1,
+        'subpixel_centroids': options['subpixel_centroids'],
+        'rectify_points': (
+            options['rectify_points'] and options['pipeline_mode'] == "streaming"
+            and not options['write_debug_images']
+        ),
+        'thresholds': [
+            laser_detection.LOWER_MAGENTA.tolist(),
+            laser_detection.UPPER_MAGENTA.tolist()
+        ],
+    }
+
+
+def camera_pointcloud_stage(raw_data_path, processed_data_path, calibration, options):
+    """Inputs, parameters and outputs of the camera point cloud stage."""
+    inputs = [
+        os.path.join(raw_data_path, f)
+        for f in os.listdir(raw_data_path) if f.lower().endswith(".jpg")
+    ] + [calibration.path]
+
+    parameters = dict(
+        frame_parameters(calibration, options),
+        pipeline_mode=options['pipeline_mode'],
+        export_csv=options['export_csv']
+    )
+
+    outputs = [
+        os.path.join(processed_data_path, "P_CAM.npy"),
+        os.path.join(processed_data_path, "P_CAM_meta.npz"),
+    ]
+    if options['export_csv']:
+        outputs += [
+            os.path.join(processed_data_path, "camera_pointcloud_ordered.csv"),
+            os.path.join(processed_data_path, "camera_pointcloud.csv"),
+        ]
+
+    return inputs, parameters, outputs
+
+
+def encode_frame_result(result):
+    centroid_left, centroid_right, shape, confidence = result
+    return [
+        list(centroid_left) if centroid_left else None,
+        list(centroid_right) if centroid_right else None,
+        list(shape),
+        confidence
+    ]
+
+
+def decode_frame_result(cached):
+    # Entries written before the spot confidence was stored are recomputed
+    if cached is None or len(cached) != 4:
+        return None
+
+    centroid_left, centroid_right, shape, confidence = cached
+    return (
+        tuple(centroid_left) if centroid_left else None,
+        tuple(centroid_right) if centroid_right else None,
+        tuple(shape),
+        confidence
+    )
+
+
+# ============================================================
+# FUNCTION: Triangulate and save the camera point cloud
+# ============================================================
+def save_camera_pointcloud(centroids_left, centroids_right, pair_names, image_shape, confidences,
+                           calibration, processed_data_path, export_csv=True):
+    """
+    Triangulates all detected laser spots at once and saves the camera
+    point cloud as P_CAM.npy, with the (k, j) index, the source image
+    names and the spot confidence (NaN if unknown) as metadata. The ordered
+    and final CSVs are also written unless export_csv is disabled.
+    """
+    if pair_names:
+        laser_points_cam = stereo_triangulation.triangulate_batch(
+            centroids_left, centroids_right, image_shape, calibration
+        )
+    else:
+        laser_points_cam = np.empty((0, 3))
+
+    valid = ~np.isnan(laser_points_cam).any(axis=1)
+
+    for (left_name, right_name), keep in zip(pair_names, valid):
+        if not keep:
+            print(f"Zero disparity in pair {left_name}, {right_name}")
+
+    laser_points_cam = laser_points_cam[valid]
+    pair_names = [names for names, keep in zip(pair_names, valid) if keep]
+    confidences = np.array(
+        [np.nan if confidence is None else confidence for confidence in confidences], dtype=np.float64
+    )[valid]
+
+    # (k, j) index of every point
+    indices = np.array(
+        [split_image_key(left_name)[:2] for left_name, _ in pair_names], dtype=np.int64
+    ).reshape(-1, 2)
+
+    pointcloud_store.save_pointcloud(
+        os.path.join(processed_data_path, "P_CAM"),
+        laser_points_cam,
+        k=indices[:, 0],
+        j=indices[:, 1],
+        left_image=np.array([left_name for left_name, _ in pair_names], dtype=str),
+        right_image=np.array([right_name for _, right_name in pair_names], dtype=str),
+        confidence=confidences
+    )
+    print("Saved P_CAM.npy")
+
+    if not export_csv:
+        return
+
+    ordered_cloud_csv = os.path.join(processed_data_path, "camera_pointcloud_ordered.csv")
+    cloud_csv = os.path.join(processed_data_path, "camera_pointcloud.csv")
+
+    with open(ordered_cloud_csv, mode='w', newline='') as csv_ordered, \
+         open(cloud_csv, mode='w', newline='') as final_file:
+
+        ordered_writer = csv.writer(csv_ordered)
+        writer = csv.writer(final_file)
+
+        for laser_point_cam, (left_name, right_name) in zip(laser_points_cam, pair_names):
+            ordered_writer.writerow([*laser_point_cam, left_name, right_name])
+            writer.writerow(laser_point_cam)
+
+    print("Saved 'camera_pointcloud_ordered.csv' and 'camera_pointcloud.csv'")
+
+
+# ============================================================
+# FUNCTION: Process one experiment folder
+# ============================================================
+def process_experiment(experiment_path, calibration, options=None):
+    """
+    Camera point cloud (P_CAM) of one experiment folder.
+
+    Parameters:
+        experiment_path: experiment folder (with raw_data)
+        calibration: StereoCalibration context
+        options: dict overriding CAMERA_DEFAULTS
+    """
+    options = camera_options(options)
+
+    processed_data_path = os.path.join(experiment_path, "processed_data")
+    os.makedirs(processed_data_path, exist_ok=True)
+
+    with instrumentation.run_report(
+        os.path.join(processed_data_path, "run_report_camera_pointcloud"),
+        enabled=options['run_reports'], profiler=options['profiler'],
+        stage="camera_pointcloud", experiment=os.path.basename(experiment_path),
+        pipeline_mode=options['pipeline_mode']
+    ):
+        build_camera_pointcloud(experiment_path, calibration, options)
+
+
+def build_camera_pointcloud(experiment_path, calibration, options):
+
+    # --------------------------------------------------------
+    # DIRECTORY STRUCTURE
+    # --------------------------------------------------------
+    raw_data_path = os.path.join(experiment_path, "raw_data")
+    processed_data_path = os.path.join(experiment_path, "processed_data")
+
+    os.makedirs(processed_data_path, exist_ok=True)
+
+    # --------------------------------------------------------
+    # STAGE CACHE: skip the experiment if nothing has changed
+    # --------------------------------------------------------
+    with instrumentation.span("stage_cache"):
+        cache = (
+            stage_cache.StageCache(processed_data_path, options['content_hash'])
+            if options['use_cache'] else None
+        )
+        stage_inputs, stage_parameters, stage_outputs = camera_pointcloud_stage(
+            raw_data_path, processed_data_path, calibration, options
+        )
+
+    if cache is not None and cache.is_valid("camera_pointcloud", stage_inputs, stage_parameters, stage_outputs):
+        print("Camera point cloud is up to date, skipped.")
+        return
+
+    if options['pipeline_mode'] == "streaming":
+        # ----------------------------------------------------
+        # STEPS 1-3: Split, rectify and detect in memory
+        # ----------------------------------------------------
+        with instrumentation.span("detect_spots") as span:
+            detections = detect_spots_streaming(raw_data_path, processed_data_path, calibration, options)
+            span.count(pairs=len(detections[2]))
+
+    else:
+        split_images_path = os.path.join(processed_data_path, "split_images")
+        rectified_images_path = os.path.join(processed_data_path, "rectified_images")
+        laser_spot_detection_path = os.path.join(processed_data_path, "laser_spot_detection")
+
+        os.makedirs(split_images_path, exist_ok=True)
+        os.makedirs(rectified_images_path, exist_ok=True)
+        os.makedirs(laser_spot_detection_path, exist_ok=True)
+
+        # ----------------------------------------------------
+        # STEP 1: Split original stereo images
+        # ----------------------------------------------------
+        with instrumentation.span("split_images"):
+            split_images_to_disk(raw_data_path, split_images_path)
+
+        # ----------------------------------------------------
+        # STEP 2: Rectify stereo image pairs
+        # ----------------------------------------------------
+        with instrumentation.span("rectify_images") as span:
+            stereo_pairs = rectify_images_on_disk(split_images_path, rectified_images_path, calibration)
+            span.count(pairs=len(stereo_pairs))
+
+        # ----------------------------------------------------
+        # STEP 3: Detect laser spots
+        # ----------------------------------------------------
+        with instrumentation.span("detect_spots") as span:
+            detections = detect_spots_on_disk(
+                stereo_pairs, rectified_images_path, laser_spot_detection_path, options
+            )
+            span.count(pairs=len(detections[2]))
+
+    # --------------------------------------------------------
+    # STEP 4: Triangulate and save the camera point cloud
+    # --------------------------------------------------------
+    with instrumentation.span("save_camera_pointcloud"):
+        save_camera_pointcloud(*detections, calibration, processed_data_path, options['export_csv'])
+
+    if cache is not None:
+        cache.record("camera_pointcloud", stage_inputs, stage_parameters, stage_outputs)
+
+    print("Processing completed: camera point cloud generated successfully.")
@@ -0,0 +1,256 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from . import image_io
+from . import laser_detection
+from . import stereo_calibration
+from . import stereo_rectification
+from .instrumentation import instrumented
+
+
+def split_stereo_image(image):
+    """
+    Splits a side-by-side stereo image into its left and right halves.
+    The halves are views of the original array (no copy).
+    """
+    mid = image.shape[1] // 2
+    return image[:, :mid], image[:, mid:]
+
+
+class DebugImageSink:
+    """
+    Optional writer for the intermediate images of the streaming pipeline.
+    Uses the same folders and file names as the file-based pipeline.
+    """
+
+    def __init__(self, processed_data_path):
+        self.split_images_path = os.path.join(processed_data_path, "split_images")
+        self.rectified_images_path = os.path.join(processed_data_path, "rectified_images")
+        self.laser_spot_detection_path = os.path.join(processed_data_path, "laser_spot_detection")
+
+        os.makedirs(self.split_images_path, exist_ok=True)
+        os.makedirs(self.rectified_images_path, exist_ok=True)
+        os.makedirs(self.laser_spot_detection_path, exist_ok=True)
+
+    def write_split(self, base_name, left_image, right_image):
+        cv2.imwrite(os.path.join(self.split_images_path, f"{base_name}_I.jpg"), left_image)
+        cv2.imwrite(os.path.join(self.split_images_path, f"{base_name}_D.jpg"), right_image)
+
+    def write_rectified(self, base_name, left_rect, right_rect):
+        cv2.imwrite(os.path.join(self.rectified_images_path, f"{base_name}_I_rect.jpg"), left_rect)
+        cv2.imwrite(os.path.join(self.rectified_images_path, f"{base_name}_D_rect.jpg"), right_rect)
+
+    def write_spot(self, image_name, image, detection):
+        (cx, cy), laser_contour = detection[:2]
+
+        image = image.copy()
+        cv2.drawContours(image, [laser_contour], -1, (0, 255, 0), 2)
+        cv2.circle(image, (int(round(cx)), int(round(cy))), 5, (0, 0, 255), -1)
+
+        cv2.imwrite(os.path.join(self.laser_spot_detection_path, f"{image_name}_spot.jpg"), image)
+
+
+def detect_pair(left_image, right_image, tracker=None, subpixel=False, windows=None, rectified=True):
+    """
+    Laser spot detections of a stereo pair, tracked or full-frame. The
+    optional search windows (window_left, window_right) are tried before
+    a full-frame search. rectified=False for raw halves: the tracker then
+    does not search the right spot in an epipolar band.
+    """
+    if tracker is not None:
+        return tracker.detect_pair(left_image, right_image, windows, rectified)
+
+    detections = []
+    for image, window in zip((left_image, right_image), windows or (None, None)):
+        detection = None
+        if window is not None:
+            detection = laser_detection.detect_laser_spot(image, window, subpixel)
+        if detection is None:
+            detection = laser_detection.detect_laser_spot(image, subpixel=subpixel)
+        detections.append(detection)
+
+    return tuple(detections)
+
+
+def rectify_windows(windows, calibration):
+    """
+    Moves raw search windows to the rectified images (shifted with the
+    rectified position of their centre; windows are generous enough to
+    ignore the local distortion of their size).
+    """
+    if windows is None:
+        return None
+
+    centres = np.full((2, 2), np.nan)
+    for i, window in enumerate(windows):
+        if window is not None:
+            x, y, w, h = window
+            centres[i] = x + w / 2, y + h / 2
+
+    rectified_left, rectified_right = stereo_rectification.run_points(centres[:1], centres[1:], calibration)
+
+    return tuple(
+        None if window is None or np.isnan(centre).any()
+        else (centre[0] - window[2] / 2, centre[1] - window[3] / 2, window[2], window[3])
+        for window, centre in zip(windows, (rectified_left[0], rectified_right[0]))
+    )
+
+
+def rectify_centroids(centroid_left, centroid_right, calibration):
+    """
+    Rectifies the raw spot centroids of a stereo pair (None stays None, as
+    does a centroid outside the rectified image).
+    """
+    points_left, points_right = stereo_rectification.run_points(
+        [centroid_left or (np.nan, np.nan)], [centroid_right or (np.nan, np.nan)], calibration
+    )
+
+    return tuple(
+        None if centroid is None or np.isnan(point).any() else (float(point[0]), float(point[1]))
+        for centroid, point in ((centroid_left, points_left[0]), (centroid_right, points_right[0]))
+    )
+
+
+@instrumented(count=lambda result: {'frames': 1})
+def process_stereo_image(image, base_name, calibration, tracker=None, debug_sink=None, subpixel=False,
+                         rectify_points=False, search_windows=None):
+    """
+    Processes one raw side-by-side stereo image end to end in memory:
+    split, rectification and laser spot detection.
+
+    Parameters:
+        image: raw BGR image with the left and right views side by side
+        base_name: image name without extension (im_<k>_<j>)
+        calibration: StereoCalibration context
+        tracker: optional LaserSpotTracker shared by consecutive frames
+        debug_sink: optional DebugImageSink for the intermediate images
+        subpixel: sub-pixel centroids (see laser_detection.detect_laser_spot);
+                  the tracker uses its own setting
+        rectify_points: detect the spot in the raw halves and rectify only
+                        its coordinates (no image remap). Ignored when
+                        debug_sink is given, since it needs the rectified
+                        images.
+        search_windows: optional (window_left, window_right) raw search
+                        windows of the spot (see image_io.load_frame)
+
+    Returns:
+        (centroid_left, centroid_right, image_shape, confidence) where a
+        centroid is None when the spot is not detected, and confidence is
+        the lower confidence of both spots (None unless both are detected
+        with sub-pixel centroids).
+    """
+    left_image, right_image = split_stereo_image(image)
+
+    if rectify_points and debug_sink is None:
+        detection_left, detection_right = detect_pair(
+            left_image, right_image, tracker, subpixel, search_windows, rectified=False
+        )
+
+        centroid_left, centroid_right = rectify_centroids(
+            detection_left[0] if detection_left is not None else None,
+            detection_right[0] if detection_right is not None else None,
+            calibration
+        )
+
+        return centroid_left, centroid_right, left_image.shape, pair_confidence(detection_left, detection_right)
+
+    if debug_sink is not None:
+        debug_sink.write_split(base_name, left_image, right_image)
+
+    left_rect, right_rect = stereo_rectification.run(left_image, right_image, calibration)
+    if debug_sink is not None:
+        debug_sink.write_rectified(base_name, left_rect, right_rect)
+
+    detection_left, detection_right = detect_pair(
+        left_rect, right_rect, tracker, subpixel, rectify_windows(search_windows, calibration)
+    )
+
+    if debug_sink is not None:
+        if detection_left is not None:
+            debug_sink.write_spot(f"{base_name}_I_rect", left_rect, detection_left)
+        if detection_right is not None:
+            debug_sink.write_spot(f"{base_name}_D_rect", right_rect, detection_right)
+
+    centroid_left = detection_left[0] if detection_left is not None else None
+    centroid_right = detection_right[0] if detection_right is not None else None
+
+    return centroid_left, centroid_right, left_rect.shape, pair_confidence(detection_left, detection_right)
+
+
+def pair_confidence(detection_left, detection_right):
+    """Lower spot confidence of a stereo pair, None if unknown."""
+    if detection_left is None or detection_right is None:
+        return None
+
+    confidences = (detection_left[2]['confidence'], detection_right[2]['confidence'])
+    if None in confidences:
+        return None
+
+    return min(confidences)
+
+
+# ============================================================
+# PARALLEL EXECUTION
+# ============================================================
+_worker = {}
+
+
+def _init_worker(calibration_path, processed_data_path, subpixel=False, rectify_points=False, coarse_scale=None):
+    """
+    Process pool initializer: caps OpenCV threading to avoid
+    oversubscription and loads the calibration once per worker.
+    """
+    cv2.setNumThreads(1)
+
+    _worker['subpixel'] = subpixel
+    _worker['rectify_points'] = rectify_points
+    _worker['coarse_scale'] = coarse_scale
+    _worker['calibration'] = stereo_calibration.load_calibration(calibration_path)
+    _worker['debug_sink'] = None
+    if processed_data_path is not None:
+        _worker['debug_sink'] = DebugImageSink(processed_data_path)
+
+
+def _process_image_file(image_path):
+    image, windows = image_io.load_frame(image_path, _worker['coarse_scale'])
+
+    if image is None:
+        return None
+
+    base_name = os.path.splitext(os.path.basename(image_path))[0]
+
+    return process_stereo_image(
+        image, base_name, _worker['calibration'], None, _worker['debug_sink'],
+        _worker['subpixel'], _worker['rectify_points'], windows
+    )
+
+
+def process_images_parallel(image_paths, calibration, workers, processed_data_path=None, chunksize=4,
+                            subpixel=False, rectify_points=False, coarse_scale=None):
+    """
+    Processes raw stereo images on a process pool. Frames are independent,
+    so the spot tracker is not used (every frame gets a full-frame search).
+
+    Parameters:
+        image_paths: list of raw image paths
+        calibration: StereoCalibration context (reloaded once per worker)
+        workers: number of worker processes
+        processed_data_path: if given, intermediate images are written there
+        chunksize: number of frames sent to a worker at once
+        subpixel: sub-pixel centroids (see laser_detection.detect_laser_spot)
+        rectify_points: rectify only the spot coordinates (see process_stereo_image)
+        coarse_scale: optional reduced-resolution spot search (see image_io.load_frame)
+
+    Returns:
+        list with one process_stereo_image result per path, in the order of
+        image_paths (None for images that could not be loaded).
+    """
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(calibration.path, processed_data_path, subpixel, rectify_points, coarse_scale)
+    ) as executor:
+        return list(executor.map(_process_image_file, image_paths, chunksize=chunksize))
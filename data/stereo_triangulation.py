@@ -1,52 +1,50 @@
-import cv2 as cv
 import numpy as np
-from . import path_utils
-import math
+from .instrumentation import instrumented
+from .stereo_calibration import load_calibration, BASELINE
 
-def triangulation(imgpointsL,imgpointsR,img):
-    a=0.085
-    Hsensor=4.61
-    Vsensor=2.59
+def triangulation(imgpointsL, imgpointsR, img, calibration=None):
+    """
+    Triangulates stereo point pairs from a rectified image.
+    Kept for compatibility; see triangulate_batch.
+    """
+    return triangulate_batch(imgpointsL, imgpointsR, img.shape, calibration).tolist()
 
-    dirData = path_utils.dirData()
 
-    cv_file = cv.FileStorage()
-    cv_file.open(dirData +  'stereo_rectification_map.xml', cv.FileStorage_READ)
-    cameraL = cv_file.getNode('cameraL').mat()
-    #cameraR = cv_file.getNode('cameraR').mat()
+@instrumented(count=lambda points: {'points': len(points)})
+def triangulate_batch(pointsL, pointsR, image_shape, calibration=None):
+    """
+    Triangulates N stereo point pairs in a single vectorized pass.
 
-    temp = img.shape
-    if len(temp)==3:
-        img = cv.cvtColor(img, cv.COLOR_BGR2GRAY)
+    Parameters:
+        pointsL: (N, 2) array of left image points (x, y)
+        pointsR: (N, 2) array of right image points (x, y)
+        image_shape: shape of the rectified images (height, width[, channels])
+        calibration: StereoCalibration context (the cached one if omitted)
 
-    V,H = img.shape
-    fx = cameraL[0,0]
-    fy = cameraL[1,1]
+    Returns:
+        pointCloud: (N, 3) float64 array of [x, y, z] points.
+                    Pairs with zero disparity are returned as NaN.
+    """
+    a = BASELINE
 
-    Hsensor = Hsensor / 1000
-    Vsensor = Vsensor / 1000
+    if calibration is None:
+        calibration = load_calibration()
 
-    #Parametros del lente
-    f_mmx = fx * (Hsensor/H)
-    f_mmy = fy * (Vsensor/V)
-    FOV_H = 2*math.degrees(math.atan(Hsensor/(2*f_mmx)))
-    FOV_V = 2*math.degrees(math.atan(Vsensor/(2*f_mmy)))
+    V, H = image_shape[:2]
+    fx, FOV_H, FOV_V, theta_H, theta_V = calibration.angles(image_shape)
 
-    theta_H = (180-FOV_H)/2
-    theta_V = (180-FOV_V)/2
+    pointsL = np.asarray(pointsL, dtype=np.float64).reshape(-1, 2)
+    pointsR = np.asarray(pointsR, dtype=np.float64).reshape(-1, 2)
 
-    pointCloud = []
+    d = np.abs(pointsL[:, 0] - pointsR[:, 0])
+    valid = d > 0
 
-    for pointL,pointR in zip(imgpointsL,imgpointsR):
-        d = abs(pointL[0]-pointR[0])
-        #print(d)
-        xi_H = theta_H + (pointL[0] * FOV_H) / H
-        xi_V = theta_V + (pointR[1] * FOV_V) / V
+    xi_H = theta_H + (pointsL[:, 0] * FOV_H) / H
+    xi_V = theta_V + (pointsR[:, 1] * FOV_V) / V
 
-        x = fx * a / d
-        y = (x / math.tan(math.radians(xi_H)))+a/2
-        z = x / math.tan(math.radians(xi_V))
+    x = np.full(len(d), np.nan)
+    x[valid] = fx * a / d[valid]
+    y = (x / np.tan(np.radians(xi_H))) + a / 2
+    z = x / np.tan(np.radians(xi_V))
 
-        pointCloud.append([x,y,z])
-
-    return pointCloud
\ No newline at end of file
+    return np.column_stack([x, y, z])
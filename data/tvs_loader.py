@@ -0,0 +1,128 @@
+import os
+import re
+
+import numpy as np
+
+try:
+    from pyarrow import csv as pa_csv
+except ImportError:  # optional fast CSV engine
+    pa_csv = None
+
+from .instrumentation import instrumented
+
+
+# Columns of a tvs_<k>.csv file (one line per scan-line j)
+TVS_COLUMNS = ["X", "Y", "Z", "emitter_angle", "receiver_angle", "vertical_angle", "timestamp"]
+
+TVS_FILE_PATTERN = re.compile(r'^tvs_(\d+)\.csv$')
+
+
+# ============================================================
+# FILES
+# ============================================================
+def natural_sort_key(name):
+    """Sort key ordering embedded numbers numerically (tvs_2 before tvs_10)."""
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', name)]
+
+
+def list_tvs_files(raw_data_path):
+    """tvs_<k>.csv files of a raw_data folder, ordered by stop index k."""
+    return sorted(
+        (f for f in os.listdir(raw_data_path) if TVS_FILE_PATTERN.match(f)),
+        key=natural_sort_key
+    )
+
+
+def accumulated_displacements(displacement_path):
+    """
+    Accumulated displacement (m) of every stop from the incremental
+    displacements (cm) of displacement.csv: [0, d0, d0 + d1, ...].
+    """
+    displacements = np.loadtxt(displacement_path, delimiter=',', dtype=np.float64, ndmin=2)[0]
+    return np.concatenate([[0.0], np.cumsum(displacements / 100.0)])
+
+
+# ============================================================
+# PARSING
+# ============================================================
+@instrumented(count=lambda data: {'files': 1, 'points': len(data)})
+def read_tvs_file(path):
+    """
+    Parses one TVS file into a float64 (n, 7) array with the TVS_COLUMNS
+    (missing columns are NaN). Lines without coordinates are dropped.
+    Uses pyarrow when installed, np.loadtxt otherwise.
+    """
+    if pa_csv is not None:
+        table = pa_csv.read_csv(
+            path,
+            read_options=pa_csv.ReadOptions(autogenerate_column_names=True),
+            convert_options=pa_csv.ConvertOptions(
+                column_types={f"f{i}": "float64" for i in range(len(TVS_COLUMNS))}
+            )
+        )
+        data = np.column_stack([
+            np.asarray(table.column(i), dtype=np.float64)
+            for i in range(min(table.num_columns, len(TVS_COLUMNS)))
+        ]) if table.num_rows else np.empty((0, 0))
+    else:
+        try:
+            data = np.loadtxt(path, delimiter=',', dtype=np.float64, ndmin=2)
+        except ValueError:
+            # Empty fields: parse them as NaN
+            data = np.genfromtxt(path, delimiter=',', dtype=np.float64, ndmin=2)
+
+    data = data[:, :len(TVS_COLUMNS)]
+    if data.shape[1] < len(TVS_COLUMNS):
+        data = np.hstack([data, np.full((len(data), len(TVS_COLUMNS) - data.shape[1]), np.nan)])
+
+    return data[~np.isnan(data[:, :3]).all(axis=1)]
+
+
+@instrumented(count=lambda tvs: {'points': len(tvs['xyz'])})
+def load_tvs_experiment(raw_data_path, tvs_files=None, displacements=None):
+    """
+    Loads all the TVS files of an experiment into one preallocated array
+    and applies the accumulated displacement of every stop along Y.
+
+    Parameters:
+        raw_data_path: raw_data folder of the experiment
+        tvs_files: file names in stop order (default: list_tvs_files)
+        displacements: accumulated displacement of every stop (m), or None
+
+    Returns:
+        dict with
+            'xyz': (N, 3) TVS points
+            'xyz_disp': (N, 3) displaced points (only with displacements)
+            'displacement': (N,) displacement of every point (only with displacements)
+            'k', 'j': (N,) stop and scan-line index of every point
+            one (N,) array per remaining TVS_COLUMNS entry
+    """
+    if tvs_files is None:
+        tvs_files = list_tvs_files(raw_data_path)
+
+    blocks = [read_tvs_file(os.path.join(raw_data_path, f)) for f in tvs_files]
+    counts = np.array([len(block) for block in blocks], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    data = np.empty((offsets[-1], len(TVS_COLUMNS)))
+    for block, start, end in zip(blocks, offsets[:-1], offsets[1:]):
+        data[start:end] = block
+
+    k = np.repeat(np.arange(len(blocks)), counts)
+    tvs = {
+        'xyz': data[:, :3],
+        'k': k,
+        'j': np.arange(len(data)) - offsets[k],
+    }
+    tvs.update({name: data[:, i] for i, name in enumerate(TVS_COLUMNS[3:], start=3)})
+
+    if displacements is not None:
+        displacement = np.repeat(np.asarray(displacements, dtype=np.float64)[:len(blocks)], counts)
+
+        xyz_disp = data[:, :3].copy()
+        xyz_disp[:, 1] += displacement
+
+        tvs['xyz_disp'] = xyz_disp
+        tvs['displacement'] = displacement
+
+    return tvs
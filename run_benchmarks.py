@@ -0,0 +1,73 @@
+import json
+import os
+from datetime import datetime
+
+from benchmarks.suite import run_benchmarks, results_table, compare_reports
+from data import path_utils
+
+
+# ============================================================
+# GLOBAL CONFIGURATION
+# ============================================================
+# Repository folder (independent of the launch directory)
+results_dir = os.path.join(path_utils.BASE_DIR, "benchmarks", "results")
+
+
+# ============================================================
+# SIZES
+#   frame_counts -> synthetic stereo frames of the spot detection
+#   point_sizes  -> points of the triangulation and registration
+#                   stages (tunnel scans of 40 rows per stop)
+#   line_counts  -> rows of the line-level stages (triads and
+#                   rotations; 40 points per row)
+#   tvs_sizes    -> points of the TVS loader (one file per 40
+#                   points, written to a temporary folder)
+#   10**7 points need about 3 GB of memory.
+# ============================================================
+frame_counts = [10, 100]
+point_sizes = [10**3, 10**4, 10**5, 10**6, 10**7]
+line_counts = [40, 10**3, 10**4, 10**5]
+tvs_sizes = [10**3, 10**4, 10**5]
+
+repeat = 3
+seed = 0
+
+
+# ============================================================
+# REGRESSION TRACKING
+#   baseline_json -> results file of a previous run to compare
+#                    with (None = no comparison)
+# ============================================================
+baseline_json = None
+
+
+# ============================================================
+# MAIN
+#   - Writes:
+#       • benchmarks/results/benchmark_<date>_<time>.json
+# ============================================================
+if __name__ == "__main__":
+
+    print("Running benchmarks\n")
+
+    output_json = os.path.join(
+        results_dir, f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+
+    report = run_benchmarks(
+        frame_counts=frame_counts, point_sizes=point_sizes, line_counts=line_counts, tvs_sizes=tvs_sizes,
+        repeat=repeat, output_json=output_json, seed=seed
+    )
+
+    df_results = results_table(report)
+    print()
+    print(df_results[['benchmark', 'size', 'unit', 'best_s', 'throughput']].to_string(index=False))
+
+    if baseline_json is not None:
+        with open(baseline_json) as json_file:
+            baseline = json.load(json_file)
+
+        print(f"\nComparison with {baseline_json} (ratio > 1: slower)")
+        print(compare_reports(baseline, report).to_string(index=False))
+
+    print(f"\nSaved results at: {output_json}")
@@ -0,0 +1,59 @@
+import os
+
+from data import api
+from data import path_utils
+
+
+# ============================================================
+# GLOBAL CONFIGURATION
+# ============================================================
+# Experiments/ of the repository, or --experiments-dir <folder>
+experiments_dir = path_utils.experimentsDir()
+
+
+# ============================================================
+# EXPERIMENT SELECTION
+#   None          -> every experiment folder found in Experiments/
+#   ["1-20", "35"] -> numeric ranges and single experiments
+#   ["01*"]        -> glob patterns on the folder names
+# ============================================================
+selection = None
+
+
+# ============================================================
+# EXECUTION
+#   workers   -> experiments processed in parallel (1 = serial).
+#                Steps 1 -> 2 -> 3 of an experiment run in order,
+#                different experiments run concurrently.
+#   plot_mode -> figures of step 3: "none" or "files"
+#                (PNG files in processed_data/figures)
+# ============================================================
+workers = os.cpu_count() or 1
+plot_mode = "none"
+
+
+# ============================================================
+# MAIN
+#   - Writes:
+#       • Pipeline_Status.csv (global, one row per experiment)
+# ============================================================
+if __name__ == "__main__":
+
+    print(f"Experiments: {experiments_dir}, workers: {workers}\n")
+
+    status_csv = os.path.join(experiments_dir, "Pipeline_Status.csv")
+    df_status = api.run_pipeline(
+        experiments_dir, selection,
+        workers=workers,
+        plot_mode=plot_mode,
+        output_csv=status_csv
+    )
+
+    print("\nPipeline status:")
+    print(df_status.drop(columns="error").to_string(index=False))
+
+    failed = df_status[df_status["error"] != ""]
+    for _, row in failed.iterrows():
+        print(f"    {row['Experiment']}: {row['error']}")
+
+    print(f"\nSaved Pipeline_Status.csv at: {status_csv}")
@@ -0,0 +1,46 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from data import align_pointclouds
+from data import pointcloud_store
+
+
+def write_experiment(processed_data_path, seed=0):
+    rng = np.random.default_rng(seed)
+    tvs = rng.normal(size=(120, 3))
+    cam = tvs + rng.normal(scale=0.01, size=tvs.shape)
+
+    os.makedirs(processed_data_path, exist_ok=True)
+    pointcloud_store.save_pointcloud(os.path.join(processed_data_path, "P_CAM_disp"), cam)
+    pointcloud_store.save_pointcloud(os.path.join(processed_data_path, "P_TVS_disp"), tvs)
+
+
+def align(processed_data_path, step):
+    return align_pointclouds.process_experiment(
+        "001", processed_data_path,
+        os.path.join(processed_data_path, "P_CAM_disp"), os.path.join(processed_data_path, "P_TVS_disp"),
+        {'step': step, 'use_cache': False, 'run_reports': False}
+    )
+
+
+def test_concurrent_alignments_keep_their_own_options(tmp_path):
+    steps = [4, 8, 12, 24]
+    paths = [str(tmp_path / f"{step}" / "processed_data") for step in steps]
+    for path in paths:
+        write_experiment(path)
+
+    serial = [align(path, step) for path, step in zip(paths, steps)]
+
+    with ThreadPoolExecutor(max_workers=len(steps)) as executor:
+        concurrent = list(executor.map(align, paths, steps))
+
+    assert len(set(serial)) == len(steps)
+    assert concurrent == pytest.approx(serial)
+
+
+def test_unknown_alignment_option_raises():
+    with pytest.raises(TypeError, match="stepp"):
+        align_pointclouds.alignment_options({'stepp': 40})
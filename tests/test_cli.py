@@ -0,0 +1,18 @@
+import os
+import subprocess
+import sys
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_experiment_selection_does_not_import_pandas(tmp_path):
+    (tmp_path / "001" / "raw_data").mkdir(parents=True)
+
+    code = (
+        "import sys, cli\n"
+        f"args = cli.parse_args(['displacement', '--experiments-dir', {str(tmp_path)!r}])\n"
+        "assert cli.selected_experiments(args) == ['001']\n"
+        "assert 'pandas' not in sys.modules\n"
+    )
+
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=REPOSITORY)
@@ -0,0 +1,9 @@
+from data.displacement_simulation import run_simulation, summarize_simulation
+
+
+def test_simulation_without_experiments_gives_empty_tables():
+    df_results = run_simulation({}, {"nominal": {}}, n_trials=10)
+
+    assert df_results.empty
+    assert list(df_results.columns) == ['Experiment', 'scenario', 'seed', 'trial', 'RMSE']
+    assert summarize_simulation(df_results).empty
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from data.global_registration import (
+    apply_transform, register_global, stream_statistics, transform_matrix, umeyama
+)
+from data.registration_engine import rows_to_tensor
+from data.row_statistics import RowStatistics
+
+
+def random_rotation(rng):
+    rotation = np.linalg.qr(rng.normal(size=(3, 3)))[0]
+    return rotation * np.linalg.det(rotation)
+
+
+def row_statistics(cam, tvs, step):
+    cam_rows, counts = rows_to_tensor(cam, step)
+    tvs_rows, _ = rows_to_tensor(tvs, step)
+    return RowStatistics.from_row_tensors(cam_rows, tvs_rows, counts)
+
+
+@pytest.mark.parametrize("similarity, scale", [(False, 1.0), (True, 1.7)])
+def test_recovers_known_transform(similarity, scale):
+    rng = np.random.default_rng(0)
+    rotation, translation = random_rotation(rng), rng.normal(size=3)
+
+    cam = rng.normal(size=(103, 3))
+    tvs = scale * cam @ rotation.T + translation
+
+    result = register_global(row_statistics(cam, tvs, step=10), similarity=similarity)
+
+    np.testing.assert_allclose(result['rotation'], rotation, atol=1e-9)
+    np.testing.assert_allclose(result['translation'], translation, atol=1e-9)
+    assert result['scale'] == pytest.approx(scale)
+    assert result['rmse'] == pytest.approx(0.0, abs=1e-6)
+    np.testing.assert_allclose(apply_transform(cam, result['transform']), tvs, atol=1e-9)
+
+    # Same transform in one streaming pass over small chunks
+    streamed = umeyama(stream_statistics(cam, tvs, chunk_size=16), similarity)
+    np.testing.assert_allclose(transform_matrix(*streamed), result['transform'], atol=1e-9)
+
+
+def test_mirrored_clouds_give_a_proper_rotation():
+    # The best orthogonal map is the mirror diag(1, 1, -1); the best
+    # rotation (det = +1) of this anisotropic cloud is the identity
+    rng = np.random.default_rng(1)
+    cam = rng.normal(size=(200, 3)) * [3.0, 2.0, 1.0]
+    cam -= cam.mean(axis=0)
+    cam = cam @ np.linalg.eigh(cam.T @ cam)[1][:, ::-1]
+    tvs = cam * [1.0, 1.0, -1.0]
+
+    statistics = stream_statistics(cam, tvs)
+    U, _, Vt = np.linalg.svd(statistics.cross[0])
+    assert np.linalg.det(Vt.T @ U.T) < 0
+
+    rotation, translation, scale = umeyama(statistics)
+    assert np.linalg.det(rotation) == pytest.approx(1.0)
+    np.testing.assert_allclose(rotation, np.eye(3), atol=1e-9)
+    np.testing.assert_allclose(translation, 0.0, atol=1e-9)
+    assert scale == 1.0
+
+    # Similarity: s = tr(S D) / tr(S_cam) with D = diag(1, 1, -1)
+    variances = np.sum(cam ** 2, axis=0)
+    _, _, similarity_scale = umeyama(statistics, similarity=True)
+    assert similarity_scale == pytest.approx(
+        (variances[0] + variances[1] - variances[2]) / variances.sum()
+    )
@@ -0,0 +1,37 @@
+import cv2
+import numpy as np
+
+from data import image_io
+
+
+def write_jpeg(path, n_bytes=None):
+    image = np.full((64, 96, 3), 128, dtype=np.uint8)
+    cv2.circle(image, (48, 32), 10, (255, 235, 255), -1)
+    data = cv2.imencode(".jpg", image)[1].tobytes()
+
+    with open(path, "wb") as f:
+        f.write(data if n_bytes is None else data[:n_bytes])
+
+    return len(data)
+
+
+def test_read_image_decodes_complete_jpeg(tmp_path):
+    path = tmp_path / "im_0_0.jpg"
+    write_jpeg(path)
+
+    assert image_io.read_image(str(path)).shape == (64, 96, 3)
+
+
+def test_read_image_rejects_jpeg_being_written(tmp_path):
+    path = tmp_path / "im_0_0.jpg"
+    size = write_jpeg(path)
+    write_jpeg(path, size * 2 // 3)
+
+    assert image_io.read_image(str(path)) is None
+
+
+def test_jpeg_complete_ignores_zero_padding():
+    data = np.frombuffer(b"\xff\xd8" + b"\x00" * 10 + b"\xff\xd9\x00\x00", dtype=np.uint8)
+
+    assert image_io.jpeg_complete(data)
+    assert not image_io.jpeg_complete(data[:-4])
@@ -0,0 +1,144 @@
+import numpy as np
+import pytest
+
+from data import laser_detection
+
+
+# Magenta spot colour inside the HSV thresholds (H ~ 150, S ~ 20, V = 255)
+SPOT_BGR = (255, 235, 255)
+
+
+def blank_image(height=240, width=320):
+    return np.zeros((height, width, 3), dtype=np.uint8)
+
+
+def draw_disc(image, cx, cy, radius, colour=SPOT_BGR):
+    """Draws a disc of the pixels whose centre lies within radius of (cx, cy)."""
+    y, x = np.mgrid[:image.shape[0], :image.shape[1]]
+    image[(x - cx) ** 2 + (y - cy) ** 2 <= radius ** 2] = colour
+    return image
+
+
+# ============================================================
+# TRACKING WITH A DISTRACTOR
+# ============================================================
+def test_tracker_falls_back_to_full_frame_with_distractor_in_window():
+    # The spot moved to the border of the predicted window, which also
+    # holds a small reflection: the full-frame result (largest contour of
+    # the frame) must win over the largest contour of the window
+    image = draw_disc(blank_image(), 155, 120, 12)
+    draw_disc(image, 110, 120, 4)
+
+    tracker = laser_detection.LaserSpotTracker(window=50)
+    tracker.previous = (100, 120)
+
+    detection_left, _ = tracker.detect_pair(image, image)
+
+    assert detection_left[0] == laser_detection.detect_laser_spot(image)[0]
+    assert abs(detection_left[0][0] - 155) <= 1
+    assert abs(detection_left[0][1] - 120) <= 1
+
+
+def test_tracker_keeps_window_result_without_competing_contour():
+    image = draw_disc(blank_image(), 120, 100, 8)
+    draw_disc(image, 280, 200, 20)
+
+    tracker = laser_detection.LaserSpotTracker(window=50)
+    tracker.previous = (115, 100)
+
+    detection_left, _ = tracker.detect_pair(image, image)
+
+    assert abs(detection_left[0][0] - 120) <= 1
+    assert detection_left[2]['n_contours'] == 1
+
+
+def test_window_detection_reports_competing_contours():
+    image = draw_disc(blank_image(), 100, 100, 10)
+    draw_disc(image, 130, 100, 4)
+
+    detection = laser_detection.detect_laser_spot(image, roi=(60, 60, 100, 80))
+
+    assert detection[2]['n_contours'] == 2
+    assert abs(detection[0][0] - 100) <= 1
+
+
+# ============================================================
+# CENTROIDS
+# ============================================================
+def symmetric_spot(cx=60.5, cy=40.0, core=3.0, radius=8.0):
+    """
+    Spot symmetric about (cx, cy): clipped core (V = 255) falling to the
+    V threshold at radius.
+    """
+    image = blank_image(96, 128)
+    y, x = np.mgrid[:image.shape[0], :image.shape[1]]
+    distance = np.hypot(x - cx, y - cy)
+
+    value = np.clip(255 - 10 * (distance - core) / (radius - core), 245, 255)
+    spot = distance <= radius
+
+    image[spot, 0] = value[spot]
+    image[spot, 1] = np.round(value[spot] * 235 / 255)
+    image[spot, 2] = value[spot]
+
+    return image
+
+
+def test_subpixel_centroid_of_symmetric_spot():
+    detection = laser_detection.detect_laser_spot(symmetric_spot(), subpixel=True)
+
+    assert detection[0] == pytest.approx((60.5, 40.0), abs=1e-6)
+    assert detection[2]['n_contours'] == 1
+    assert 0 < detection[2]['confidence'] <= 1
+
+    detection = laser_detection.detect_laser_spot(symmetric_spot(cx=30.5, cy=60.0), subpixel=True)
+    assert detection[0] == pytest.approx((30.5, 60.0), abs=1e-6)
+
+
+def test_subpixel_centroid_of_symmetric_spot_in_window():
+    # Window (14, 41)-(74, 81) around the spot at (30.5, 60), off its
+    # centre; a larger spot outside the window must be ignored
+    image = np.maximum(symmetric_spot(cx=30.5, cy=60.0), symmetric_spot(cx=100.0, cy=20.0, radius=12.0))
+
+    detection = laser_detection.detect_laser_spot(image, roi=(14, 41, 60, 40), subpixel=True)
+
+    assert detection[0] == pytest.approx((30.5, 60.0), abs=1e-6)
+    assert detection[2]['n_contours'] == 1
+
+    full_frame = laser_detection.detect_laser_spot(symmetric_spot(cx=30.5, cy=60.0), subpixel=True)
+    np.testing.assert_array_equal(detection[1], full_frame[1])
+
+
+def test_default_centroid_is_the_truncated_contour_centroid():
+    detection = laser_detection.detect_laser_spot(symmetric_spot())
+
+    assert detection[0] == (60, 40)
+    assert detection[2]['confidence'] is None
+
+
+# ============================================================
+# UNRECTIFIED PAIRS
+# ============================================================
+def test_tracker_skips_epipolar_band_on_raw_halves():
+    # Raw halves: the right spot lies 150 px lower than the left one, out
+    # of the epipolar band, which only holds a small reflection
+    left = draw_disc(blank_image(), 200, 50, 10)
+    right = draw_disc(blank_image(), 150, 200, 10)
+    draw_disc(right, 150, 50, 4)
+
+    detection_left, detection_right = laser_detection.LaserSpotTracker().detect_pair(left, right)
+    assert abs(detection_right[0][1] - 50) <= 1
+
+    tracker = laser_detection.LaserSpotTracker()
+    for shift in (0, 5):
+        moved_left = draw_disc(blank_image(), 200 + shift, 50, 10)
+        moved_right = draw_disc(blank_image(), 150 + shift, 200, 10)
+        draw_disc(moved_right, 150 + shift, 50, 4)
+
+        detection_left, detection_right = tracker.detect_pair(moved_left, moved_right, rectified=False)
+
+        assert abs(detection_right[0][0] - (150 + shift)) <= 1
+        assert abs(detection_right[0][1] - 200) <= 1
+
+    assert tracker.disparity == 50
+    assert tracker.vertical_offset == -150
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from data.online_registration import OnlineRowRegistration, stop_offsets
+from data.registration_engine import register_rows
+
+
+STEP = 7
+
+
+def random_stops(sizes, seed):
+    rng = np.random.default_rng(seed)
+    stops = []
+
+    for n in sizes:
+        cam = rng.normal(size=(n, 3)) + [0.0, len(stops), 0.0]
+        tvs = cam + rng.normal(scale=0.01, size=(n, 3))
+        stops.append((cam, tvs))
+
+    return stops
+
+
+# ============================================================
+# ROW KEY OF THE OFFLINE SPLIT
+# ============================================================
+def test_stop_offsets_wait_for_previous_stops():
+    assert stop_offsets({0: 10, 1: 12, 3: 9}) == {0: 0, 1: 10}
+    assert stop_offsets({1: 12}) == {}
+
+
+@pytest.mark.parametrize("order", [[0, 1, 2], [2, 0, 1]])
+def test_online_rows_match_offline_split(order):
+    # Stop sizes that are not multiples of the step: j % step would put
+    # the points of stops 1 and 2 in other rows than the offline split
+    stops = random_stops([23, 18, 31], seed=3)
+    offsets = stop_offsets({k: len(cam) for k, (cam, _) in enumerate(stops)})
+
+    registration = OnlineRowRegistration(STEP)
+    for k in order:
+        cam, tvs = stops[k]
+        registration.add_stop(offsets[k], np.arange(len(cam)), cam, tvs)
+
+    online = registration.solve()
+    offline = register_rows(
+        np.concatenate([cam for cam, _ in stops]), np.concatenate([tvs for _, tvs in stops]), STEP
+    )
+
+    np.testing.assert_array_equal(online['counts'], offline['counts'])
+    np.testing.assert_allclose(online['cam_centroids'], offline['cam_centroids'], atol=1e-12)
+    np.testing.assert_allclose(online['rotations'], offline['rotations'], atol=1e-9)
+    assert online['rmse'] == pytest.approx(offline['rmse'], rel=1e-9)
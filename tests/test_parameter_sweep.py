@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+
+import pandas as pd
+
+from data.parameter_sweep import RESULT_COLUMNS, run_sweep, sweep_grid
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_sweep_without_experiments_gives_empty_table(tmp_path):
+    output_csv = tmp_path / "Sweep_Results.csv"
+    df_sweep = run_sweep({}, sweep_grid([40], [1, 2]), output_csv=str(output_csv))
+
+    assert df_sweep.empty
+    assert list(df_sweep.columns) == RESULT_COLUMNS
+    assert df_sweep[df_sweep["error"] != ""].empty
+    assert list(pd.read_csv(output_csv).columns) == RESULT_COLUMNS
+
+
+def test_sweep_script_stops_without_processed_data(tmp_path):
+    (tmp_path / "001" / "raw_data").mkdir(parents=True)
+
+    completed = subprocess.run(
+        [sys.executable, "4_parameter_sweep.py", "--experiments-dir", str(tmp_path)],
+        cwd=REPOSITORY, capture_output=True, text=True
+    )
+
+    assert completed.returncode == 1
+    assert "No experiment with processed data" in completed.stdout
+    assert not (tmp_path / "Sweep_Results.csv").exists()
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data.registration_engine import register_rows
+
+
+def synthetic_clouds(n_points, step, seed=0):
+    """CAM and TVS clouds whose point n lies on the scan-line n % step."""
+    rng = np.random.default_rng(seed)
+    n = np.arange(n_points)
+    row, position = n % step, n // step
+
+    angle = np.radians(np.linspace(-60, 60, step))[row]
+    tvs = np.column_stack([2.5 * np.cos(angle), 0.05 * position, 2.5 * np.sin(angle)])
+    tvs += rng.normal(scale=0.002, size=tvs.shape)
+
+    rotation = np.linalg.qr(rng.normal(size=(3, 3)))[0]
+    rotation *= np.linalg.det(rotation)
+    cam = (tvs - [0.1, 0.0, 0.05]) @ rotation + rng.normal(scale=0.002, size=tvs.shape)
+
+    return cam, tvs
+
+
+def per_dataframe_registration(cam_xyz, tvs_xyz, step):
+    """The original row-by-row path: DataFrame split, SVD line fits, triads, rotations and RMSE."""
+    cam_df = pd.DataFrame(cam_xyz, columns=['X', 'Y', 'Z'])
+    tvs_df = pd.DataFrame(tvs_xyz, columns=['X', 'Y', 'Z'])
+
+    def triad(points):
+        _, _, vt = np.linalg.svd(points - points.mean(axis=0))
+        e1 = vt[0] / np.linalg.norm(vt[0])
+        if e1[1] < 0:
+            e1 = -e1
+        reference = np.array([1.0, 0, 0]) if abs(e1[2]) > 0.95 else np.array([0, 0, 1.0])
+        e2 = reference - np.dot(reference, e1) * e1
+        e2 /= np.linalg.norm(e2)
+        e3 = np.cross(e1, e2)
+        return np.column_stack([e1, e2, e3 / np.linalg.norm(e3)])
+
+    rotations, aligned, squared_errors = [], [], []
+    for offset in range(step):
+        cam = cam_df.iloc[offset::step].to_numpy()
+        tvs = tvs_df.iloc[offset::step].to_numpy()
+
+        rotation = triad(tvs) @ triad(cam).T
+        points = (rotation @ (cam - cam.mean(axis=0)).T).T + tvs.mean(axis=0)
+
+        rotations.append(rotation)
+        aligned.append(points)
+        squared_errors.extend(np.sum((points - tvs) ** 2, axis=1))
+
+    return np.array(rotations), aligned, np.sqrt(np.mean(squared_errors))
+
+
+@pytest.mark.parametrize("n_points, step", [(120, 10), (103, 10), (61, 7)])
+def test_register_rows_matches_per_dataframe_path(n_points, step):
+    cam, tvs = synthetic_clouds(n_points, step)
+
+    result = register_rows(cam, tvs, step)
+    rotations, aligned, rmse = per_dataframe_registration(cam, tvs, step)
+
+    np.testing.assert_allclose(result['rotations'], rotations, atol=1e-9)
+    assert result['rmse'] == pytest.approx(rmse, rel=1e-9)
+
+    counts = result['counts']
+    assert counts.sum() == n_points
+    for i in range(step):
+        np.testing.assert_allclose(result['aligned'][i, :counts[i]], aligned[i], atol=1e-9)
+        assert not result['aligned'][i, counts[i]:].any()
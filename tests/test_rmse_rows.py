@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+from data.rmse_rows import compute_rmse_rows
+
+
+def test_rmse_of_identical_rows_is_zero():
+    rows = [np.random.default_rng(0).normal(size=(5, 3)) for _ in range(3)]
+
+    assert compute_rmse_rows(rows, rows) == pytest.approx(0.0)
+
+
+def test_different_number_of_rows_raises_row_mismatch():
+    rows = [np.zeros((4, 3)) for _ in range(3)]
+
+    with pytest.raises(ValueError, match="Row 2 does not contain the same number of points"):
+        compute_rmse_rows(rows, rows[:2])
+
+
+def test_different_row_size_raises_row_mismatch():
+    cam_rows = [np.zeros((4, 3)), np.zeros((5, 3))]
+    tvs_rows = [np.zeros((4, 3)), np.zeros((4, 3))]
+
+    with pytest.raises(ValueError, match="Row 1 does not contain the same number of points"):
+        compute_rmse_rows(cam_rows, tvs_rows)
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from data.registration_engine import rows_to_tensor
+from data.robust_fitting import irls_lines, ransac_lines, robust_inliers
+from data.split_rows import RowPartition
+
+
+def rows_with_outliers(n_rows=3, n_pts=60, noise=0.001, seed=0):
+    """Noisy points along known row lines with about 10% gross outliers."""
+    rng = np.random.default_rng(seed)
+
+    directions = rng.normal(size=(n_rows, 3))
+    directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+
+    t = rng.uniform(-0.5, 0.5, size=(n_rows, n_pts, 1))
+    rows = rng.normal(size=(n_rows, 1, 3)) + t * directions[:, None, :]
+    rows += rng.normal(scale=noise, size=rows.shape)
+
+    outliers = np.zeros((n_rows, n_pts), dtype=bool)
+    outliers[:, rng.choice(n_pts, n_pts // 10, replace=False)] = True
+    offsets = rng.normal(size=(outliers.sum(), 3))
+    rows[outliers] += 0.05 * offsets / np.linalg.norm(offsets, axis=1, keepdims=True) + 0.02 * offsets
+
+    return rows, np.full(n_rows, n_pts), directions, outliers
+
+
+@pytest.mark.parametrize("fit", [irls_lines, ransac_lines])
+def test_robust_line_fit_rejects_outliers_and_recovers_direction(fit):
+    rows, counts, directions, outliers = rows_with_outliers()
+
+    result = fit(rows, counts)
+
+    assert not (result['inliers'] & outliers).any()
+    assert result['inliers'][~outliers].mean() > 0.95
+    np.testing.assert_allclose(np.abs(np.sum(result['directions'] * directions, axis=1)), 1.0, atol=1e-4)
+
+
+def test_least_squares_direction_is_biased_by_the_outliers():
+    rows, counts, directions, _ = rows_with_outliers()
+
+    centered = rows - rows.mean(axis=1, keepdims=True)
+    least_squares = np.linalg.eigh(np.einsum('rpi,rpj->rij', centered, centered))[1][:, :, 2]
+
+    assert np.abs(np.sum(least_squares * directions, axis=1)).min() < 1 - 1e-4
+
+
+def test_robust_inliers_of_point_pairs():
+    rows, counts, _, outliers = rows_with_outliers()
+    step = len(rows)
+
+    # Point i of the cloud is in row i % step (as rows_to_tensor); the CAM
+    # cloud is a rigid motion of the TVS cloud with the same outliers
+    tvs_xyz = rows.transpose(1, 0, 2).reshape(-1, 3)
+    rotation = np.linalg.qr(np.random.default_rng(1).normal(size=(3, 3)))[0]
+    cam_xyz = tvs_xyz @ rotation.T + [0.1, -0.2, 0.3]
+
+    np.testing.assert_array_equal(rows_to_tensor(tvs_xyz, step)[0], rows)
+
+    for method in ("irls", "ransac"):
+        result = robust_inliers(RowPartition(cam_xyz, step), RowPartition(tvs_xyz, step), method)
+
+        assert not (result['inliers'] & outliers).any()
+        assert result['inliers'][~outliers].mean() > 0.95
+        assert len(result['fallback_rows']) == 0
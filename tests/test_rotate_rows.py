@@ -0,0 +1,28 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data import instrumentation
+from data.rotate_rows import rotate_rows
+from data.split_rows import RowPartition
+
+
+def test_rotate_rows_counts_points_of_both_input_kinds(tmp_path):
+    xyz = np.random.default_rng(0).normal(size=(12, 3))
+    df = pd.DataFrame(xyz, columns=['X', 'Y', 'Z'])
+    partition = RowPartition(xyz, 3)
+
+    report = str(tmp_path / "report")
+    with instrumentation.run_report(report):
+        aligned_list = rotate_rows([df], [df], [np.eye(3)])
+        aligned_partition = rotate_rows(partition, partition, np.tile(np.eye(3), (3, 1, 1)))
+
+    assert aligned_list[0][['X', 'Y', 'Z']].to_numpy() == pytest.approx(xyz)
+    assert aligned_partition.xyz == pytest.approx(xyz)
+
+    with open(report + ".json") as f:
+        spans = {record['span']: record for record in json.load(f)['spans']}
+    assert spans['rotate_rows']['calls'] == 2
+    assert spans['rotate_rows']['items']['points'] == 24
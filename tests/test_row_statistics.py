@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from data.registration_engine import stack_rows
+from data.row_statistics import RowStatistics, combine
+
+
+N_ROWS = 5
+
+
+def random_pairs(n, seed):
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, N_ROWS, n)
+    cam = rng.normal(size=(n, 3)) + rows[:, None]
+    tvs = cam @ np.diag([1.0, -1.0, 2.0]) + rng.normal(scale=0.1, size=(n, 3))
+    return rows, cam, tvs
+
+
+def assert_statistics_equal(actual, expected):
+    np.testing.assert_array_equal(actual.counts, expected.counts)
+    for name in ('cam_mean', 'tvs_mean', 'cam_scatter', 'tvs_scatter', 'cross'):
+        np.testing.assert_allclose(getattr(actual, name), getattr(expected, name), atol=1e-9, err_msg=name)
+
+
+def tensor_statistics(rows, cam, tvs):
+    cam_rows, counts = stack_rows([cam[rows == i] for i in range(N_ROWS)])
+    tvs_rows, _ = stack_rows([tvs[rows == i] for i in range(N_ROWS)])
+    return RowStatistics.from_row_tensors(cam_rows, tvs_rows, counts)
+
+
+def test_merged_chunk_statistics_equal_pooled_statistics():
+    rows, cam, tvs = random_pairs(200, seed=0)
+    pooled = RowStatistics.from_points(rows, cam, tvs, N_ROWS)
+
+    # Uneven chunks, one of them without any point of row 0
+    bounds = [0, 7, 60, 61, 200]
+    chunks = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        keep = np.arange(start, end)
+        if start == 60:
+            keep = keep[rows[keep] != 0]
+        chunks.append(keep)
+    chunks.append(np.setdiff1d(np.arange(200), np.concatenate(chunks)))
+
+    from_points = [RowStatistics.from_points(rows[c], cam[c], tvs[c], N_ROWS) for c in chunks]
+    from_tensors = [tensor_statistics(rows[c], cam[c], tvs[c]) for c in chunks]
+
+    assert_statistics_equal(combine(from_points), pooled)
+    assert_statistics_equal(combine(reversed(from_tensors)), pooled)
+    assert_statistics_equal(from_points[0] + RowStatistics.empty(N_ROWS), from_points[0])
+
+    rotations = np.tile(np.eye(3), (N_ROWS, 1, 1))
+    assert combine(from_points).rmse(rotations) == pytest.approx(pooled.rmse(rotations))
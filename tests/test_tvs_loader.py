@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from data import tvs_loader
+
+
+def test_tvs_files_are_in_numeric_stop_order(tmp_path):
+    for k in (10, 2, 0, 9, 1, 11):
+        # Stop k has its index as X coordinate
+        (tmp_path / f"tvs_{k}.csv").write_text(f"{k},0,0,0,0,0,0\n")
+    (tmp_path / "tvs_notes.csv").write_text("")
+    (tmp_path / "im_0_0.jpg").write_bytes(b"")
+
+    tvs_files = tvs_loader.list_tvs_files(str(tmp_path))
+
+    assert tvs_files == ["tvs_0.csv", "tvs_1.csv", "tvs_2.csv", "tvs_9.csv", "tvs_10.csv", "tvs_11.csv"]
+
+    tvs = tvs_loader.load_tvs_experiment(str(tmp_path))
+    np.testing.assert_array_equal(tvs['xyz'][:, 0], [0, 1, 2, 9, 10, 11])
+    np.testing.assert_array_equal(tvs['k'], np.arange(6))
+
+
+def test_pyarrow_parser_matches_loadtxt(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+
+    path = tmp_path / "tvs_0.csv"
+    path.write_text(
+        "1.5,2,3,10,20,30,0.01\n"
+        "4,5,6.25,11,21,31,0.02\n"
+        ",,,12,22,32,0.03\n"
+        "7,8,9,13,23,33,0.04\n"
+    )
+
+    with_pyarrow = tvs_loader.read_tvs_file(str(path))
+
+    monkeypatch.setattr(tvs_loader, "pa_csv", None)
+    with_numpy = tvs_loader.read_tvs_file(str(path))
+
+    assert with_pyarrow.dtype == np.float64
+    np.testing.assert_array_equal(with_pyarrow, with_numpy)
+    assert len(with_pyarrow) == 3